@@ -0,0 +1,683 @@
+"""Area and feeder subscriptions, matched against new outage rows and delivered by webhook.
+
+Subscriptions live in SQLite. The snapshot writer matches only the history rows added
+since its last pass (a cursor on the history's row ids) against a matcher compiled from
+every subscription, and queues one delivery per matching (subscription, row). A
+delivery thread in the writer POSTs the queue in batches per callback URL, retrying
+failures with exponential backoff.
+
+Each subscriber authenticates with a bearer token issued by the operator
+(`python alerts.py token NAME`), and only sees and removes its own subscriptions;
+ALERTS_ADMIN_KEY, if set, is a bearer token for every subscriber. Callback URLs must
+resolve to public addresses, checked again before every delivery, unless their host is
+in ALERT_CALLBACK_ALLOW_HOSTS.
+
+Try it against the local sink, which prints what it receives:
+    python alerts.py sink --port 8940
+    python alerts.py token ops        # prints the token for "ops"
+    ALERT_CALLBACK_ALLOW_HOSTS=127.0.0.1 python app.py
+    curl -X POST localhost:5001/api/alerts/subscriptions -H 'Content-Type: application/json' \\
+         -H 'Authorization: Bearer <token>' \\
+         -d '{"kind": "area", "pattern": "Ogba", "callback_url": "http://127.0.0.1:8940/"}'
+"""
+import argparse
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import random
+import re
+import secrets
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+import metrics
+from config import DATA_DIR
+from location_index import normalize_location, split_locations
+from outage_frame import FRAME_COLUMNS, date_strings
+
+ALERTS_DB_PATH = os.environ.get('ALERTS_DB_PATH', os.path.join(DATA_DIR, 'alerts.db'))
+# Bearer token that may manage every subscriber's subscriptions (unset: no admin access over HTTP)
+ALERTS_ADMIN_KEY = os.environ.get('ALERTS_ADMIN_KEY') or None
+# Callback hosts exempt from the public-address check, e.g. "127.0.0.1,hooks.internal"
+ALERT_CALLBACK_ALLOW_HOSTS = {host.strip().lower() for host in
+                              os.environ.get('ALERT_CALLBACK_ALLOW_HOSTS', '').split(',') if host.strip()}
+# Alerts per webhook POST
+ALERT_BATCH_SIZE = int(os.environ.get('ALERT_BATCH_SIZE', 100))
+ALERT_TIMEOUT_SECONDS = 10
+# A delivery is given up (status 'failed') after this many attempts.
+ALERT_MAX_ATTEMPTS = int(os.environ.get('ALERT_MAX_ATTEMPTS', 8))
+# Backoff before retry n is uniform in [0, base * 2**n], capped at ALERT_MAX_BACKOFF_SECONDS.
+ALERT_BACKOFF_BASE_SECONDS = 2.0
+ALERT_MAX_BACKOFF_SECONDS = 600.0
+# How often the delivery thread looks for due deliveries when it is not woken up
+ALERT_POLL_SECONDS = 5.0
+# Delivered alerts are kept this long, for inspection, then deleted.
+ALERT_RETENTION_SECONDS = 7 * 24 * 3600
+
+KINDS = ('area', 'feeder')
+PENDING, DELIVERED, FAILED = 'pending', 'delivered', 'failed'
+
+metrics.counter('alerts_matched_total', 'Alerts queued for subscribers, by subscription kind.')
+metrics.counter('alert_deliveries_total', 'Alerts posted to webhooks, by result (delivered, retry, failed).')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subscriber TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    callback_url TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_subscriber ON subscriptions (subscriber);
+-- Only a hash of each subscriber's bearer token is stored
+CREATE TABLE IF NOT EXISTS subscribers (
+    name TEXT PRIMARY KEY,
+    token_hash TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subscription_id INTEGER NOT NULL,
+    callback_url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries (status, next_attempt_at);
+-- The history row id matched up to, and a counter bumped whenever subscriptions change
+CREATE TABLE IF NOT EXISTS alert_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    last_history_id INTEGER,
+    subscriptions_version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO alert_state (id, last_history_id, subscriptions_version) VALUES (0, NULL, 0);
+"""
+
+
+# cnn_parser keeps only the word before the status keyword as the feeder (its
+# FEEDER_SIMPLE_PATTERN turns "IKEJA GRA FAULT: ..." into "GRA"), so feeder names and
+# patterns are both matched on their last word.
+_FEEDER_WORD_PATTERN = re.compile(r"[A-Z0-9_-]+", re.IGNORECASE)
+
+
+def feeder_key(name):
+    """Returns the normalized word a feeder name is matched on: "Ikeja GRA" -> "gra"."""
+    words = _FEEDER_WORD_PATTERN.findall(str(name))
+    return words[-1].lower() if words else ''
+
+
+def normalize_pattern(kind, pattern):
+    """Normalizes a subscription pattern; a trailing '*' makes it a prefix pattern.
+
+    Raises:
+        ValueError: If the kind is unknown or the pattern is missing, not a string or empty.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind: {kind} (expected one of {', '.join(KINDS)})")
+    if not isinstance(pattern, str):
+        raise ValueError("The pattern is required and must be a string")
+    prefix = pattern.strip().endswith('*')
+    text = pattern.strip().rstrip('*')
+    key = feeder_key(text) if kind == 'feeder' else normalize_location(text)
+    if not key:
+        raise ValueError("The pattern is empty")
+    return key + ('*' if prefix else '')
+
+
+def check_callback_url(callback_url):
+    """Checks that a callback URL is http(s) and its host resolves only to public addresses.
+
+    Hosts in ALERT_CALLBACK_ALLOW_HOSTS skip the address check. Alerts are never sent to
+    loopback, private, link-local (e.g. cloud metadata), multicast or reserved addresses,
+    so subscriptions cannot be used to reach the server's own network.
+
+    Raises:
+        ValueError: If the URL is not allowed.
+    """
+    url = urlsplit(str(callback_url or ''))
+    if url.scheme not in ('http', 'https') or not url.hostname:
+        raise ValueError("The callback_url must be an http(s) URL")
+    host = url.hostname.lower()
+    if host in ALERT_CALLBACK_ALLOW_HOSTS:
+        return
+    try:
+        infos = socket.getaddrinfo(host, url.port or (443 if url.scheme == 'https' else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError, ValueError):
+        raise ValueError(f"The callback_url host {host} does not resolve") from None
+    for info in infos:
+        _check_address(host, info[4][0])
+
+
+def _check_address(host, address):
+    """Raises ValueError unless `address` (an IP string `host` resolved to) is public."""
+    address = ipaddress.ip_address(address.split('%', 1)[0])
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    if not address.is_global or address.is_multicast:
+        raise ValueError(f"The callback_url host {host} is not a public address")
+
+
+def _delivery_session():
+    """Returns a requests session that only connects to addresses `check_callback_url` allows.
+
+    The peer of every new connection is checked before anything is sent on it, so a
+    host that resolved to a public address for the check and resolves to a private one
+    when connecting (DNS rebinding) is still refused. Proxy settings from the
+    environment are ignored, as the peer would then be the proxy.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class PeerCheck:
+        def _new_conn(self):
+            sock = super()._new_conn()
+            if self.host.lower() not in ALERT_CALLBACK_ALLOW_HOSTS:
+                try:
+                    _check_address(self.host, sock.getpeername()[0])
+                except ValueError:
+                    sock.close()
+                    raise
+            return sock
+
+    class CheckedHTTPConnection(PeerCheck, HTTPConnection):
+        pass
+
+    class CheckedHTTPSConnection(PeerCheck, HTTPSConnection):
+        pass
+
+    class CheckedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CheckedHTTPConnection
+
+    class CheckedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CheckedHTTPSConnection
+
+    class CheckedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {'http': CheckedHTTPConnectionPool,
+                                                       'https': CheckedHTTPSConnectionPool}
+
+    session = requests.Session()
+    session.trust_env = False
+    session.mount('http://', CheckedAdapter())
+    session.mount('https://', CheckedAdapter())
+    return session
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class SubscriptionMatcher:
+    """All subscriptions compiled into hash lookups on normalized Area/Feeder tokens.
+
+    A row is matched by looking up each of its tokens (every location of its Area, and
+    its Feeder) in the exact-pattern table, and each prefix of the token in the
+    prefix-pattern table. The cost per row depends on its tokens, not on how many
+    subscriptions there are.
+    """
+
+    def __init__(self, subscriptions):
+        self.subscriptions = {}
+        self._exact = {kind: {} for kind in KINDS}
+        self._prefix = {kind: {} for kind in KINDS}
+        for subscription in subscriptions:
+            self.subscriptions[subscription['id']] = subscription
+            pattern = subscription['pattern']
+            table = self._prefix if pattern.endswith('*') else self._exact
+            table[subscription['kind']].setdefault(pattern.rstrip('*'), []).append(subscription['id'])
+
+    def match_token(self, kind, token):
+        """Returns the ids of the subscriptions of a kind matching one normalized token."""
+        matched = list(self._exact[kind].get(token, ()))
+        prefixes = self._prefix[kind]
+        if prefixes:
+            for end in range(1, len(token) + 1):
+                matched.extend(prefixes.get(token[:end], ()))
+        return matched
+
+    def match(self, frame):
+        """Matches a frame of outage rows.
+
+        Each distinct Area and Feeder value is tokenized and looked up once.
+
+        Returns:
+            list: (row position, subscription id, matched token) for every match, one per
+                  subscription and row.
+        """
+        if frame.empty or not self.subscriptions:
+            return []
+        per_value = {}
+        for kind, column in (('area', 'Area'), ('feeder', 'Feeder')):
+            codes, values = pd.factorize(frame[column])
+            hits = []
+            for value in values:
+                if kind == 'area':
+                    tokens = [normalize_location(location) for location in split_locations(value)]
+                else:
+                    tokens = [feeder_key(value)]
+                hits.append([(subscription_id, token) for token in tokens
+                             for subscription_id in self.match_token(kind, token)])
+            per_value[kind] = (codes, hits)
+
+        matches = []
+        for position in range(len(frame)):
+            seen = set()
+            for codes, hits in per_value.values():
+                code = codes[position]
+                if code < 0:
+                    continue
+                for subscription_id, token in hits[code]:
+                    if subscription_id not in seen:
+                        seen.add(subscription_id)
+                        matches.append((position, subscription_id, token))
+        return matches
+
+
+class AlertStore:
+    """Subscriptions, the delivery queue and the matching cursor, in one SQLite database."""
+
+    def __init__(self, path=ALERTS_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        self._matcher = (None, None)  # (subscriptions_version, SubscriptionMatcher)
+        self._wake = threading.Event()
+        self._delivery_pid = None
+        self._session = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def add_subscription(self, subscriber, kind, pattern, callback_url):
+        """Registers a subscription.
+
+        Args:
+            subscriber (str): Who is subscribing (free text, used for listing).
+            kind (str): 'area' or 'feeder'.
+            pattern (str): A location or feeder name; a trailing '*' matches any name
+                           starting with it. Case, spacing and punctuation are ignored.
+            callback_url (str): The http(s) URL alerts are POSTed to (see `check_callback_url`).
+
+        Returns:
+            dict: The stored subscription.
+
+        Raises:
+            ValueError: If any argument is invalid.
+        """
+        subscriber = str(subscriber or '').strip()
+        if not subscriber:
+            raise ValueError("The subscriber is required")
+        pattern = normalize_pattern(kind, pattern)
+        check_callback_url(callback_url)
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    'INSERT INTO subscriptions (subscriber, kind, pattern, callback_url, created_at) '
+                    'VALUES (?, ?, ?, ?, ?)', (subscriber, kind, pattern, callback_url, time.time()))
+                conn.execute('UPDATE alert_state SET subscriptions_version = subscriptions_version + 1')
+                subscription_id = cursor.lastrowid
+        finally:
+            conn.close()
+        return {"id": subscription_id, "subscriber": subscriber, "kind": kind, "pattern": pattern,
+                "callback_url": callback_url}
+
+    def issue_token(self, subscriber):
+        """Creates a subscriber's bearer token, replacing any previous one.
+
+        Returns:
+            str: The token. Only its hash is stored, so it cannot be shown again.
+        """
+        subscriber = str(subscriber or '').strip()
+        if not subscriber:
+            raise ValueError("The subscriber is required")
+        token = secrets.token_urlsafe(32)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('INSERT INTO subscribers (name, token_hash, created_at) VALUES (?, ?, ?) '
+                             'ON CONFLICT (name) DO UPDATE SET token_hash = excluded.token_hash',
+                             (subscriber, _token_hash(token), time.time()))
+        finally:
+            conn.close()
+        return token
+
+    def authenticate(self, token):
+        """Returns who a bearer token belongs to.
+
+        Returns:
+            tuple: (subscriber name or None, is_admin). (None, False) for unknown tokens.
+        """
+        if not token:
+            return None, False
+        if ALERTS_ADMIN_KEY and hmac.compare_digest(token.encode('utf-8'), ALERTS_ADMIN_KEY.encode('utf-8')):
+            return None, True
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT name FROM subscribers WHERE token_hash = ?', (_token_hash(token),)).fetchone()
+        finally:
+            conn.close()
+        return (row['name'] if row else None), False
+
+    def remove_subscription(self, subscription_id, subscriber=None):
+        """Deletes a subscription and its pending deliveries.
+
+        With `subscriber`, only a subscription of that subscriber is deleted.
+
+        Returns:
+            bool: False if there was no such subscription.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                query, params = 'DELETE FROM subscriptions WHERE id = ?', (subscription_id,)
+                if subscriber is not None:
+                    query, params = query + ' AND subscriber = ?', params + (subscriber,)
+                removed = conn.execute(query, params).rowcount
+                if removed:
+                    conn.execute('DELETE FROM deliveries WHERE subscription_id = ? AND status = ?',
+                                 (subscription_id, PENDING))
+                    conn.execute('UPDATE alert_state SET subscriptions_version = subscriptions_version + 1')
+        finally:
+            conn.close()
+        return bool(removed)
+
+    def subscriptions(self, subscriber=None):
+        """Returns the subscriptions, optionally of one subscriber only, oldest first."""
+        conn = self._connect()
+        try:
+            query = 'SELECT id, subscriber, kind, pattern, callback_url, created_at FROM subscriptions'
+            params = ()
+            if subscriber is not None:
+                query += ' WHERE subscriber = ?'
+                params = (subscriber,)
+            return [dict(row) for row in conn.execute(query + ' ORDER BY id', params)]
+        finally:
+            conn.close()
+
+    def matcher(self):
+        """Returns the matcher for the current subscriptions, recompiled only when they changed."""
+        conn = self._connect()
+        try:
+            version = conn.execute('SELECT subscriptions_version FROM alert_state').fetchone()[0]
+        finally:
+            conn.close()
+        cached_version, matcher = self._matcher
+        if cached_version != version:
+            matcher = SubscriptionMatcher(self.subscriptions())
+            self._matcher = (version, matcher)
+        return matcher
+
+    def process(self, history):
+        """Matches the history rows added since the last call and queues their alerts.
+
+        On the very first call the cursor starts at the end of the history, so existing
+        rows never trigger alerts.
+
+        Args:
+            history (HistoryStore): The outage history.
+
+        Returns:
+            int: The number of alerts queued.
+        """
+        conn = self._connect()
+        try:
+            last_id = conn.execute('SELECT last_history_id FROM alert_state').fetchone()[0]
+        finally:
+            conn.close()
+        if last_id is None:
+            last_id = history.max_id()
+            self._set_cursor(None, last_id)
+            return 0
+        if history.max_id() <= last_id:
+            return 0
+
+        frame, new_id = history.rows_since(last_id)
+        matcher = self.matcher()
+        matches = matcher.match(frame)
+        now = time.time()
+        deliveries = []
+        if matches:
+            outages = _outage_records(frame)
+            for position, subscription_id, token in matches:
+                subscription = matcher.subscriptions[subscription_id]
+                payload = {
+                    "subscription_id": subscription_id,
+                    "subscriber": subscription['subscriber'],
+                    "kind": subscription['kind'],
+                    "pattern": subscription['pattern'],
+                    "matched": token,
+                    "outage": outages[position],
+                }
+                deliveries.append((subscription_id, subscription['callback_url'], json.dumps(payload),
+                                   PENDING, now, now))
+                metrics.inc('alerts_matched_total', kind=subscription['kind'])
+        self._set_cursor(deliveries, new_id, expected=last_id)
+        if deliveries:
+            print(f"Queued {len(deliveries)} alerts for {len(frame)} new rows.")
+            self._wake.set()
+        return len(deliveries)
+
+    def _set_cursor(self, deliveries, new_id, expected=None):
+        """Queues deliveries and moves the cursor in one transaction (so nothing is sent twice)."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                current = conn.execute('SELECT last_history_id FROM alert_state').fetchone()[0]
+                if current != expected:
+                    return  # Another process matched these rows already.
+                if deliveries:
+                    conn.executemany(
+                        'INSERT INTO deliveries (subscription_id, callback_url, payload, status, '
+                        'next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)', deliveries)
+                conn.execute('UPDATE alert_state SET last_history_id = ?', (new_id,))
+        finally:
+            conn.close()
+
+    def queue_counts(self):
+        """Returns the number of deliveries per status."""
+        conn = self._connect()
+        try:
+            return dict(conn.execute('SELECT status, COUNT(*) FROM deliveries GROUP BY status').fetchall())
+        finally:
+            conn.close()
+
+    def start_delivery(self):
+        """Starts this process's webhook delivery thread, if it is not running yet."""
+        pid = os.getpid()
+        if self._delivery_pid == pid:
+            return
+        self._delivery_pid = pid
+        threading.Thread(target=self._delivery_loop, name='alert-delivery', daemon=True).start()
+
+    def _delivery_loop(self):
+        while True:
+            try:
+                self.deliver_due()
+                self._prune()
+            except Exception as e:
+                print(f"Alert delivery failed: {e}")
+            self._wake.wait(ALERT_POLL_SECONDS)
+            self._wake.clear()
+
+    def deliver_due(self, now=None):
+        """POSTs every due delivery, in batches of ALERT_BATCH_SIZE per callback URL.
+
+        A batch is acknowledged by any 2xx response. Otherwise each of its deliveries is
+        rescheduled with jittered exponential backoff, up to ALERT_MAX_ATTEMPTS attempts.
+        Callback URLs are checked again before posting (their host may since resolve to a
+        private address), the address actually connected to is checked too (see
+        `_delivery_session`), and redirects are not followed.
+
+        Returns:
+            dict: Counts of deliveries delivered, retried and failed.
+        """
+        import requests
+
+        if self._session is None:
+            self._session = _delivery_session()
+        now = time.time() if now is None else now
+        stats = {DELIVERED: 0, 'retry': 0, FAILED: 0}
+        conn = self._connect()
+        try:
+            due = conn.execute(
+                'SELECT id, callback_url, payload, attempts FROM deliveries '
+                'WHERE status = ? AND next_attempt_at <= ? ORDER BY id', (PENDING, now)).fetchall()
+        finally:
+            conn.close()
+        by_url = {}
+        for row in due:
+            by_url.setdefault(row['callback_url'], []).append(row)
+
+        for url, rows in by_url.items():
+            for start in range(0, len(rows), ALERT_BATCH_SIZE):
+                batch = rows[start:start + ALERT_BATCH_SIZE]
+                # Each alert carries its delivery id, so receivers can drop repeats after a retry.
+                body = json.dumps({"alerts": [{"id": row['id'], **json.loads(row['payload'])} for row in batch]})
+                try:
+                    check_callback_url(url)
+                    response = self._session.post(url, data=body.encode('utf-8'), timeout=ALERT_TIMEOUT_SECONDS,
+                                                  headers={'Content-Type': 'application/json'},
+                                                  allow_redirects=False)
+                    error = None if 200 <= response.status_code < 300 else f'HTTP {response.status_code}'
+                except ValueError as e:
+                    error = f'Rejected: {e}'
+                except requests.exceptions.RequestException as e:
+                    error = f'{type(e).__name__}: {e}'
+                self._record_attempt(batch, error, stats)
+                if error:
+                    # The endpoint is failing; leave its other batches for their retry.
+                    break
+        return stats
+
+    def _record_attempt(self, batch, error, stats):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                for row in batch:
+                    attempts = row['attempts'] + 1
+                    if error is None:
+                        conn.execute('UPDATE deliveries SET status = ?, attempts = ?, last_error = NULL, '
+                                     'next_attempt_at = ? WHERE id = ?', (DELIVERED, attempts, now, row['id']))
+                        result = DELIVERED
+                    elif attempts >= ALERT_MAX_ATTEMPTS:
+                        conn.execute('UPDATE deliveries SET status = ?, attempts = ?, last_error = ? WHERE id = ?',
+                                     (FAILED, attempts, error, row['id']))
+                        result = FAILED
+                    else:
+                        backoff = min(ALERT_MAX_BACKOFF_SECONDS,
+                                      random.uniform(0, ALERT_BACKOFF_BASE_SECONDS * 2 ** attempts))
+                        conn.execute('UPDATE deliveries SET attempts = ?, last_error = ?, next_attempt_at = ? '
+                                     'WHERE id = ?', (attempts, error, now + backoff, row['id']))
+                        result = 'retry'
+                    stats[result] += 1
+                    metrics.inc('alert_deliveries_total', result=result)
+        finally:
+            conn.close()
+        if error:
+            print(f"Posting {len(batch)} alerts to {batch[0]['callback_url']} failed: {error}")
+
+    def _prune(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM deliveries WHERE status = ? AND next_attempt_at < ?',
+                             (DELIVERED, time.time() - ALERT_RETENTION_SECONDS))
+        finally:
+            conn.close()
+
+
+def _outage_records(frame):
+    """Returns the rows of a canonical frame as JSON-ready dicts."""
+    columns = [column for column in FRAME_COLUMNS if column in frame.columns]
+    values = [date_strings(frame['Date']).tolist()] + [frame[column].astype(str).tolist() for column in columns[1:]]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def make_sink(port, fail_rate=0.0, host='127.0.0.1'):
+    """Creates a local webhook sink for testing; call serve_forever() on the result.
+
+    Every POSTed batch is appended to `server.received` (and printed). With `fail_rate`,
+    that fraction of requests is answered with a 503 instead, to exercise retries; it can
+    be changed on the running server as `server.fail_rate`.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            server.attempts += 1
+            if random.random() < server.fail_rate:
+                self.send_error(503)
+                return
+            batch = json.loads(body)
+            server.received.append(batch)
+            for alert in batch['alerts']:
+                outage = alert['outage']
+                print(f"[{alert['subscriber']}] {alert['kind']} {alert['pattern']!r}: {outage['Date']} "
+                      f"{outage['Feeder']} {outage['Status']} - {outage['Area']}")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.received = []
+    server.attempts = 0
+    server.fail_rate = fail_rate
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Outage alert tools.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    sink = commands.add_parser('sink', help="run a local webhook sink that prints the alerts it receives")
+    sink.add_argument('--port', type=int, default=8940)
+    sink.add_argument('--fail-rate', type=float, default=0.0, help="fraction of requests to answer with 503")
+    commands.add_parser('status', help="show the subscriptions and the delivery queue")
+    token = commands.add_parser('token', help="issue (or replace) a subscriber's API token")
+    token.add_argument('subscriber')
+    args = parser.parse_args(argv)
+
+    if args.command == 'sink':
+        print(f"Webhook sink listening on http://127.0.0.1:{args.port}/")
+        make_sink(args.port, args.fail_rate).serve_forever()
+    elif args.command == 'token':
+        print(AlertStore().issue_token(args.subscriber))
+    else:
+        store = AlertStore()
+        for subscription in store.subscriptions():
+            print(f"#{subscription['id']} {subscription['subscriber']}: {subscription['kind']} "
+                  f"{subscription['pattern']!r} -> {subscription['callback_url']}")
+        print(f"Deliveries: {store.queue_counts()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,28 @@
+import numpy as np
 import pandas as pd
 
+from classifier import classify_reasons
+from location_index import normalize_location, split_locations
+from metrics import timed
+from outage_frame import category_counts, category_mask, row_weights
+
+# Snapshots are canonical (see outage_frame.canonicalize): 'Date' is datetime64 and the
+# text columns are categoricals. Filters like "not 'Unknown'" are evaluated once per
+# distinct value and counts are taken on the integer codes, so no per-row string
+# normalization or DataFrame copies are needed. Plain string columns still work; they
+# are dictionary-encoded on the fly. Frames that combine raw rows with the aggregates
+# compacted by retention.py carry a 'Count' column, and every count is weighted by it.
+
+def _is_known_feeder(categories):
+    return categories.str.upper() != 'UNKNOWN'
+
+def _is_specified(categories):
+    return categories.str.lower() != 'not specified'
+
+def _is_specified_and_not_blank(categories):
+    return (categories.str.lower() != 'not specified') & (categories.str.strip() != '')
+
+@timed('analysis_seconds', function='feeder_outage_counts')
 def feeder_outage_counts(df):
     """Counts how often each feeder appears in the outage data.
 
@@ -13,8 +36,9 @@ def feeder_outage_counts(df):
     if df.empty or 'Feeder' not in df.columns:
         return pd.Series(dtype='int64')
     # Filter out 'UNKNOWN' feeders before counting
-    return df[df['Feeder'].str.upper() != 'UNKNOWN']['Feeder'].value_counts()
+    return category_counts(df['Feeder'], keep=_is_known_feeder, weights=row_weights(df))
 
+@timed('analysis_seconds', function='top_affected_areas')
 def top_affected_areas(df, n=5):
     """Counts how often each area is affected and returns the top N.
 
@@ -29,8 +53,9 @@ def top_affected_areas(df, n=5):
     if df.empty or 'Area' not in df.columns:
         return pd.Series(dtype='int64')
     # Filter out 'NOT SPECIFIED' areas before counting
-    return df[df['Area'].str.lower() != 'not specified']['Area'].value_counts().nlargest(n)
+    return category_counts(df['Area'], keep=_is_specified, weights=row_weights(df)).head(n)
 
+@timed('analysis_seconds', function='get_frequent_reasons')
 def get_frequent_reasons(df, n=5):
     """Counts the occurrences of each outage reason and returns the top N.
 
@@ -44,13 +69,33 @@ def get_frequent_reasons(df, n=5):
     """
     if df.empty or 'Reason' not in df.columns:
         return pd.Series(dtype='int64')
-    # Filter out 'NOT SPECIFIED' or empty reasons before counting
-    valid_reasons = df[(df['Reason'].str.lower() != 'not specified') & 
-                       (df['Reason'].str.strip() != '')]
-    if valid_reasons.empty:
+    # Filter out 'NOT SPECIFIED' or empty reasons before counting. Compacted rows have
+    # no reason, so these are the reasons of the raw rows only.
+    return category_counts(df['Reason'], keep=_is_specified_and_not_blank, weights=row_weights(df)).head(n)
+
+@timed('analysis_seconds', function='get_cause_distribution')
+def get_cause_distribution(df):
+    """Counts outages per cause category (see classifier.py), most frequent first.
+
+    Args:
+        df (pandas.DataFrame): DataFrame with outage data, expecting a 'Cause' or 'Reason' column.
+
+    Returns:
+        pandas.Series: A Series with cause categories and their counts, without empty categories.
+                       Returns an empty Series if neither column is present or df is empty.
+    """
+    if df.empty:
+        return pd.Series(dtype='int64')
+    if 'Cause' in df.columns:
+        causes = df['Cause']
+    elif 'Reason' in df.columns:
+        # Frames from before causes were classified on ingestion
+        causes = classify_reasons(df['Reason'])
+    else:
         return pd.Series(dtype='int64')
-    return valid_reasons['Reason'].value_counts().nlargest(n)
+    return category_counts(causes, weights=row_weights(df))
 
+@timed('analysis_seconds', function='get_status_distribution')
 def get_status_distribution(df):
     """Counts the occurrences of each status.
 
@@ -63,14 +108,17 @@ def get_status_distribution(df):
     """
     if df.empty or 'Status' not in df.columns:
         return pd.Series(dtype='int64')
-    return df['Status'].value_counts()
+    return category_counts(df['Status'], weights=row_weights(df))
 
-def get_location_data(df, location):
+@timed('analysis_seconds', function='get_location_data')
+def get_location_data(df, location, index=None):
     """Filters outage data for a specific location/area.
 
     Args:
         df (pandas.DataFrame): DataFrame with outage data, expecting an 'Area' column.
         location (str): The location/area to filter for.
+        index (LocationIndex): Optional index built from df. When given, only the matching
+                               rows are touched instead of scanning every Area string.
 
     Returns:
         pandas.DataFrame: Filtered DataFrame containing only rows where 'Area' contains the location.
@@ -78,33 +126,80 @@ def get_location_data(df, location):
     """
     if df.empty or 'Area' not in df.columns or not location:
         return pd.DataFrame(columns=df.columns if not df.empty else ['Date', 'Feeder', 'Status', 'Reason', 'Area'])
-    
+
+    if index is not None:
+        return df.iloc[index.lookup(location)]
+
     # Case-insensitive search for location in Area column
-    return df[df['Area'].str.contains(location, case=False, na=False)]
+    return df[df['Area'].str.contains(location, case=False, na=False, regex=False)]
+
+@timed('analysis_seconds', function='filter_rows')
+def filter_rows(df, date_from=None, date_to=None, feeder=None, status=None, area=None, index=None):
+    """Finds the rows matching a set of optional filters.
+
+    Args:
+        df (pandas.DataFrame): DataFrame with outage data.
+        date_from (str): Earliest date to include, as 'YYYY-MM-DD'.
+        date_to (str): Latest date to include, as 'YYYY-MM-DD'.
+                       Invalid dates raise ValueError.
+        feeder (str): Feeder name (case-insensitive exact match).
+        status (str): Status (case-insensitive exact match).
+        area (str): Location contained in 'Area', as in get_location_data.
+        index (LocationIndex): Optional index built from df, used for the area filter.
 
+    Returns:
+        numpy.ndarray: Sorted positions of the matching rows.
+    """
+    if df.empty:
+        return np.array([], dtype=np.intp)
+    mask = np.ones(len(df), dtype=bool)
+    dates = pd.to_datetime(df['Date'], errors='coerce') # No-op for canonical frames
+    if date_from:
+        mask &= (dates >= pd.Timestamp(date_from)).to_numpy()
+    if date_to:
+        mask &= (dates <= pd.Timestamp(date_to)).to_numpy()
+    if feeder:
+        feeder = feeder.strip().upper()
+        mask &= category_mask(df['Feeder'], lambda categories: categories.str.upper() == feeder)
+    if status:
+        status = status.strip().lower()
+        mask &= category_mask(df['Status'], lambda categories: categories.str.lower() == status)
+    positions = np.flatnonzero(mask)
+    if area:
+        if index is not None:
+            area_positions = index.lookup(area)
+        else:
+            area_positions = np.flatnonzero(df['Area'].str.contains(area, case=False, na=False, regex=False).to_numpy())
+        positions = np.intersect1d(positions, area_positions, assume_unique=True)
+    return positions
+
+@timed('analysis_seconds', function='get_all_locations')
 def get_all_locations(df):
-    """Extracts all unique locations/areas from the outage data.
+    """Extracts all unique individual locations from the outage data.
+
+    'Area' holds comma-separated lists of places, so each list is split into its
+    individual locations; spellings that differ only in case or spacing are merged.
 
     Args:
         df (pandas.DataFrame): DataFrame with outage data, expecting an 'Area' column.
 
     Returns:
-        list: A sorted list of all unique area names.
+        list: A sorted list of all unique location names.
               Returns an empty list if 'Area' not in df.columns or df is empty.
     """
     if df.empty or 'Area' not in df.columns:
         return []
-    
-    # Filter out 'NOT SPECIFIED' areas and empty strings
-    valid_areas = df[(df['Area'].str.lower() != 'not specified') & 
-                     (df['Area'].str.strip() != '')]
-    if valid_areas.empty:
-        return []
-    
-    # Extract unique areas and sort alphabetically
-    areas = valid_areas['Area'].unique().tolist()
-    return sorted(areas)
 
+    # Split each distinct Area value once; 'Not specified' and empty values yield nothing
+    areas = df['Area']
+    distinct_areas = category_counts(areas).index if isinstance(areas.dtype, pd.CategoricalDtype) else areas.unique()
+    locations = {}
+    for area in distinct_areas:
+        for location in split_locations(area):
+            locations.setdefault(normalize_location(location), location)
+    return [locations[key] for key in sorted(locations)]
+
+@timed('analysis_seconds', function='get_outage_summary')
 def get_outage_summary(df):
     """Generates a summary of outage data for the API.
 
@@ -113,31 +208,29 @@ def get_outage_summary(df):
 
     Returns:
         dict: A dictionary containing top faulty feeders, top affected areas,
-              frequent reasons, status distribution, and all locations.
+              frequent reasons and status distribution.
     """
     if df.empty:
         return {
             "top_faulty_feeders": {},
             "top_affected_areas": {},
             "frequent_reasons": {},
-            "status_distribution": {},
-            "all_locations": []
+            "status_distribution": {}
         }
 
     top_feeders = feeder_outage_counts(df).nlargest(5) # Get top 5 faulty feeders
     top_areas = top_affected_areas(df, n=5)       # Get top 5 affected areas
     reasons = get_frequent_reasons(df, n=5)       # Get top 5 frequent reasons
     statuses = get_status_distribution(df)        # Get distribution of statuses
-    locations = get_all_locations(df)             # Get all unique locations
 
     return {
         "top_faulty_feeders": top_feeders.to_dict(),
         "top_affected_areas": top_areas.to_dict(),
         "frequent_reasons": reasons.to_dict(),
-        "status_distribution": statuses.to_dict(),
-        "all_locations": locations
+        "status_distribution": statuses.to_dict()
     }
 
+@timed('analysis_seconds', function='group_by_date_for_trend_analysis')
 def group_by_date_for_trend_analysis(df):
     """Groups outage data by date to show daily outage counts (trends).
 
@@ -152,20 +245,20 @@ def group_by_date_for_trend_analysis(df):
     if df.empty or 'Date' not in df.columns:
         return pd.Series(dtype='int64')
 
-    # Ensure 'Date' column is in datetime format
-    # The cnn_parser should already format this, but good to be robust
-    try:
-        # Create a copy to avoid SettingWithCopyWarning if df is a slice
-        df_copy = df.copy()
-        df_copy['ParsedDate'] = pd.to_datetime(df_copy['Date'], errors='coerce')
-        # Drop rows where date parsing failed
-        df_copy.dropna(subset=['ParsedDate'], inplace=True)
-        if df_copy.empty:
-            return pd.Series(dtype='int64')
-        return df_copy.groupby(df_copy['ParsedDate'].dt.date).size()
-    except Exception as e:
-        print(f"Error processing date for trend analysis: {e}")
+    dates = df['Date']
+    if not pd.api.types.is_datetime64_dtype(dates):
+        # Not a canonical frame: parse the dates; rows that fail to parse are dropped
+        dates = pd.to_datetime(dates, errors='coerce').dt.normalize()
+    weights = row_weights(df)
+    if weights is None:
+        counts = dates.dropna().value_counts(sort=False).sort_index()
+    else:
+        counts = pd.Series(weights, index=dates.to_numpy()).loc[dates.notna().to_numpy()]
+        counts = counts.groupby(level=0).sum().sort_index()
+    if counts.empty:
         return pd.Series(dtype='int64')
+    counts.index = counts.index.date
+    return counts
 
 if __name__ == '__main__':
     # Create a sample DataFrame for testing, matching cnn_parser.py output
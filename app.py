@@ -1,99 +1,367 @@
-from flask import Flask, jsonify, render_template, request
-import pandas as pd
-from cnn_parser import scrape_outage_data
+from flask import Flask, Response, g, jsonify, render_template, request, send_file, stream_with_context
+import base64
+import numpy as np
+import time
+from datetime import datetime
+import materialized
+import reliability
+import retention
+import serialization
+from alerts import AlertStore
+from export import FORMATS as EXPORT_FORMATS, ExportStore
+from location_index import LocationIndex
+from outage_frame import empty_frame
+import metrics
+from history_store import TREND_DIMENSIONS, TREND_GRANULARITIES, HistoryStore
+from pipeline import build_snapshot
+from refresher import Snapshot, SnapshotRefresher
+from snapshot_store import SnapshotStore
+from stream import EventBroadcaster
 from analysis import (
     get_outage_summary as get_analysis_summary, 
-    group_by_date_for_trend_analysis,
     get_frequent_reasons,
+    get_cause_distribution,
     get_status_distribution,
     get_location_data,
-    get_all_locations
+    filter_rows
 )
 import os
 
 app = Flask(__name__)
+# jsonify encodes with orjson, DataFrames included, and compresses as the client accepts.
+app.json = serialization.JSONProvider(app)
 
-# In-memory cache for the scraped data
-# For a production app, consider a more robust caching mechanism or a database
-CACHED_DATA = None
+# Set SERVER_TIMING=1 to add a Server-Timing header with per-stage timings to responses.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+# The scraped data is held in a versioned snapshot that is rebuilt every
+# REFRESH_INTERVAL_SECONDS. Only one gunicorn worker (the store's writer) scrapes; it
+# merges each scrape into the persistent outage history and publishes the accumulated
+# history as an Arrow file that every worker maps and swaps to as new versions appear.
+# Requests are served from the last good snapshot and never wait on a scrape, except
+# for the very first one after boot.
+SNAPSHOT_STORE = SnapshotStore()
+HISTORY_STORE = HistoryStore()
+# The writer also keeps the history exported as monthly Parquet/Arrow partitions for /api/export.
+EXPORT_STORE = ExportStore()
+# ...and matches the rows each scrape adds against the alert subscriptions.
+ALERT_STORE = AlertStore()
+# With RETENTION_HOT_DAYS set, the writer compacts older rows into daily and monthly counts.
+RETENTION = retention.RetentionPolicy()
+REFRESHER = SnapshotRefresher(
+    lambda current: build_snapshot(SNAPSHOT_STORE, HISTORY_STORE, current, EXPORT_STORE, ALERT_STORE, RETENTION))
+
+# Each worker pushes an event to its open /api/stream connections whenever it starts
+# serving a new snapshot version (see on_new_snapshot below).
+BROADCASTER = EventBroadcaster()
+
+# Served when even the first scrape could not produce a snapshot
+EMPTY_SNAPSHOT = Snapshot(empty_frame(), 0)
+
+def get_snapshot():
+    """Returns the current snapshot, waiting for the first scrape if there is none yet."""
+    return REFRESHER.get() or EMPTY_SNAPSHOT
 
 def get_data():
-    """Helper function to get data, using cache if available."""
-    global CACHED_DATA
-    if CACHED_DATA is None:
-        print("No cached data. Scraping new data...")
-        CACHED_DATA = scrape_outage_data()
-        if CACHED_DATA.empty:
-            print("Scraping returned no data. Cache remains empty.")
-            # Return a default structure if scraping fails, to prevent errors downstream
-            return pd.DataFrame(columns=['Date', 'Feeder', 'Status', 'Reason', 'Area'])
-        print(f"Data scraped successfully. {len(CACHED_DATA)} rows found.")
-    else:
-        print("Using cached data.")
-    return CACHED_DATA
+    """Helper function to get the data from the current snapshot."""
+    snapshot = get_snapshot()
+    if snapshot.frame.empty:
+        print("No data in the current snapshot.")
+        # Return a default structure if scraping fails, to prevent errors downstream
+        return empty_frame()
+    return snapshot.frame
+
+@app.before_request
+def start_refresher():
+    """Starts this process's background refresher on its first request (see the end of the module)."""
+    REFRESHER.start()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if SERVER_TIMING:
+        metrics.start_request_timings()
+
+@app.after_request
+def add_snapshot_headers(response):
+    """Exposes the version and age of the snapshot a response was served from."""
+    snapshot = REFRESHER.snapshot
+    if snapshot is not None:
+        response.headers['X-Snapshot-Version'] = str(snapshot.version)
+        response.headers['X-Snapshot-Age'] = str(int(snapshot.age_seconds))
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    """Records the request latency per route and, if enabled, the Server-Timing header."""
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('http_request_seconds', elapsed, route=route, method=request.method,
+                    status=str(response.status_code))
+    if SERVER_TIMING:
+        stages = metrics.pop_request_timings()
+        response.headers['Server-Timing'] = ', '.join(
+            [f'{name};dur={seconds * 1000:.2f}' for name, seconds in stages] +
+            [f'total;dur={elapsed * 1000:.2f}']
+        )
+    return response
 
 @app.route('/')
 def dashboard():
     """Serves the frontend dashboard."""
     return render_template('dashboard.html')
 
+# /api/data page sizes
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+# Rows serialized per chunk when streaming NDJSON
+STREAM_CHUNK_ROWS = 5000
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(str(position).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode()).decode())
+
+def stream_ndjson(df, positions, fields):
+    """Yields the selected rows as NDJSON, one bounded chunk at a time."""
+    for start in range(0, len(positions), STREAM_CHUNK_ROWS):
+        yield serialization.encode_lines(df.iloc[positions[start:start + STREAM_CHUNK_ROWS]][fields])
+
+def requested_limit(default=None):
+    """Returns the 'limit' query parameter, or `default` when it is not given.
+
+    Raises:
+        ValueError: If the limit is not a positive integer.
+    """
+    value = request.args.get('limit')
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError("The 'limit' parameter must be a positive integer.")
+    return limit
+
+def requested_orient():
+    """Returns how the request wants rows laid out: ?format=columns, or records by default."""
+    return 'columns' if request.args.get('format') == 'columns' else 'records'
+
 @app.route('/api/data')
 def get_all_data():
-    """Returns the full cleaned outage data as JSON."""
-    df = get_data()
+    """Returns the cleaned outage data as JSON.
+
+    Query parameters (all optional):
+        fields: Comma-separated columns to return (default: all).
+        from, to: Inclusive date range, as YYYY-MM-DD.
+        feeder, status, area: Filters, as in /api/location-data for area.
+        limit, cursor: Cursor pagination. The response is then an object with the page
+                       under "data" and the cursor of the next page under "next_cursor".
+        format: ndjson streams every matching row as newline-delimited JSON; columns
+                returns the rows as {"columns": [names], "data": [one list per column]}
+                instead of a list of records (also for "data" when paginating).
+
+    Without limit/cursor/format the full list of records is returned, as before. Rows are
+    the raw history; with a retention policy, only its hot window.
+    """
+    snapshot = get_snapshot()
+    df = snapshot.frame
     if df.empty:
         return jsonify({"error": "No data available"}), 500
-    return jsonify(df.to_dict(orient='records'))
 
-@app.route('/api/outage-summary')
-def get_outage_summary_endpoint(): 
-    """Returns top faulty feeders, most affected areas, frequent reasons, status distribution, and all locations."""
-    df = get_data()
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    unknown = [field for field in fields if field not in df.columns]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}", "fields": list(df.columns)}), 400
+    fields = fields or list(df.columns)
+
+    area = request.args.get('area')
+    try:
+        positions = filter_rows(
+            df,
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            feeder=request.args.get('feeder'),
+            status=request.args.get('status'),
+            area=area,
+            index=LocationIndex.for_snapshot(snapshot) if area else None
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid date. Use YYYY-MM-DD for 'from' and 'to'."}), 400
+
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(stream_ndjson(df, positions, fields)),
+                        mimetype='application/x-ndjson')
+
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return serialization.json_response(df.iloc[positions][fields], orient=requested_orient())
+
+    try:
+        limit = min(requested_limit(DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Cursors are history row ids, which stay valid across snapshot versions even when
+    # compaction removes rows; rows are in id order.
+    ids = df.index.to_numpy()
+    start = 0
+    if request.args.get('cursor'):
+        try:
+            start = int(np.searchsorted(ids[positions], decode_cursor(request.args['cursor'])))
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+    page = positions[start:start + limit]
+    has_more = start + limit < len(positions)
+    return serialization.json_response({
+        "data": df.iloc[page][fields],
+        "count": len(page),
+        "total": len(positions),
+        "next_cursor": encode_cursor(int(ids[page[-1]]) + 1) if has_more else None
+    }, orient=requested_orient())
+
+def build_summary(snapshot):
+    """Computes the /api/outage-summary payload for a snapshot, over raw and compacted rows."""
+    df = retention.analysis_frame(snapshot)
     if df.empty:
-        return jsonify({
+        return {
             "error": "No data available to generate summary",
             "top_feeders": {},
             "most_affected_areas": {},
             "frequent_reasons": {},
-            "status_distribution": {},
-            "all_locations": []
-        }), 500
+            "status_distribution": {}
+        }, 500
 
     # Call the consolidated summary function from analysis.py
     summary_data = get_analysis_summary(df) 
     
-    last_updated = pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S') 
+    # The time the data was published, not the time of this request
+    last_updated = datetime.fromtimestamp(snapshot.created_at).strftime('%Y-%m-%d %H:%M:%S')
 
-    return jsonify({
+    return {
         "top_feeders": summary_data.get("top_faulty_feeders", {}),
         "most_affected_areas": summary_data.get("top_affected_areas", {}),
         "frequent_reasons": summary_data.get("frequent_reasons", {}),
         "status_distribution": summary_data.get("status_distribution", {}),
-        "all_locations": summary_data.get("all_locations", []),
         "last_updated": last_updated
+    }, 200
+
+def summary_of(snapshot):
+    """Returns the (payload, status) of /api/outage-summary, computed once per snapshot."""
+    return snapshot.memo('summary', build_summary)
+
+@app.route('/api/outage-summary')
+def get_outage_summary_endpoint(): 
+    """Returns top faulty feeders, most affected areas, frequent reasons and status distribution."""
+    return materialized.serve(get_snapshot(), 'outage-summary', summary_of)
+
+# Summary fields pushed to /api/stream clients when they change
+STREAM_FIELDS = ('top_feeders', 'most_affected_areas', 'frequent_reasons', 'status_distribution')
+
+def on_new_snapshot(previous, snapshot):
+    """Broadcasts which summary fields changed between two snapshot versions."""
+    summary = summary_of(snapshot)[0]
+    old_summary = summary_of(previous)[0] if previous is not None else {}
+    BROADCASTER.publish({
+        "id": str(snapshot.version),
+        "event": "snapshot",
+        "data": {
+            "version": snapshot.version,
+            "previous_version": previous.version if previous is not None else None,
+            "last_updated": summary.get("last_updated"),
+            "changed": {field: summary.get(field) for field in STREAM_FIELDS
+                        if summary.get(field) != old_summary.get(field)}
+        }
     })
 
+REFRESHER.add_listener(on_new_snapshot)
+# Keeps the reliability table current (and incremental) even before anyone asks for it.
+REFRESHER.add_listener(lambda previous, snapshot: reliability.for_snapshot(snapshot))
+
+@app.route('/api/stream')
+def stream_endpoint():
+    """Server-Sent Events stream of new snapshot versions.
+
+    Each "snapshot" event carries the new version, the version it replaces, and the
+    summary fields that changed between the two. The latest event is sent on connect
+    unless the client reconnects with it as its Last-Event-ID. Run gunicorn with the
+    gevent worker (see Procfile) so idle streams do not each hold a worker.
+    """
+    last_id = request.headers.get('Last-Event-ID')
+    return Response(BROADCASTER.stream(last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def build_trends(snapshot):
+    """Computes the default /api/trends payload (daily totals) for a snapshot."""
+    if retention.analysis_frame(snapshot).empty:
+        return {"error": "No data available to generate trends"}, 500
+    return trends_payload(HISTORY_STORE.trend_counts()), 200
+
+def trends_payload(rows, by='total'):
+    """Shapes rollup rows as {bucket: count}, or {bucket: {value: count}} when grouped."""
+    trends = {}
+    for bucket, value, count in rows:
+        if by == 'total':
+            trends[bucket] = count
+        else:
+            trends.setdefault(bucket, {})[value] = count
+    return trends
+
 @app.route('/api/trends')
 def get_outage_trends():
-    """Returns outage trends by date."""
-    df = get_data()
-    if df.empty:
-        return jsonify({"error": "No data available to generate trends"}), 500
+    """Returns outage counts over time, answered from the pre-aggregated daily rollup.
+
+    Query parameters (all optional):
+        from, to: Inclusive date range, as YYYY-MM-DD.
+        granularity: day (default), week (starting Mondays) or month.
+        by: feeder, status or area to break each bucket down; area counts individual
+            locations, so an outage listing several areas counts once for each.
+
+    Buckets are keyed by their first day. Without parameters this is the daily
+    outage count, served as a cached response per snapshot.
+    """
+    if not request.args:
+        return materialized.serve(get_snapshot(), 'trends', build_trends)
+
+    granularity = request.args.get('granularity', 'day')
+    by = request.args.get('by', 'total')
+    if granularity not in TREND_GRANULARITIES:
+        return jsonify({"error": f"Unknown granularity: {granularity}",
+                        "granularities": list(TREND_GRANULARITIES)}), 400
+    if by not in TREND_DIMENSIONS:
+        return jsonify({"error": f"Unknown dimension: {by}", "dimensions": list(TREND_DIMENSIONS)}), 400
+    date_from, date_to = request.args.get('from'), request.args.get('to')
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({"error": "Invalid date. Use YYYY-MM-DD for 'from' and 'to'."}), 400
+
+    rows = HISTORY_STORE.trend_counts(date_from, date_to, granularity, by)
+    return jsonify({
+        "granularity": granularity,
+        "by": by,
+        "trends": trends_payload(rows, by)
+    })
 
-    trends = group_by_date_for_trend_analysis(df)
-    
 @app.route('/api/location-data')
 def get_location_data_endpoint():
-    """Returns outage data for a specific location."""
+    """Returns outage data for a specific location (?format=columns as in /api/data)."""
     location = request.args.get('location', '')
     if not location:
         return jsonify({"error": "Location parameter is required"}), 400
         
-    df = get_data()
+    snapshot = get_snapshot()
+    df = snapshot.frame
     if df.empty:
         return jsonify({"error": "No data available"}), 500
         
-    location_df = get_location_data(df, location)
+    location_df = get_location_data(df, location, LocationIndex.for_snapshot(snapshot))
     if location_df.empty:
         return jsonify({
             "error": f"No data found for location: {location}",
@@ -101,51 +369,292 @@ def get_location_data_endpoint():
             "data": []
         })
         
-    return jsonify({
+    return serialization.json_response({
         "location": location,
-        "data": location_df.to_dict(orient='records'),
+        "data": location_df,
         "count": len(location_df)
-    })
+    }, orient=requested_orient())
     
-@app.route('/api/causes')
-def get_causes_endpoint():
-    """Returns the most frequent outage reasons."""
-    df = get_data()
+def build_causes(snapshot):
+    """Computes the /api/causes payload for a snapshot, over raw and compacted rows."""
+    df = retention.analysis_frame(snapshot)
     if df.empty:
-        return jsonify({"error": "No data available"}), 500
+        return {"error": "No data available"}, 500
         
     reasons = get_frequent_reasons(df, n=5)
-    return jsonify({
+    return {
+        "causes": get_cause_distribution(df).to_dict(),
         "frequent_reasons": reasons.to_dict()
+    }, 200
+
+@app.route('/api/locations/suggest')
+def suggest_locations_endpoint():
+    """Suggests individual locations matching a partial query, for search-as-you-type."""
+    query = request.args.get('q', '')
+    try:
+        limit = min(requested_limit(10), 50)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    snapshot = get_snapshot()
+    if snapshot.frame.empty:
+        return jsonify({"error": "No data available", "query": query, "suggestions": []}), 500
+    return jsonify({
+        "query": query,
+        "suggestions": LocationIndex.for_snapshot(snapshot).suggest(query, limit)
     })
+
+@app.route('/api/causes')
+def get_causes_endpoint():
+    """Returns outage counts per cause category, plus the most frequent raw reasons."""
+    return materialized.serve(get_snapshot(), 'causes', build_causes)
     
+def build_status_distribution(snapshot):
+    """Computes the /api/status-distribution payload for a snapshot, over raw and compacted rows."""
+    df = retention.analysis_frame(snapshot)
+    if df.empty:
+        return {"error": "No data available"}, 500
+        
+    statuses = get_status_distribution(df)
+    return {
+        "status_distribution": statuses.to_dict()
+    }, 200
+
 @app.route('/api/status-distribution')
 def get_status_distribution_endpoint():
     """Returns the distribution of outage statuses."""
-    df = get_data()
-    if df.empty:
+    return materialized.serve(get_snapshot(), 'status-distribution', build_status_distribution)
+
+def reliability_payload(snapshot, sort='outages_30d', limit=None, feeder=None):
+    """Shapes a snapshot's precomputed feeder reliability metrics as a JSON payload."""
+    table, metrics_table = reliability.for_snapshot(snapshot)
+    ranking = reliability.ranked(metrics_table, sort)
+    ranking = ranking.assign(rank=np.arange(1, len(ranking) + 1))
+    if feeder:
+        ranking = ranking[ranking['feeder'].str.upper() == feeder.strip().upper()]
+    if limit:
+        ranking = ranking.head(limit)
+    ranking = ranking.assign(
+        first_outage=ranking['first_outage'].dt.strftime('%Y-%m-%d'),
+        last_outage=ranking['last_outage'].dt.strftime('%Y-%m-%d'),
+        mean_days_between_outages=ranking['mean_days_between_outages'].round(2),
+        trend_per_week=ranking['trend_per_week'].round(3)
+    )
+    return {
+        "as_of": str(table.as_of) if table.as_of is not None else None,
+        "windows": list(reliability.WINDOWS),
+        "trend_weeks": reliability.TREND_WEEKS,
+        # Outages before this day are only known by month (see RETENTION_DAILY_DAYS); they
+        # count in the totals but not in first_outage or mean_days_between_outages.
+        "daily_from": str(table.daily_from) if table.daily_from is not None else None,
+        "sort": sort,
+        "count": len(ranking),
+        # Encoded by serialization; NaN (e.g. the mean gap of a feeder with a single outage) becomes null
+        "feeders": ranking
+    }
+
+def build_reliability(snapshot):
+    """Computes the default /api/feeders/reliability payload for a snapshot."""
+    if retention.analysis_frame(snapshot).empty:
+        return {"error": "No data available"}, 500
+    return reliability_payload(snapshot), 200
+
+@app.route('/api/feeders/reliability')
+def get_feeder_reliability_endpoint():
+    """Returns per-feeder reliability metrics, worst feeders first.
+
+    For each feeder: outages in the last 7/30/90 days (up to the snapshot's date, `as_of`),
+    total outages, first and last outage, mean days between outages, and the trend of
+    weekly outage counts over the last 13 weeks. The table is computed once per snapshot.
+    With a retention policy, first outage and mean days between outages only use the
+    days from `daily_from` on; earlier outages are only counted per month.
+
+    Query parameters (all optional):
+        sort: outages_30d (default), outages_7d, outages_90d, total_outages,
+              trend_per_week or mean_days_between_outages.
+        limit: Return only the worst N feeders.
+        feeder: Return only this feeder (with its rank).
+    """
+    if not request.args:
+        return materialized.serve(get_snapshot(), 'feeder-reliability', build_reliability)
+    sort = request.args.get('sort', 'outages_30d')
+    if sort not in reliability.SORT_KEYS:
+        return jsonify({"error": f"Unknown sort key: {sort}", "sort_keys": list(reliability.SORT_KEYS)}), 400
+    try:
+        limit = requested_limit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    snapshot = get_snapshot()
+    if retention.analysis_frame(snapshot).empty:
         return jsonify({"error": "No data available"}), 500
-        
-    statuses = get_status_distribution(df)
+    return jsonify(reliability_payload(snapshot, sort, limit, request.args.get('feeder')))
+
+@app.route('/api/changes')
+def get_changes_endpoint():
+    """Returns how the CNN page changed in every snapshot version after `since`.
+
+    Query parameters:
+        since: The last snapshot version the client has applied (0 for none).
+
+    Changes are "new" notices, "restored" ones (taken down from the page) and
+    "modified" ones, which also carry the "previous" values of the fields that changed.
+    The last CHANGE_RING_VERSIONS versions are kept; older `since` values get
+    "resync": true, meaning the client must reload /api/data and continue from "version".
+    """
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "The 'since' parameter is required and must be a version number."}), 400
+    version, changes, resync = HISTORY_STORE.changes_since(since)
     return jsonify({
-        "status_distribution": statuses.to_dict()
+        "since": since,
+        "version": version,
+        "resync": resync,
+        "changes": changes
     })
-    
-    if isinstance(trends, pd.Series) and not trends.empty:
-        trends_dict = {str(index): value for index, value in trends.items()}
+
+@app.route('/api/export')
+def export_endpoint():
+    """Downloads the outage history as a Parquet, Arrow or CSV file.
+
+    Query parameters (all optional):
+        format: parquet (default), arrow (an Arrow IPC stream) or csv.
+        from, to: Inclusive date range, as YYYY-MM-DD.
+
+    The file is streamed from the monthly partitions the writer keeps under
+    EXPORT_DIR, without building a DataFrame; a whole single month in Parquet is sent
+    straight from disk. Parquet and Arrow keep the column types (dates, categoricals).
+    """
+    export_format = request.args.get('format', 'parquet')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format: {export_format}", "formats": list(EXPORT_FORMATS)}), 400
+    try:
+        date_from, date_to = (datetime.strptime(request.args[name], '%Y-%m-%d').date() if request.args.get(name)
+                              else None for name in ('from', 'to'))
+    except ValueError:
+        return jsonify({"error": "Invalid date. Use YYYY-MM-DD for 'from' and 'to'."}), 400
+    manifest = EXPORT_STORE.manifest()
+    if manifest is None:
+        return jsonify({"error": "No export available yet"}), 503
+
+    # Exports only change when the writer exports a new version.
+    etag = f"export-{manifest['version']}-{export_format}-{date_from or ''}-{date_to or ''}"
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
     else:
-        trends_dict = {}
+        download_name = '-'.join(['outages'] + [str(day) for day in (date_from, date_to) if day]) + '.' + extension
+        path = EXPORT_STORE.partition_file(date_from, date_to, export_format)
+        if path is not None:
+            response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                                 etag=False, conditional=False)
+        else:
+            response = Response(stream_with_context(EXPORT_STORE.stream(export_format, date_from, date_to)),
+                                mimetype=mimetype)
+            response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    response.set_etag(etag)
+    response.headers['X-Export-Version'] = str(manifest['version'])
+    return response
+
+def alert_caller():
+    """Returns who is calling the alert routes, from the 'Authorization: Bearer' token.
+
+    Returns:
+        tuple: (subscriber name or None, is_admin), or None if the token is missing or unknown.
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    subscriber, is_admin = ALERT_STORE.authenticate(token.strip())
+    if subscriber is None and not is_admin:
+        return None
+    return subscriber, is_admin
+
+UNAUTHORIZED = {"error": "A valid 'Authorization: Bearer <token>' header is required."}
+
+@app.route('/api/alerts/subscriptions', methods=['POST'])
+def add_alert_subscription():
+    """Subscribes a callback URL to new outages in an area or on a feeder.
+
+    Requires a subscriber's token (see `python alerts.py token`) or ALERTS_ADMIN_KEY.
 
-    return jsonify(trends_dict)
+    JSON body:
+        subscriber: Who is subscribing; defaults to the token's subscriber, and only the
+                    admin key may name another one.
+        kind: "area" or "feeder".
+        pattern: A location (e.g. "Magodo Phase 2") or feeder name; a trailing "*"
+                 matches every name starting with it. Case and spacing are ignored.
+        callback_url: Where alerts are POSTed, in batches: {"alerts": [...]}. Its host must
+                      resolve to a public address (or be in ALERT_CALLBACK_ALLOW_HOSTS).
+
+    Only notices first seen after the subscription is made are alerted.
+    """
+    caller = alert_caller()
+    if caller is None:
+        return jsonify(UNAUTHORIZED), 401
+    subscriber, is_admin = caller
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "The request body must be a JSON object."}), 400
+    if not is_admin:
+        if body.get('subscriber') not in (None, subscriber):
+            return jsonify({"error": "A token may only subscribe its own subscriber."}), 403
+        body['subscriber'] = subscriber
+    try:
+        subscription = ALERT_STORE.add_subscription(body.get('subscriber'), body.get('kind'), body.get('pattern'),
+                                                    body.get('callback_url'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(subscription), 201
+
+@app.route('/api/alerts/subscriptions')
+def list_alert_subscriptions():
+    """Lists the caller's alert subscriptions; the admin key lists all, or those of `?subscriber=`."""
+    caller = alert_caller()
+    if caller is None:
+        return jsonify(UNAUTHORIZED), 401
+    subscriber, is_admin = caller
+    if is_admin:
+        subscriber = request.args.get('subscriber')
+    return jsonify({"subscriptions": ALERT_STORE.subscriptions(subscriber)})
+
+@app.route('/api/alerts/subscriptions/<int:subscription_id>', methods=['DELETE'])
+def remove_alert_subscription(subscription_id):
+    """Removes one of the caller's alert subscriptions (any, with the admin key), dropping its undelivered alerts."""
+    caller = alert_caller()
+    if caller is None:
+        return jsonify(UNAUTHORIZED), 401
+    subscriber, is_admin = caller
+    if not ALERT_STORE.remove_subscription(subscription_id, None if is_admin else subscriber):
+        return jsonify({"error": "No such subscription"}), 404
+    return '', 204
 
 @app.route('/refresh-data') # Added a simple endpoint to manually refresh data
 def refresh_data_endpoint():
-    global CACHED_DATA
-    CACHED_DATA = None # Clear cache
-    get_data() # Rescrape
-    return jsonify({"message": "Data refresh initiated. Check /api/data or /api/outage-summary for updated results."})
+    """Asks the writer process to re-scrape and returns without waiting for it."""
+    SNAPSHOT_STORE.request_refresh()
+    started = REFRESHER.trigger()
+    return jsonify({
+        "message": "Data refresh initiated. Check /api/data or /api/outage-summary for updated results."
+                   if started else "A data refresh is already in progress.",
+        "refreshing": True
+    }), 202
+
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Exposes fetch, parse, analysis and request metrics of all workers in Prometheus text format."""
+    manifest = SNAPSHOT_STORE.manifest()
+    if manifest is not None:
+        metrics.set_gauge('snapshot_version', manifest['version'])
+        metrics.set_gauge('snapshot_age_seconds', round(time.time() - manifest['created_at'], 3))
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
+# Serve the last published snapshot from local disk right away, with its summary and
+# reliability table computed by the listeners above, instead of making the first request
+# wait for a live scrape. Under gunicorn --preload this runs once in the master, and the
+# workers fork from it warm, sharing these pages copy-on-write. The refresher thread is
+# started per process on its first request (or by gunicorn.conf.py), never in the master,
+# which must not take the snapshot writer lock its workers would inherit.
+REFRESHER.preload(SNAPSHOT_STORE.load_latest())
 
 if __name__ == '__main__':
     # For local development, you can uncomment the line below and run `python3 app.py`
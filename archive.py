@@ -0,0 +1,199 @@
+"""Content-addressed archive of every raw CNN page body that was fetched.
+
+Each distinct body is stored once, gzip-compressed, as `<dir>/<ab>/<sha256>.html.gz`
+(the first two hex digits shard the directory). `index.jsonl` records when and from
+where each body was first fetched. With the raw pages kept, the history can be
+re-derived whenever the parser changes:
+
+    python archive.py                              # re-parse everything into the history
+    python archive.py --history /tmp/rebuilt.db    # ...or into a fresh history database
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import DATA_DIR
+
+ARCHIVE_DIR = os.environ.get('RAW_ARCHIVE_DIR', os.path.join(DATA_DIR, 'raw'))
+# Set RAW_ARCHIVE=0 to stop archiving fetched pages.
+ARCHIVE_ENABLED = os.environ.get('RAW_ARCHIVE', '1').lower() not in ('0', 'false', 'no')
+REPARSE_PROCESSES = int(os.environ.get('REPARSE_PROCESSES', os.cpu_count() or 1))
+# Parsed pages merged into the history per transaction
+REPARSE_BATCH_PAGES = 50
+
+INDEX_NAME = 'index.jsonl'
+_SUFFIX = '.html.gz'
+_index_lock = threading.Lock()
+
+
+def page_path(digest, directory=ARCHIVE_DIR):
+    return os.path.join(directory, digest[:2], digest + _SUFFIX)
+
+
+def store(body, url=None, directory=ARCHIVE_DIR):
+    """Archives a page body unless an identical one is already stored.
+
+    Args:
+        body (bytes): The raw page content.
+        url (str): Where it was fetched from, recorded in the index.
+        directory (str): The archive root.
+
+    Returns:
+        str: The body's SHA-256 hex digest (its address in the archive).
+    """
+    digest = hashlib.sha256(body).hexdigest()
+    path = page_path(digest, directory)
+    if os.path.exists(path):
+        return digest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique temporary name, so concurrent writers of the same body cannot clash
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+    line = json.dumps({"sha256": digest, "url": url, "fetched_at": time.time(), "bytes": len(body)})
+    with _index_lock, open(os.path.join(directory, INDEX_NAME), 'a') as f:
+        f.write(line + '\n')
+    return digest
+
+
+def archive_response(url, body):
+    """Archives a fetched body if archiving is enabled; never fails the fetch."""
+    if not ARCHIVE_ENABLED or not body:
+        return
+    try:
+        store(body, url)
+    except OSError as e:
+        print(f"Archiving {url} failed: {e}")
+
+
+def load(path):
+    """Returns the raw body of an archived page file."""
+    with gzip.open(path, 'rb') as f:
+        return f.read()
+
+
+def archived_pages(directory=ARCHIVE_DIR):
+    """Lists the archived page files, in the order they were first fetched.
+
+    Files missing from the index (e.g. copied in from another archive) come last.
+    """
+    ordered = []
+    index_path = os.path.join(directory, INDEX_NAME)
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            for line in f:
+                try:
+                    ordered.append(page_path(json.loads(line)['sha256'], directory))
+                except (ValueError, KeyError):
+                    continue  # A line cut short by a crash
+    seen = set()
+    pages = []
+    for path in ordered:
+        if path not in seen and os.path.exists(path):
+            seen.add(path)
+            pages.append(path)
+    for shard in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        shard_dir = os.path.join(directory, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for name in sorted(os.listdir(shard_dir)):
+            path = os.path.join(shard_dir, name)
+            if name.endswith(_SUFFIX) and path not in seen:
+                pages.append(path)
+    return pages
+
+
+def _parse_archived(path):
+    """Worker: loads and parses one archived page. Returns (frame, error)."""
+    from cnn_parser import parse_outages
+    try:
+        return parse_outages(load(path)), None
+    except Exception as e:
+        # Reported by the parent; one corrupt file must not stop the whole re-parse.
+        return None, f"{type(e).__name__}: {e}"
+
+
+def reparse(pages, history, processes=REPARSE_PROCESSES, batch_pages=REPARSE_BATCH_PAGES):
+    """Re-parses archived pages in a process pool and merges the rows into the history.
+
+    Results stream back in archive order while the pool keeps parsing, and are merged
+    `batch_pages` pages per transaction rather than one page (or everything) at a time.
+
+    Args:
+        pages (list): Archived page files, from `archived_pages`.
+        history (HistoryStore): Where parsed rows are merged (deduplicated).
+        processes (int): Parser processes.
+        batch_pages (int): Pages merged per history transaction.
+
+    Returns:
+        dict: Counts of pages parsed and failed, and rows parsed and inserted.
+    """
+    from outage_frame import concat
+
+    stats = {"pages": 0, "failed": 0, "rows": 0, "inserted": 0}
+    start = last_report = time.perf_counter()
+    batch = []
+
+    def flush():
+        if batch:
+            frame = concat(batch)
+            stats["rows"] += len(frame)
+            stats["inserted"] += history.merge(frame)
+            batch.clear()
+
+    with ProcessPoolExecutor(processes) as parsers:
+        # Small chunks keep every process busy while amortizing the pickling overhead.
+        chunksize = max(1, min(16, len(pages) // (processes * 8)))
+        results = parsers.map(_parse_archived, pages, chunksize=chunksize)
+        for done, (path, (frame, error)) in enumerate(zip(pages, results), 1):
+            if error:
+                print(f"Re-parsing {path} failed: {error}")
+                stats["failed"] += 1
+            else:
+                stats["pages"] += 1
+            if frame is not None and not frame.empty:
+                batch.append(frame)
+            if len(batch) >= batch_pages:
+                flush()
+            now = time.perf_counter()
+            if now - last_report >= 5 or done == len(pages):
+                rate = done / (now - start)
+                eta = (len(pages) - done) / rate if rate else 0
+                print(f"Re-parsed {done}/{len(pages)} pages ({rate:.1f} pages/s, "
+                      f"ETA {eta:.0f}s).")
+                last_report = now
+    flush()
+    return stats
+
+
+def main(argv=None):
+    from history_store import HISTORY_DB_PATH, HistoryStore
+
+    parser = argparse.ArgumentParser(description="Re-parses the raw page archive into the outage history.")
+    parser.add_argument('--dir', default=ARCHIVE_DIR, help="archive directory (default: %(default)s)")
+    parser.add_argument('--history', default=HISTORY_DB_PATH, help="history database to merge into")
+    parser.add_argument('--processes', type=int, default=REPARSE_PROCESSES)
+    parser.add_argument('--batch-pages', type=int, default=REPARSE_BATCH_PAGES)
+    args = parser.parse_args(argv)
+
+    pages = archived_pages(args.dir)
+    if not pages:
+        print(f"No archived pages in {args.dir}.")
+        return 0
+    print(f"Re-parsing {len(pages)} archived pages with {args.processes} processes into {args.history}...")
+    start = time.perf_counter()
+    stats = reparse(pages, HistoryStore(args.history), args.processes, args.batch_pages)
+    print(f"Re-parsed {stats['pages']} pages in {time.perf_counter() - start:.1f}s: {stats['rows']} rows, "
+          f"{stats['inserted']} new; {stats['failed']} failed.")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
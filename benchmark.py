@@ -0,0 +1,298 @@
+"""Micro-benchmarks for the CNN parser and the analysis functions on synthetic pages.
+
+Times the parse path of scrape_outage_data (cnn_parser.parse_outages, without the
+network) and every analysis function at each page size, plus the cause classifier on
+a large Reason column and the JSON encoding of API responses (the serialization
+module against the previous to_dict + json.dumps path), reporting the best-of-N time, throughput and peak traced
+memory. Results can be saved as a baseline; later runs exit with status 1 if any
+benchmark is slower or uses more memory than the baseline by more than the threshold.
+
+Usage:
+    python benchmark.py --save-baseline
+    python benchmark.py                        # compare against the saved baseline
+    python benchmark.py --sizes 100,1000000 --layout body --threshold 0.5
+    python benchmark.py --sizes 100 --classifier-rows 0 --serialization-sizes 10000,100000,1000000
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import analysis
+import classifier
+import serialization
+from cnn_parser import parse_outages
+from config import DATA_DIR
+from location_index import LocationIndex
+from outage_frame import concat, for_output
+from synthetic import LAYOUTS, REASONS, generate_page
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+# Rows and distinct reasons of the standalone classifier benchmark
+CLASSIFIER_ROWS = 1000000
+CLASSIFIER_DISTINCT_REASONS = 50000
+# Rows of the response serialization benchmarks
+SERIALIZATION_SIZES = (10000, 100000)
+# Notices per parsed page; larger frames repeat it
+SERIALIZATION_PAGE_ROWS = 100000
+DEFAULT_REPEAT = 3
+BASELINE_PATH = os.environ.get('BENCHMARK_BASELINE', os.path.join(DATA_DIR, 'benchmark-baseline.json'))
+# A benchmark regresses when it is this much (relatively) slower or larger than the baseline...
+DEFAULT_THRESHOLD = 0.25
+# ...and by more than these absolute amounts, so that timer noise on sub-millisecond
+# runs and allocator noise on tiny inputs are not reported.
+MIN_SECONDS_DELTA = 0.002
+MIN_BYTES_DELTA = 256 * 1024
+
+
+def _analysis_benchmarks(df):
+    """Returns (name, callable) pairs covering every public analysis function."""
+    index = LocationIndex(df)
+    first_day = df['Date'].min()
+    return [
+        ('feeder_outage_counts', lambda: analysis.feeder_outage_counts(df)),
+        ('top_affected_areas', lambda: analysis.top_affected_areas(df)),
+        ('get_frequent_reasons', lambda: analysis.get_frequent_reasons(df)),
+        ('get_status_distribution', lambda: analysis.get_status_distribution(df)),
+        ('get_cause_distribution', lambda: analysis.get_cause_distribution(df)),
+        ('classify_reasons', lambda: classifier.classify_reasons(df['Reason'])),
+        ('get_location_data', lambda: analysis.get_location_data(df, 'Ogba')),
+        ('get_location_data[index]', lambda: analysis.get_location_data(df, 'Ogba', index)),
+        ('filter_rows', lambda: analysis.filter_rows(df, date_from=str(first_day.date()),
+                                                     feeder='OGBA', status='Fault')),
+        ('get_all_locations', lambda: analysis.get_all_locations(df)),
+        ('get_outage_summary', lambda: analysis.get_outage_summary(df)),
+        ('group_by_date_for_trend_analysis', lambda: analysis.group_by_date_for_trend_analysis(df)),
+        ('LocationIndex', lambda: LocationIndex(df)),
+    ]
+
+
+def _measure(func, repeat):
+    """Returns (best seconds, peak traced bytes, result of the last call) for `func`."""
+    # Memory is traced in a separate, untimed run that also warms caches and imports;
+    # tracing slows the code down too much to time it.
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, peak, result
+
+
+def run(sizes=DEFAULT_SIZES, layout='p', repeat=DEFAULT_REPEAT, seed=0):
+    """Runs every benchmark at every size.
+
+    Args:
+        sizes (iterable): Numbers of notices per synthetic page.
+        layout (str): Page layout, one of synthetic.LAYOUTS.
+        repeat (int): Timed runs per benchmark; the fastest is reported.
+        seed (int): Seed for the synthetic pages.
+
+    Returns:
+        dict: Results keyed by "<benchmark>@<size>", each with seconds, rows,
+              rows_per_second and peak_bytes.
+    """
+    results = {}
+    for size in sizes:
+        page = generate_page(size, layout, seed).encode('utf-8')
+        seconds, peak, df = _measure(lambda: parse_outages(page), repeat)
+        results[f'parse_outages@{size}'] = {
+            "seconds": seconds,
+            "rows": len(df),
+            "rows_per_second": len(df) / seconds if seconds else None,
+            "mb_per_second": len(page) / 1e6 / seconds if seconds else None,
+            "peak_bytes": peak,
+        }
+        _report(f'parse_outages@{size}', results[f'parse_outages@{size}'])
+        for name, func in _analysis_benchmarks(df):
+            seconds, peak, _ = _measure(func, repeat)
+            key = f'{name}@{size}'
+            results[key] = {
+                "seconds": seconds,
+                "rows": len(df),
+                "rows_per_second": len(df) / seconds if seconds else None,
+                "peak_bytes": peak,
+            }
+            _report(key, results[key])
+    return results
+
+
+def run_classifier(rows=CLASSIFIER_ROWS, distinct=CLASSIFIER_DISTINCT_REASONS, repeat=DEFAULT_REPEAT, seed=0):
+    """Benchmarks the cause classifier on a Reason column of `rows` rows.
+
+    'classify_reasons[cold]' starts from an empty memo, so every distinct reason goes
+    through the matcher; 'classify_reasons[warm]' is the steady state during ingestion.
+
+    Returns:
+        dict: Results in the same form as `run`.
+    """
+    rng = np.random.default_rng(seed)
+    words = ' '.join(REASONS).split()
+    # Realistic reasons plus noisy variants, so the memo has many distinct strings
+    vocabulary = [f"{REASONS[i % len(REASONS)]} {' '.join(rng.choice(words, 2))} {i}" for i in range(distinct)]
+    reasons = pd.Series(pd.Categorical(rng.choice(vocabulary, rows)))
+
+    def cold():
+        classifier._memo.clear()
+        return classifier.classify_reasons(reasons)
+
+    results = {}
+    for name, func in ((f'classify_reasons[cold]@{rows}', cold),
+                       (f'classify_reasons[warm]@{rows}', lambda: classifier.classify_reasons(reasons))):
+        seconds, peak, _ = _measure(func, repeat)
+        results[name] = {
+            "seconds": seconds,
+            "rows": rows,
+            "rows_per_second": rows / seconds if seconds else None,
+            "peak_bytes": peak,
+        }
+        _report(name, results[name])
+    return results
+
+
+def _serialization_benchmarks(df):
+    """Returns (name, callable) pairs encoding `df` as an API response body."""
+    def to_dict_json():
+        # What /api/data did before the serialization module: a dict per row, then
+        # Flask's default provider (the standard library encoder, sorted keys).
+        return json.dumps(for_output(df).to_dict(orient='records'), sort_keys=True).encode()
+
+    records = serialization.encode_frame(df)
+    benchmarks = [
+        ('to_dict+json.dumps', to_dict_json),
+        ('encode_frame[records]', lambda: serialization.encode_frame(df)),
+        ('encode_frame[columns]', lambda: serialization.encode_frame(df, 'columns')),
+        ('encode_lines', lambda: serialization.encode_lines(df)),
+        ('gzip[records]', lambda: serialization.compress(records, 'gzip')),
+    ]
+    if serialization.brotli is not None:
+        benchmarks.append(('brotli[records]', lambda: serialization.compress(records, 'br')))
+    return benchmarks
+
+
+def run_serialization(sizes=SERIALIZATION_SIZES, layout='p', repeat=DEFAULT_REPEAT, seed=0):
+    """Benchmarks encoding (and compressing) frames of each size as JSON responses.
+
+    Returns:
+        dict: Results in the same form as `run`, plus the size of each body in "bytes".
+    """
+    page_rows = min(max(sizes), SERIALIZATION_PAGE_ROWS)
+    page = parse_outages(generate_page(page_rows, layout, seed).encode('utf-8'))
+    results = {}
+    for size in sizes:
+        df = concat([page] * -(-size // len(page))).iloc[:size]
+        for name, func in _serialization_benchmarks(df):
+            seconds, peak, body = _measure(func, repeat)
+            key = f'{name}@{size}'
+            results[key] = {
+                "seconds": seconds,
+                "rows": size,
+                "rows_per_second": size / seconds if seconds else None,
+                "peak_bytes": peak,
+                "bytes": len(body),
+            }
+            _report(key, results[key])
+    return results
+
+
+def _report(key, result):
+    rate = result['rows_per_second']
+    print(f"{key:45s} {result['seconds'] * 1000:10.2f} ms "
+          f"{(rate or 0) / 1e6:9.2f} Mrows/s {result['peak_bytes'] / 2**20:9.1f} MiB peak"
+          + (f" {result['bytes'] / 2**20:9.1f} MiB body" if 'bytes' in result else ''))
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Returns a description of every benchmark that regressed against the baseline."""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for field, slack, unit, scale in (('seconds', MIN_SECONDS_DELTA, 'ms', 1000),
+                                          ('peak_bytes', MIN_BYTES_DELTA, 'MiB', 1 / 2**20)):
+            old, new = previous[field], result[field]
+            if new > old * (1 + threshold) and new - old > slack:
+                regressions.append(f"{key}: {field} {old * scale:.2f} -> {new * scale:.2f} {unit} "
+                                   f"(+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the CNN parser and analysis functions.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated page sizes in notices (up to 1000000)")
+    parser.add_argument('--layout', choices=LAYOUTS, default='p')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store these results as the new baseline instead of comparing")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative slowdown or memory growth (0.25 = 25%%)")
+    parser.add_argument('--classifier-rows', type=int, default=CLASSIFIER_ROWS,
+                        help="rows for the standalone classifier benchmark (0 skips it)")
+    parser.add_argument('--serialization-sizes', default=','.join(str(size) for size in SERIALIZATION_SIZES),
+                        help="comma-separated frame sizes in rows for the response serialization "
+                             "benchmarks (empty skips them)")
+    parser.add_argument('--output', help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = run(sizes, args.layout, args.repeat, args.seed)
+    if args.classifier_rows:
+        results.update(run_classifier(args.classifier_rows, repeat=args.repeat, seed=args.seed))
+    serialization_sizes = [int(size) for size in args.serialization_sizes.split(',') if size.strip()]
+    if serialization_sizes:
+        results.update(run_serialization(serialization_sizes, args.layout, args.repeat, args.seed))
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "layout": args.layout,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('layout') != args.layout:
+        print(f"Baseline was recorded with layout '{baseline.get('layout')}'; not comparing.")
+        return 0
+    regressions = compare(results, baseline['results'], args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+UNSPECIFIED = 'Unspecified'
+OTHER = 'Other'
+
+# Cause categories in priority order: a reason matching several categories gets the
+# first one. Keywords match at the start of a word ("vandal" matches "vandalized"),
+# after the text is normalized to lowercase words separated by single spaces.
+CAUSE_KEYWORDS = [
+    ('Vandalism', ['vandal', 'theft', 'stolen', 'sabotage']),
+    ('Vegetation', ['tree', 'trees', 'branch', 'vegetation', 'bush']),
+    ('Weather', ['rain', 'storm', 'wind', 'lightning', 'flood', 'thunder']),
+    ('Load shedding', ['load shedding', 'load management', 'load curtailment', 'low allocation',
+                       'load reduction']),
+    ('Grid / upstream', ['tcn', 'grid', 'upstream', 'transmission', 'gas constraint',
+                         'generation', 'system collapse']),
+    ('Planned maintenance', ['maintenance', 'planned', 'upgrade', 'installation', 'reconfiguration',
+                             'replacement', 'planned work', 'routine', 'network expansion']),
+    ('Equipment failure', ['transformer', 'insulator', 'jumper', 'cross arm', 'crossarm', 'pole',
+                           'relay', 'breaker', 'burnt', 'broken', 'cable', 'switchgear', 'conductor',
+                           'fuse', 'tripping', 'tripped']),
+    ('Line fault', ['line fault', 'fault', 'earth fault', 'short circuit']),
+]
+CAUSE_CATEGORIES = [category for category, _ in CAUSE_KEYWORDS] + [OTHER, UNSPECIFIED]
+
+_NON_WORD_PATTERN = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_reason(text):
+    """Lowercases a reason and reduces it to words separated by single spaces, padded by one."""
+    return ' ' + _NON_WORD_PATTERN.sub(' ', str(text).lower()).strip() + ' '
+
+
+class CauseMatcher:
+    """Aho-Corasick automaton over every cause keyword.
+
+    One pass over a normalized reason finds all keyword occurrences at once, however
+    many keywords there are, instead of trying a regex per category.
+    """
+
+    def __init__(self, keywords=CAUSE_KEYWORDS):
+        self._goto = [{}]
+        self._fail = [0]
+        # node -> best (lowest) category priority of any keyword ending there
+        self._output = [None]
+        self._categories = [category for category, _ in keywords]
+        for priority, (_, words) in enumerate(keywords):
+            for word in words:
+                # The leading space anchors the keyword to the start of a word.
+                self._add(' ' + normalize_reason(word).strip(), priority)
+        self._build_failure_links()
+
+    def _add(self, pattern, priority):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            node = next_node
+        if self._output[node] is None or priority < self._output[node]:
+            self._output[node] = priority
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                inherited = self._output[self._fail[child]]
+                if inherited is not None and (self._output[child] is None or inherited < self._output[child]):
+                    self._output[child] = inherited
+
+    def classify(self, reason):
+        """Returns the cause category of one reason string."""
+        text = normalize_reason(reason)
+        if text.strip() in ('', 'not specified', 'nil', 'none', 'n a'):
+            return UNSPECIFIED
+        goto, fail, output = self._goto, self._fail, self._output
+        best = None
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            priority = output[node]
+            if priority is not None and (best is None or priority < best):
+                best = priority
+                if best == 0:
+                    break
+        return self._categories[best] if best is not None else OTHER
+
+
+_matcher = None
+# Reason string -> category; reasons repeat heavily, so each is only matched once.
+_memo = {}
+
+
+def classify_reason(reason):
+    """Returns the cause category of a reason, memoized per distinct string."""
+    global _matcher
+    category = _memo.get(reason)
+    if category is None:
+        if _matcher is None:
+            _matcher = CauseMatcher()
+        category = _memo[reason] = _matcher.classify(reason)
+    return category
+
+
+def classify_reasons(reasons):
+    """Maps a Reason column to a categorical Cause column.
+
+    Each distinct reason is classified once (and remembered across calls); rows are
+    then mapped through the categorical codes, so millions of rows cost one array take.
+
+    Args:
+        reasons (pandas.Series): A Reason column, categorical or plain strings.
+
+    Returns:
+        pandas.Series: Categorical cause categories, with the same index.
+    """
+    if not isinstance(reasons.dtype, pd.CategoricalDtype):
+        reasons = reasons.astype('category')
+    categories = reasons.cat.categories
+    dtype = pd.CategoricalDtype(CAUSE_CATEGORIES)
+    per_reason = pd.Categorical([classify_reason(reason) for reason in categories], dtype=dtype).codes
+    codes = reasons.cat.codes.to_numpy()
+    # Missing reasons (code -1) pick the trailing "Unspecified"
+    per_reason = np.append(per_reason, CAUSE_CATEGORIES.index(UNSPECIFIED))
+    return pd.Series(pd.Categorical.from_codes(per_reason[codes], dtype=dtype), index=reasons.index)
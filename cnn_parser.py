@@ -1,195 +1,352 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import pandas as pd
+import hashlib
+import os
+import random
 import re
+import threading
+import time
 from datetime import datetime
 
-URL = "https://www.ikejaelectric.com/cnn/"
+import metrics
+from archive import archive_response
+from outage_frame import COLUMNS, canonicalize
 
-def scrape_outage_data():
-    """Scrapes outage data from Ikeja Electric CNN page and returns a pandas DataFrame."""
+URL = os.environ.get('CNN_URL', "https://www.ikejaelectric.com/cnn/")
+
+# Added User-Agent header as some sites block requests without it
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+FETCH_TIMEOUT_SECONDS = 30
+FETCH_RETRIES = 3                # Extra attempts after the first one
+BACKOFF_BASE_SECONDS = 1.0       # Backoff before retry n is uniform in [0, base * 2**n]
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+# Per-URL state from the last successful parse: validators for conditional GETs,
+# the hash of the body, and the DataFrame it produced.
+_page_cache = {}
+
+
+def get_session():
+    """Returns the shared, connection-pooled HTTP session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+def fetch_page(url, etag=None, last_modified=None):
+    """Fetches a page with bounded, jittered retries and an optional conditional GET.
+
+    Args:
+        url (str): The page to fetch.
+        etag (str): ETag from a previous response, sent as If-None-Match.
+        last_modified (str): Last-Modified from a previous response, sent as If-Modified-Since.
+
+    Returns:
+        requests.Response: The final response. A 304 means the page has not changed.
+
+    Raises:
+        requests.exceptions.RequestException: If every attempt fails.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    session = get_session()
+    start = time.perf_counter()
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            response = session.get(url, timeout=FETCH_TIMEOUT_SECONDS, headers=headers)
+            if response.status_code not in RETRY_STATUS_CODES:
+                response.raise_for_status()  # Raise an exception for other HTTP errors (4xx or 5xx)
+                metrics.observe('cnn_fetch_seconds', time.perf_counter() - start)
+                metrics.observe('cnn_fetch_bytes', len(response.content))
+                if response.status_code == 200:
+                    # Keep the raw page, so history can be re-derived if the parser changes
+                    archive_response(url, response.content)
+                return response
+            if attempt == FETCH_RETRIES:
+                response.raise_for_status()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == FETCH_RETRIES:
+                raise
+            print(f"Fetching {url} failed ({e}). Retrying...")
+        time.sleep(random.uniform(0, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def scrape_if_changed(url=None):
+    """Scrapes the CNN page, skipping the parse when it has not changed since the last call.
+
+    The page is fetched conditionally with the stored ETag/Last-Modified, and a 304 or
+    a body identical to the last one short-circuits before parsing.
+
+    Returns:
+        pandas.DataFrame or None: The parsed data, or None if the page is unchanged.
+    """
+    url = url or URL
+    cached = _page_cache.get(url, {})
     try:
-        # Added User-Agent header as some sites block requests without it
-        response = requests.get(URL, timeout=30, headers={'User-Agent': 'Mozilla/5.0'})
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
+        response = fetch_page(url, cached.get('etag'), cached.get('last_modified'))
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching URL {URL}: {e}")
+        print(f"Error fetching URL {url}: {e}")
         return pd.DataFrame(columns=['Date', 'Feeder', 'Status', 'Reason', 'Area']) # Return empty DataFrame on error
 
-    soup = BeautifulSoup(response.content, 'html.parser')
-    data_entries = []
+    if response.status_code == 304 and 'frame' in cached:
+        print(f"{url} not modified since the last scrape.")
+        return None
+    body_hash = hashlib.sha256(response.content).hexdigest()
+    if body_hash == cached.get('body_hash'):
+        print(f"{url} content unchanged since the last scrape.")
+        return None
+
+    df = parse_outages(response.content)
+    if not df.empty:
+        _page_cache[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body_hash': body_hash,
+            'frame': df
+        }
+    return df
+
+
+def scrape_outage_data():
+    """Scrapes outage data from Ikeja Electric CNN page and returns a pandas DataFrame."""
+    df = scrape_if_changed()
+    if df is None:
+        # Unchanged page: reuse the DataFrame from the last parse.
+        return _page_cache[URL]['frame']
+    return df
+
+
+# Regex patterns to identify and extract data fields, compiled once at import
+DATE_PATTERN = re.compile(r"(Mon|Tue|Wed|Thu|Fri|Sat|Sun), \d{1,2} (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) \d{4}")
+UNDERTAKING_KEYWORD_PATTERN = re.compile(r"^UNDERTAKING:$", re.IGNORECASE) # Matches the literal line "UNDERTAKING:"
+AREAS_KEYWORD_PATTERN = re.compile(r"^AREAS AFFECTED:$", re.IGNORECASE)   # Matches the literal line "AREAS AFFECTED:"
+# Pattern to extract Feeder and the rest of the reason, e.g., "OGBA FAULT: DOWNTIME..."
+# This pattern tries to capture a capitalized word (Feeder) followed by FAULT/OUTAGE etc.
+FEEDER_REASON_PATTERN = re.compile(r"([A-Z0-9\s-]+(?:FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)):\s*(.*)", re.IGNORECASE)
+# Simpler feeder pattern if the above is too specific or if 'FAULT' etc. is part of the feeder name
+FEEDER_SIMPLE_PATTERN = re.compile(r"([A-Z0-9_-]+)\s+(?:FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)", re.IGNORECASE)
+# Status keywords left at the start of a reason, e.g. "FAULT - broken pole"
+REASON_STATUS_PREFIX_PATTERN = re.compile(r"^(FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)[:\s-]*", re.IGNORECASE)
+
+# The page is built with html.parser on purpose: lxml is faster, but it closes <p> before
+# nested block elements (<div>, <table>, <ul>) and so splits notices differently on
+# malformed markup. tests/test_cnn_parser.py checks the output against the original parser.
+HTML_PARSER = 'html.parser'
+
+# Set CNN_PARSER_DEBUG=1 to trace every parsed entry.
+DEBUG = os.environ.get('CNN_PARSER_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+# Parser states while walking the lines of one date block
+_SEEKING, _IN_UNDERTAKING, _IN_AREAS = range(3)
+
+# Date strings repeat across entries, so each distinct one is only parsed once.
+_formatted_dates = {}
 
+
+def _extract_lines(html):
+    """Returns the clean, non-empty text lines of the CNN page, in document order."""
     # The website structure seems to be text-based entries rather than a formal HTML table.
     # We'll look for <p> tags, as they often contain the textual data for each outage.
-    # If <p> tags are not fruitful, we'll try to find common container elements like <div class="card-body">
-    # and extract text from <p> tags within them.
-
+    soup = BeautifulSoup(html, HTML_PARSER)
     paragraphs = soup.find_all('p')
-    text_from_elements = []
+    text_from_elements = [p.get_text(separator='\n', strip=True) for p in paragraphs]
 
-    if paragraphs:
-        for p in paragraphs:
-            text_from_elements.append(p.get_text(separator='\n', strip=True))
-    else:
-        # Fallback: Try to find 'card-body' divs if no top-level <p> tags with data
-        card_bodies = soup.find_all('div', class_='card-body') # Common class for content blocks
-        if card_bodies:
-            for cb in card_bodies:
-                # Extract text from all <p> tags within each card-body
-                for p_tag in cb.find_all('p'):
-                    text_from_elements.append(p_tag.get_text(separator='\n', strip=True))
-        else:
+    if not paragraphs:
+        # 'card-body' divs are a common container for content blocks, but without any <p>
+        # tags inside them there is nothing to extract.
+        if not soup.find_all('div', class_='card-body'):
             # Last resort: get all text from the body if other methods fail
             print("Warning: No specific 'p' tags or 'card-body' divs found containing expected data. Parsing all body text.")
-            body_text = soup.body.get_text(separator='\n', strip=True) if soup.body else ""
-            text_from_elements.append(body_text)
+            text_from_elements.append(soup.body.get_text(separator='\n', strip=True) if soup.body else "")
 
     full_text = '\n'.join(filter(None, text_from_elements)) # Join non-empty text blocks
-    print(f"[PARSER_DEBUG] === Full Text for Parsing ===\n{full_text}\n===============================")
-    lines = [line.strip() for line in full_text.split('\n') if line.strip()] # Split into clean lines
-    print(f"[PARSER_DEBUG] Total lines for processing: {len(lines)}")
-
-    # Regex patterns to identify and extract data fields
-    date_pattern = re.compile(r"(Mon|Tue|Wed|Thu|Fri|Sat|Sun), \d{1,2} (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) \d{4}")
-    undertaking_keyword_pattern = re.compile(r"^UNDERTAKING:$", re.IGNORECASE) # Matches the literal line "UNDERTAKING:"
-    areas_keyword_pattern = re.compile(r"^AREAS AFFECTED:$", re.IGNORECASE)   # Matches the literal line "AREAS AFFECTED:"
-    # Pattern to extract Feeder and the rest of the reason, e.g., "OGBA FAULT: DOWNTIME..."
-    # This pattern tries to capture a capitalized word (Feeder) followed by FAULT/OUTAGE etc.
-    feeder_reason_pattern = re.compile(r"([A-Z0-9\s-]+(?:FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)):\s*(.*)", re.IGNORECASE)
-    # Simpler feeder pattern if the above is too specific or if 'FAULT' etc. is part of the feeder name
-    feeder_simple_pattern = re.compile(r"([A-Z0-9_-]+)\s+(?:FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)", re.IGNORECASE)
-
-    current_date_str = None
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        print(f"[PARSER_DEBUG] Main loop: Processing line {i+1}/{len(lines)}: '{line}'")
-        date_match = date_pattern.search(line)
-        if date_match:
-            current_date_str = date_match.group(0)
-            print(f"[PARSER_DEBUG]   Date matched: '{current_date_str}'")
-            try:
-                parsed_date = datetime.strptime(current_date_str, "%a, %d %b %Y")
-                formatted_date = parsed_date.strftime("%Y-%m-%d")
-            except ValueError:
-                formatted_date = current_date_str # Keep original if parsing fails
-            
-            # Once a date is found, look for undertaking and areas in the subsequent lines.
-            undertaking_text = ""
-            areas_text = ""
-            block_lines = [] # Store lines belonging to the current date block
-            
-            # Collect all lines until the next date or end of input
-            j = i + 1
-            while j < len(lines) and not date_pattern.search(lines[j]):
-                block_lines.append(lines[j])
-                j += 1
-            
-            # Process the collected block_lines for UNDERTAKING and AREAS AFFECTED
-            k = 0
-            while k < len(block_lines):
-                line_to_check = block_lines[k]
-                print(f"[PARSER_DEBUG]     Block line check: '{line_to_check}'")
-
-                if undertaking_keyword_pattern.match(line_to_check) and not undertaking_text:
-                    print(f"[PARSER_DEBUG]       Found UNDERTAKING keyword line: '{line_to_check}'")
-                    # The actual undertaking text is expected to be on the next line(s)
-                    temp_undertaking_lines = []
-                    k_undertaking = k + 1
-                    while k_undertaking < len(block_lines) and \
-                          not areas_keyword_pattern.match(block_lines[k_undertaking]) and \
-                          not date_pattern.search(block_lines[k_undertaking]): # Stop if next date found within block
-                        if not undertaking_keyword_pattern.match(block_lines[k_undertaking]): # Avoid re-matching keyword
-                             temp_undertaking_lines.append(block_lines[k_undertaking])
-                        k_undertaking += 1
-                    undertaking_text = " ".join(temp_undertaking_lines).strip()
-                    print(f"[PARSER_DEBUG]       Collected UNDERTAKING text: '{undertaking_text}'")
-                    k = k_undertaking -1 # Adjust k to continue after consumed lines
-                
-                elif areas_keyword_pattern.match(line_to_check) and not areas_text:
-                    print(f"[PARSER_DEBUG]       Found AREAS AFFECTED keyword line: '{line_to_check}'")
-                    # The actual areas text is expected to be on the next line(s)
-                    temp_areas_lines = []
-                    k_areas = k + 1
-                    while k_areas < len(block_lines) and \
-                          not date_pattern.search(block_lines[k_areas]) and \
-                          not undertaking_keyword_pattern.match(block_lines[k_areas]): # Stop if next undertaking keyword
-                        if not areas_keyword_pattern.match(block_lines[k_areas]): # Avoid re-matching keyword
-                            temp_areas_lines.append(block_lines[k_areas])
-                        k_areas += 1
-                    areas_text = " ".join(temp_areas_lines).strip()
-                    print(f"[PARSER_DEBUG]       Collected AREAS AFFECTED text: '{areas_text}'")
-                    k = k_areas - 1 # Adjust k
-                k += 1
-            
-            # Update main loop index i to skip the processed block
-            i = j -1
-
-            if undertaking_text: # Only proceed if we have an undertaking line
-                feeder = "Unknown"
-                reason = undertaking_text # Default reason is the full undertaking text
-                status = "Outage" # Default status
-
-                # Try to parse Feeder and refine Reason from undertaking_text
-                feeder_reason_match = feeder_reason_pattern.search(undertaking_text)
-                if feeder_reason_match:
-                    feeder_part = feeder_reason_match.group(1).strip()
-                    print(f"[PARSER_DEBUG]         Feeder part from regex: '{feeder_part}', Reason part: '{feeder_reason_match.group(2).strip()}'")
-                    reason = feeder_reason_match.group(2).strip()
-                    # Extract feeder name from feeder_part (e.g., "OGBA FAULT" -> "OGBA")
-                    simple_feeder_match = feeder_simple_pattern.search(feeder_part)
-                    if simple_feeder_match:
-                        feeder = simple_feeder_match.group(1).strip()
-                        print(f"[PARSER_DEBUG]           Simple feeder match: '{feeder}'")
-                    else: # Fallback if simpler pattern doesn't match, use the whole part before ':'
-                        feeder = feeder_part.split(':')[0].strip()
-
-                    # Determine status from keywords
-                    if "DOWNTIME" in feeder_part.upper(): status = "Downtime"
-                    elif "MAINTENANCE" in feeder_part.upper(): status = "Maintenance"
-                    elif "SHUTDOWN" in feeder_part.upper(): status = "Shutdown"
-                    elif "FAULT" in feeder_part.upper(): status = "Fault"
-                    # If reason still contains status keywords, try to clean it
-                    reason = re.sub(r"^(FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)[:\s-]*", "", reason, flags=re.IGNORECASE).strip()
-                
-                # If feeder is still 'Unknown', try a more generic split if ':' is present
-                elif ':' in undertaking_text and feeder == "Unknown":
-                    parts = undertaking_text.split(':', 1)
-                    potential_feeder = parts[0].strip()
-                    # Basic check: feeder names are often uppercase and without too many spaces
-                    if potential_feeder.isupper() and ' ' not in potential_feeder.split()[0]: 
-                        feeder = potential_feeder
-                        reason = parts[1].strip() if len(parts) > 1 else ""
-                        print(f"[PARSER_DEBUG]         Fallback feeder by colon split: Feeder='{feeder}', Reason='{reason}'")
-                
-                data_entries.append({
-                    "Date": formatted_date,
-                    "Feeder": feeder if feeder else "Unknown",
-                    "Status": status,
-                    "Reason": reason if reason else "Not specified",
-                    "Area": areas_text if areas_text else "Not specified"
-                })
-                print(f"[PARSER_DEBUG]         Appended data entry: Date='{formatted_date}', Feeder='{feeder}', Status='{status}', Reason='{reason}', Area='{areas_text if areas_text else 'Not specified'}'")
-        i += 1 # Move to the next line in the main loop
+    if DEBUG:
+        print(f"[PARSER_DEBUG] === Full Text for Parsing ===\n{full_text}\n===============================")
+    return [line.strip() for line in full_text.split('\n') if line.strip()] # Split into clean lines
+
+
+def _format_date(date_str):
+    formatted = _formatted_dates.get(date_str)
+    if formatted is None:
+        try:
+            formatted = datetime.strptime(date_str, "%a, %d %b %Y").strftime("%Y-%m-%d")
+        except ValueError:
+            formatted = date_str # Keep original if parsing fails
+        _formatted_dates[date_str] = formatted
+    return formatted
+
+
+def _make_entry(formatted_date, undertaking_text, areas_text):
+    """Builds an outage record from the UNDERTAKING and AREAS AFFECTED text of one block."""
+    feeder = "Unknown"
+    reason = undertaking_text # Default reason is the full undertaking text
+    status = "Outage" # Default status
+
+    # Try to parse Feeder and refine Reason from undertaking_text
+    feeder_reason_match = FEEDER_REASON_PATTERN.search(undertaking_text)
+    if feeder_reason_match:
+        feeder_part = feeder_reason_match.group(1).strip()
+        reason = feeder_reason_match.group(2).strip()
+        # Extract feeder name from feeder_part (e.g., "OGBA FAULT" -> "OGBA")
+        simple_feeder_match = FEEDER_SIMPLE_PATTERN.search(feeder_part)
+        if simple_feeder_match:
+            feeder = simple_feeder_match.group(1).strip()
+        else: # Fallback if simpler pattern doesn't match, use the whole part before ':'
+            feeder = feeder_part.split(':')[0].strip()
+
+        # Determine status from keywords
+        feeder_part_upper = feeder_part.upper()
+        if "DOWNTIME" in feeder_part_upper: status = "Downtime"
+        elif "MAINTENANCE" in feeder_part_upper: status = "Maintenance"
+        elif "SHUTDOWN" in feeder_part_upper: status = "Shutdown"
+        elif "FAULT" in feeder_part_upper: status = "Fault"
+        # If reason still contains status keywords, try to clean it
+        reason = REASON_STATUS_PREFIX_PATTERN.sub("", reason).strip()
+
+    # If feeder is still 'Unknown', try a more generic split if ':' is present
+    elif ':' in undertaking_text:
+        parts = undertaking_text.split(':', 1)
+        potential_feeder = parts[0].strip()
+        # Basic check: feeder names are often uppercase and without too many spaces
+        if potential_feeder.isupper() and ' ' not in potential_feeder.split()[0]:
+            feeder = potential_feeder
+            reason = parts[1].strip() if len(parts) > 1 else ""
+
+    entry = {
+        "Date": formatted_date,
+        "Feeder": feeder if feeder else "Unknown",
+        "Status": status,
+        "Reason": reason if reason else "Not specified",
+        "Area": areas_text if areas_text else "Not specified"
+    }
+    if DEBUG:
+        print(f"[PARSER_DEBUG] Appended data entry: {entry}")
+    return entry
+
+
+def iter_outages(lines):
+    """Walks the page lines once and yields an outage record per complete date block.
+
+    A block starts at a line containing a date and runs until the next one. Within it,
+    the first non-empty text after an "UNDERTAKING:" line (up to "AREAS AFFECTED:") is
+    the undertaking, and the first non-empty text after "AREAS AFFECTED:" (up to the
+    next "UNDERTAKING:") is the list of areas. Blocks without an undertaking are dropped.
+    """
+    formatted_date = None
+    undertaking_text = areas_text = ""
+    state = _SEEKING
+    collected = []
+
+    for line in lines:
+        if DATE_PATTERN.search(line):
+            if formatted_date is not None:
+                if state == _IN_UNDERTAKING:
+                    undertaking_text = " ".join(collected)
+                elif state == _IN_AREAS:
+                    areas_text = " ".join(collected)
+                if undertaking_text: # Only proceed if we have an undertaking line
+                    yield _make_entry(formatted_date, undertaking_text, areas_text)
+            formatted_date = _format_date(DATE_PATTERN.search(line).group(0))
+            undertaking_text = areas_text = ""
+            state = _SEEKING
+            continue
+        if formatted_date is None:
+            continue # Text before the first date
+
+        is_undertaking = UNDERTAKING_KEYWORD_PATTERN.match(line)
+        is_areas = not is_undertaking and AREAS_KEYWORD_PATTERN.match(line)
+        if state == _IN_UNDERTAKING:
+            if is_areas:
+                undertaking_text = " ".join(collected)
+                state = _SEEKING # Re-examine this line below
+            else:
+                if not is_undertaking: # Avoid re-matching keyword
+                    collected.append(line)
+                continue
+        elif state == _IN_AREAS:
+            if is_undertaking:
+                areas_text = " ".join(collected)
+                state = _SEEKING # Re-examine this line below
+            else:
+                if not is_areas: # Avoid re-matching keyword
+                    collected.append(line)
+                continue
+
+        if is_undertaking and not undertaking_text:
+            state, collected = _IN_UNDERTAKING, []
+        elif is_areas and not areas_text:
+            state, collected = _IN_AREAS, []
+
+    if formatted_date is not None:
+        if state == _IN_UNDERTAKING:
+            undertaking_text = " ".join(collected)
+        elif state == _IN_AREAS:
+            areas_text = " ".join(collected)
+        if undertaking_text:
+            yield _make_entry(formatted_date, undertaking_text, areas_text)
+
+
+def parse_outages(html):
+    """Parses the raw HTML of the CNN page into a cleaned outage DataFrame.
+
+    Args:
+        html (bytes or str): The page content.
+
+    Returns:
+        pandas.DataFrame: One row per notice with Date, Feeder, Status, Reason and Area.
+                          Empty (with those columns) if nothing could be parsed.
+    """
+    with metrics.timer('cnn_parse_seconds'):
+        data_entries = list(iter_outages(_extract_lines(html)))
+    metrics.observe('cnn_parse_rows', len(data_entries))
 
     if not data_entries:
-        print("[PARSER_DEBUG] No data entries were successfully parsed and appended. This means the main parsing loop did not identify complete data blocks according to the current logic (Date -> Undertaking -> Areas Affected).")
         print("No data entries parsed. Check website structure or parsing logic.")
         return pd.DataFrame(columns=['Date', 'Feeder', 'Status', 'Reason', 'Area'])
 
+    with metrics.timer('cnn_dataframe_build_seconds'):
+        return _build_frame(data_entries)
+
+
+def _clean_column(values, clean):
+    """Applies a string cleanup once per distinct value and returns a categorical column."""
+    codes, uniques = pd.factorize(values)
+    cleaned_codes, categories = pd.factorize(clean(pd.Index(uniques).astype(str)))
+    return pd.Categorical.from_codes(cleaned_codes[codes], categories)
+
+
+def _build_frame(data_entries):
+    """Builds the cleaned outage DataFrame, in canonical typed form, from parsed records."""
     df = pd.DataFrame(data_entries)
-    
-    # Basic Data Cleaning
-    df['Feeder'] = df['Feeder'].str.strip().str.upper()
-    df['Area'] = df['Area'].str.strip()
-    df['Reason'] = df['Reason'].str.strip()
-    df['Status'] = df['Status'].str.strip().str.capitalize()
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.strftime('%Y-%m-%d')
+
+    # Basic Data Cleaning, done per distinct value. The text columns end up as categoricals
+    # and 'Date' as datetime64, the canonical form described in outage_frame.
+    df['Feeder'] = _clean_column(df['Feeder'], lambda values: values.str.strip().str.upper())
+    df['Area'] = _clean_column(df['Area'], lambda values: values.str.strip())
+    df['Reason'] = _clean_column(df['Reason'], lambda values: values.str.strip())
+    df['Status'] = _clean_column(df['Status'], lambda values: values.str.strip().str.capitalize())
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.normalize()
 
     # Remove entries where Date could not be parsed
     df.dropna(subset=['Date'], inplace=True)
 
-    return df
+    # Adds the cause category of each reason
+    return canonicalize(df[COLUMNS].reset_index(drop=True))
 
 if __name__ == '__main__':
     print(f"Attempting to scrape data from {URL}...")
@@ -0,0 +1,4 @@
+import os
+
+# Root for everything the app persists locally: snapshots, the outage history, metrics.
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
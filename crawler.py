@@ -0,0 +1,191 @@
+"""Backfills the outage history from paginated or archived CNN listings.
+
+Pages are fetched by a bounded thread pool with a per-host rate limit, parsed in a
+process pool, and merged (deduplicated) into the HistoryStore. Finished pages are
+recorded in a checkpoint file, so an interrupted crawl resumes where it stopped. The
+running app's snapshot writer publishes the new history rows on its next poll.
+
+Usage:
+    python crawler.py 'https://www.ikejaelectric.com/cnn/page/{page}/' --pages 1-200
+
+Offline, against the stub server from synthetic.py:
+    python synthetic.py 500 --serve 8800 --pages 50 &
+    python crawler.py 'http://127.0.0.1:8800/cnn/page/{page}/' --pages 1-60
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+
+from cnn_parser import fetch_page, parse_outages
+from config import DATA_DIR
+from history_store import HistoryStore
+
+CRAWL_CONCURRENCY = int(os.environ.get('CRAWL_CONCURRENCY', 4))
+# Requests per second allowed to any single host
+CRAWL_RATE_PER_HOST = float(os.environ.get('CRAWL_RATE_PER_HOST', 2.0))
+CRAWL_PARSE_PROCESSES = int(os.environ.get('CRAWL_PARSE_PROCESSES', os.cpu_count() or 1))
+CHECKPOINT_DIR = os.environ.get('CRAWL_CHECKPOINT_DIR', os.path.join(DATA_DIR, 'crawls'))
+
+
+class HostRateLimiter:
+    """Spaces out requests to each host to at most `rate` per second, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Blocks until a request to the host of `url` is allowed."""
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Checkpoint:
+    """The set of URLs a named crawl has finished, persisted after every page.
+
+    A page counts as finished once its rows are merged (or the server said it does not
+    exist); failed pages are not recorded, so resuming retries them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done = json.load(f).get('done', {})
+
+    def __contains__(self, url):
+        return url in self.done
+
+    def mark(self, url, rows, inserted):
+        self.done[url] = {"rows": rows, "inserted": inserted, "at": time.time()}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"done": self.done}, f)
+        os.replace(tmp_path, self.path)
+
+
+def page_urls(template, first, last):
+    """Expands a URL template containing '{page}' for pages first..last (inclusive)."""
+    return [template.format(page=page) for page in range(first, last + 1)]
+
+
+def _fetch(url, limiter):
+    """Fetches one page. Returns (url, body), where body is None if the page does not exist."""
+    limiter.wait(url)
+    try:
+        return url, fetch_page(url).content
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code in (404, 410):
+            return url, None
+        raise
+
+
+def crawl(urls, history, checkpoint, concurrency=CRAWL_CONCURRENCY, rate=CRAWL_RATE_PER_HOST,
+          processes=CRAWL_PARSE_PROCESSES):
+    """Fetches, parses and merges every URL not yet in the checkpoint.
+
+    Args:
+        urls (list): Pages to crawl.
+        history (HistoryStore): Where parsed rows are merged.
+        checkpoint (Checkpoint): Pages already done; updated as pages finish.
+        concurrency (int): Pages fetched at the same time.
+        rate (float): Requests per second per host (0 for no limit).
+        processes (int): Parser processes.
+
+    Returns:
+        dict: Counts of pages crawled, skipped, missing and failed, and rows parsed and inserted.
+    """
+    stats = {"pages": 0, "skipped": 0, "missing": 0, "failed": 0, "rows": 0, "inserted": 0}
+    todo = []
+    for url in urls:
+        if url in checkpoint:
+            stats["skipped"] += 1
+        else:
+            todo.append(url)
+    todo.reverse()  # Popped from the end, so pages are started in order
+    limiter = HostRateLimiter(rate)
+    # Bounds the pages held in memory between fetching and merging.
+    max_in_flight = concurrency + processes
+
+    with ThreadPoolExecutor(concurrency, thread_name_prefix='crawl-fetch') as fetchers, \
+            ProcessPoolExecutor(processes) as parsers:
+        in_flight = {}  # future -> (stage, url)
+        while todo or in_flight:
+            while todo and len(in_flight) < max_in_flight:
+                url = todo.pop()
+                in_flight[fetchers.submit(_fetch, url, limiter)] = ('fetch', url)
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, url = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Crawling {url} failed at {stage}: {e}")
+                    stats["failed"] += 1
+                    continue
+                if stage == 'fetch':
+                    body = result[1]
+                    if body is None:
+                        stats["missing"] += 1
+                        checkpoint.mark(url, 0, 0)
+                    else:
+                        in_flight[parsers.submit(parse_outages, body)] = ('parse', url)
+                    continue
+                inserted = history.merge(result)
+                stats["pages"] += 1
+                stats["rows"] += len(result)
+                stats["inserted"] += inserted
+                checkpoint.mark(url, len(result), inserted)
+                print(f"{url}: {len(result)} rows, {inserted} new.")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfills the outage history from archived CNN pages.")
+    parser.add_argument('template', help="page URL with a '{page}' placeholder")
+    parser.add_argument('--pages', default='1-10', help="inclusive page range, e.g. 1-200")
+    parser.add_argument('--name', help="checkpoint name (default: derived from the URL template)")
+    parser.add_argument('--concurrency', type=int, default=CRAWL_CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=CRAWL_RATE_PER_HOST,
+                        help="requests per second per host (0 disables the limit)")
+    parser.add_argument('--processes', type=int, default=CRAWL_PARSE_PROCESSES)
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and crawl every page")
+    args = parser.parse_args(argv)
+
+    if '{page}' not in args.template:
+        parser.error("the URL template needs a '{page}' placeholder")
+    first, _, last = args.pages.partition('-')
+    urls = page_urls(args.template, int(first), int(last or first))
+    name = args.name or ''.join(c if c.isalnum() else '_' for c in args.template).strip('_')
+    checkpoint_path = os.path.join(CHECKPOINT_DIR, f'{name}.json')
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    start = time.perf_counter()
+    stats = crawl(urls, HistoryStore(), Checkpoint(checkpoint_path), args.concurrency, args.rate,
+                  args.processes)
+    print(f"Crawled {stats['pages']} pages in {time.perf_counter() - start:.1f}s: {stats['rows']} rows, "
+          f"{stats['inserted']} new; {stats['skipped']} already done, {stats['missing']} missing, "
+          f"{stats['failed']} failed. Checkpoint: {checkpoint_path}")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
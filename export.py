@@ -0,0 +1,278 @@
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import DATA_DIR
+
+EXPORT_DIR = os.environ.get('EXPORT_DIR', os.path.join(DATA_DIR, 'export'))
+FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'csv': ('text/csv', 'csv'),
+}
+# Rows per record batch / row group when streaming an export
+EXPORT_BATCH_ROWS = 65536
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class _ChunkSink:
+    """A write-only file object whose written bytes are drained as they accumulate."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class ExportStore:
+    """The outage history as monthly Parquet and Arrow partitions, for bulk extraction.
+
+    Each month is stored as `<YYYY-MM>/part-v<version>.parquet` plus an Arrow IPC file
+    of the same rows, sorted by date. Only the writer process updates the partitions,
+    after it publishes a snapshot; as the history is append-only, a month is rewritten
+    only when its row count changed, which is normally just the current month. Months
+    a retention policy compacted out of the raw rows are frozen: their partitions stay
+    as they were last exported, the only place their individual rows are still kept
+    (the history only compacts a month once `month_rows` shows all of it exported).
+    `manifest.json` is replaced atomically once every partition of a version is written.
+    """
+
+    def __init__(self, directory=EXPORT_DIR):
+        self.directory = directory
+        self._manifest_cache = (None, None)
+
+    def _path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def manifest(self):
+        """Returns the current export manifest, or None if nothing was exported yet."""
+        path = self._path(MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached_mtime, cached = self._manifest_cache
+        if cached_mtime == mtime:
+            return cached
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return cached
+        self._manifest_cache = (mtime, manifest)
+        return manifest
+
+    @property
+    def version(self):
+        manifest = self.manifest()
+        return manifest['version'] if manifest else 0
+
+    def update(self, frame, version, frozen_before=None):
+        """Rewrites the monthly partitions of `frame` whose rows changed, as of `version`.
+
+        Args:
+            frame (pandas.DataFrame): The canonical snapshot frame (the raw history).
+            version (int): The snapshot version the frame belongs to.
+            frozen_before (str): First month ('YYYY-MM') not compacted; earlier months
+                                 that were exported already are kept as they are.
+
+        Returns:
+            int: The number of partitions written.
+        """
+        import pyarrow.parquet as pq
+
+        previous = (self.manifest() or {}).get('partitions', {})
+        dates = frame['Date'].to_numpy().astype('datetime64[M]')
+        valid = ~np.isnat(dates)
+        month_codes, months = _factorize_months(dates[valid])
+        positions = np.flatnonzero(valid)
+        counts = np.bincount(month_codes, minlength=len(months))
+
+        partitions = {month: partition for month, partition in previous.items()
+                      if frozen_before is not None and month < frozen_before}
+        written = 0
+        for code, month in enumerate(months):
+            rows = int(counts[code])
+            if month in partitions:
+                continue
+            if previous.get(month, {}).get('rows') == rows:
+                partitions[month] = previous[month]
+                continue
+            part = frame.iloc[positions[month_codes == code]].sort_values('Date', kind='stable')
+            for column in part.columns:
+                if hasattr(part[column], 'cat'):
+                    part[column] = part[column].cat.remove_unused_categories()
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            os.makedirs(self._path(month), exist_ok=True)
+            names = {}
+            for kind, extension in (('parquet', 'parquet'), ('arrow', 'arrow')):
+                name = f'part-v{version:08d}.{extension}'
+                tmp_path = self._path(month, name + '.tmp')
+                if kind == 'parquet':
+                    pq.write_table(table, tmp_path, compression='zstd')
+                else:
+                    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                os.replace(tmp_path, self._path(month, name))
+                names[kind] = f'{month}/{name}'
+            partitions[month] = {'rows': rows, **names}
+            written += 1
+
+        manifest = {'version': version, 'rows': sum(partition['rows'] for partition in partitions.values()),
+                    'partitions': partitions}
+        tmp_manifest = self._path(MANIFEST_NAME + '.tmp')
+        os.makedirs(self.directory, exist_ok=True)
+        with open(tmp_manifest, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest, self._path(MANIFEST_NAME))
+        self._prune(previous, partitions)
+        return written
+
+    def _prune(self, previous, current):
+        """Removes the files of the partitions replaced one update ago.
+
+        The just-replaced files are kept, so exports already streaming from them finish.
+        """
+        keep = {path for partition in list(previous.values()) + list(current.values())
+                for path in (partition['parquet'], partition['arrow'])}
+        for month in set(previous) | set(current):
+            month_dir = self._path(month)
+            if not os.path.isdir(month_dir):
+                continue
+            for name in os.listdir(month_dir):
+                if name.startswith('part-v') and not name.endswith('.tmp') and f'{month}/{name}' not in keep:
+                    os.remove(os.path.join(month_dir, name))
+
+    def month_rows(self):
+        """Returns the number of rows exported per month ('YYYY-MM')."""
+        partitions = (self.manifest() or {}).get('partitions', {})
+        return {month: partition['rows'] for month, partition in partitions.items()}
+
+    def months(self, date_from=None, date_to=None):
+        """Returns the exported partitions overlapping an inclusive date range, oldest first."""
+        partitions = (self.manifest() or {}).get('partitions', {})
+        first = date_from.strftime('%Y-%m') if date_from is not None else None
+        last = date_to.strftime('%Y-%m') if date_to is not None else None
+        return [(month, partitions[month]) for month in sorted(partitions)
+                if (first is None or month >= first) and (last is None or month <= last)]
+
+    def _open(self, partition):
+        """Opens a partition's memory-mapped Arrow file."""
+        return pa.ipc.open_file(pa.memory_map(self._path(partition['arrow']), 'r'))
+
+    def _read(self, partition):
+        """Maps a partition's Arrow file; its columns reference the mapped pages, not copies."""
+        return self._open(partition).read_all()
+
+    def partition_file(self, date_from, date_to, format):
+        """Returns the path of a partition file that is exactly the requested export, if any.
+
+        That is the case for Parquet and a range covering one whole month, which can
+        then be sent as it is on disk.
+        """
+        if format != 'parquet':
+            return None
+        months = self.months(date_from, date_to)
+        if len(months) != 1:
+            return None
+        month, partition = months[0]
+        month_start = np.datetime64(month, 'D')
+        month_end = np.datetime64(month, 'M') + 1
+        if date_from is not None and np.datetime64(date_from, 'D') > month_start:
+            return None
+        if date_to is not None and np.datetime64(date_to, 'D') < month_end - np.timedelta64(1, 'D'):
+            return None
+        return self._path(partition['parquet'])
+
+    def stream(self, format, date_from=None, date_to=None, batch_rows=EXPORT_BATCH_ROWS):
+        """Yields the bytes of an export, one batch at a time.
+
+        The export is written one month at a time: each partition is memory-mapped from
+        its Arrow file, filtered if it is at an edge of the range, cast to the export
+        schema and written out before the next one is opened. Memory use is bounded by
+        the largest month rather than the range, and no DataFrame or per-row Python
+        objects are built.
+
+        Args:
+            format (str): One of FORMATS.
+            date_from (datetime.date): First day included, or None.
+            date_to (datetime.date): Last day included, or None.
+            batch_rows (int): Rows per record batch / Parquet row group.
+        """
+        # Writers are imported on first use; most workers never serve an export.
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+
+        months = self.months(date_from, date_to)
+        # An empty export still carries the schema of the history
+        schemas = [self._open(partition).schema for _, partition in (months or self.months()[:1])]
+        # Months are dictionary-encoded separately, with index widths that depend on
+        # their category counts; the export uses one type wide enough for all of them.
+        schema = pa.unify_schemas(schemas, promote_options='permissive') if schemas else pa.schema([])
+        if format == 'csv':
+            # Plain dates and strings read back more cleanly than timestamps and dictionaries.
+            schema = pa.schema([pa.field(field.name, pa.date32()) if field.name == 'Date'
+                                else pa.field(field.name, field.type.value_type)
+                                if pa.types.is_dictionary(field.type) else field for field in schema])
+
+        sink = _ChunkSink()
+        if format == 'parquet':
+            writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        elif format == 'arrow':
+            # Each month's dictionaries are sent as replacements ahead of its batches.
+            writer = pa.ipc.new_stream(sink, schema)
+        else:
+            writer = pa_csv.CSVWriter(sink, schema)
+        with writer:
+            for _, partition in months:
+                table = _conform(_filter_dates(self._read(partition), date_from, date_to), schema)
+                for batch in table.to_batches(max_chunksize=batch_rows):
+                    if format == 'parquet':
+                        writer.write_table(pa.Table.from_batches([batch], schema=schema), row_group_size=batch_rows)
+                    else:
+                        writer.write_batch(batch)
+                    data = sink.drain()
+                    if data:
+                        yield data
+        yield sink.drain()
+
+
+def _factorize_months(months):
+    """Returns (codes, 'YYYY-MM' labels) for an array of datetime64[M] values."""
+    uniques, codes = np.unique(months, return_inverse=True)
+    return codes, [str(month) for month in uniques]
+
+
+def _conform(table, schema):
+    """Casts a partition to the export schema; columns it predates are filled with nulls."""
+    columns = [pc.cast(table[field.name], field.type) if field.name in table.column_names
+               else pa.nulls(table.num_rows, field.type) for field in schema]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _filter_dates(table, date_from, date_to):
+    dates = pc.cast(table['Date'], pa.date32())
+    mask = None
+    if date_from is not None:
+        mask = pc.greater_equal(dates, pa.scalar(date_from, pa.date32()))
+    if date_to is not None:
+        upper = pc.less_equal(dates, pa.scalar(date_to, pa.date32()))
+        mask = upper if mask is None else pc.and_(mask, upper)
+    if mask is None or pc.all(mask).as_py():
+        return table
+    return table.filter(mask)
@@ -0,0 +1,31 @@
+"""Gunicorn settings, loaded automatically from the working directory (see Procfile).
+
+The app is imported once in the master (preload_app), which loads the last published
+snapshot from disk; workers fork from that warm process and share its memory
+copy-on-write, so a deploy or worker recycle never starts with an empty cache.
+"""
+import gc
+
+# SSE streams are long-lived; with gevent each idle one costs a greenlet, not a worker.
+worker_class = 'gevent'
+worker_connections = 2000
+preload_app = True
+
+if worker_class == 'gevent':
+    # The gevent worker patches the standard library only after forking. The preloaded
+    # app creates its locks before that, so patch first or they would block the event loop.
+    from gevent import monkey
+    monkey.patch_all()
+
+
+def when_ready(server):
+    # Everything loaded so far lives as long as the master; keeping it out of garbage
+    # collection stops workers from touching (and so copying) those shared pages.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Threads do not survive fork: start this worker's snapshot refresher now rather
+    # than on its first request.
+    from app import REFRESHER
+    REFRESHER.start()
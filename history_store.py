@@ -0,0 +1,552 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from classifier import classify_reasons
+from config import DATA_DIR
+from location_index import split_locations
+from outage_frame import COLUMNS, COUNT_COLUMN, FRAME_COLUMNS, MONTHLY_COLUMN, canonicalize, date_strings, empty_frame
+
+HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', os.path.join(DATA_DIR, 'outages.db'))
+# Number of snapshot versions whose page changes are kept for /api/changes
+CHANGE_RING_VERSIONS = int(os.environ.get('CHANGE_RING_VERSIONS', 100))
+
+# SQLite limits the number of bound parameters per statement.
+_KEY_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    row_key TEXT NOT NULL UNIQUE,
+    date TEXT NOT NULL,
+    feeder TEXT NOT NULL,
+    status TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    area TEXT NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outages_date ON outages (date);
+CREATE INDEX IF NOT EXISTS idx_outages_feeder ON outages (feeder);
+CREATE INDEX IF NOT EXISTS idx_outages_area ON outages (area);
+
+-- Daily outage counts per dimension value ('' for the 'total' dimension). Area counts
+-- are per individual location, so one notice can count towards several areas.
+CREATE TABLE IF NOT EXISTS outage_rollup (
+    dimension TEXT NOT NULL,
+    day TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, day, value)
+) WITHOUT ROWID;
+-- Highest outages.id already counted in outage_rollup
+CREATE TABLE IF NOT EXISTS rollup_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    last_id INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO rollup_state (id, last_id) VALUES (0, 0);
+
+-- The last scraped CNN page, which the next scrape is diffed against
+CREATE TABLE IF NOT EXISTS current_page (
+    position INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    feeder TEXT NOT NULL,
+    status TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    area TEXT NOT NULL
+);
+-- Ring of the last CHANGE_RING_VERSIONS snapshot versions and their page changes
+CREATE TABLE IF NOT EXISTS change_versions (
+    version INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    changes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS page_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    version INTEGER NOT NULL,
+    change TEXT NOT NULL,
+    date TEXT NOT NULL,
+    feeder TEXT NOT NULL,
+    status TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    area TEXT NOT NULL,
+    previous TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_page_changes_version ON page_changes (version);
+
+-- Tiers of outages compacted out of the raw table (see retention.py): counts per day,
+-- then per month (keyed by its first day), feeder, status and cause. Areas are free
+-- text, so they are not kept; the rollup still has the per-location counts.
+CREATE TABLE IF NOT EXISTS outage_daily (
+    day TEXT NOT NULL,
+    feeder TEXT NOT NULL,
+    status TEXT NOT NULL,
+    cause TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, feeder, status, cause)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outage_monthly (
+    month TEXT NOT NULL,
+    feeder TEXT NOT NULL,
+    status TEXT NOT NULL,
+    cause TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (month, feeder, status, cause)
+) WITHOUT ROWID;
+-- `epoch` is incremented by every compaction, which tells the publisher to reload the
+-- tiers. Every row dated before `compacted_before` ('' for none) has been compacted (or
+-- is being, a batch at a time), so merges ignore rows dated before it.
+CREATE TABLE IF NOT EXISTS retention_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    epoch INTEGER NOT NULL,
+    compacted_before TEXT NOT NULL DEFAULT ''
+);
+INSERT OR IGNORE INTO retention_state (id, epoch) VALUES (0, 0);
+"""
+
+TREND_DIMENSIONS = ('total', 'feeder', 'status', 'area')
+
+# SQL expressions mapping a 'YYYY-MM-DD' day to the first day of its bucket
+# (weeks start on Monday).
+TREND_GRANULARITIES = {
+    'day': 'day',
+    'week': "date(day, '-6 days', 'weekday 1')",
+    'month': "substr(day, 1, 7) || '-01'",
+}
+
+
+def _next_month(month):
+    """Returns the first day of the month after 'YYYY-MM', as 'YYYY-MM-DD'."""
+    year, number = int(month[:4]), int(month[5:7])
+    return f'{year + number // 12:04d}-{number % 12 + 1:02d}-01'
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _upgrade_schema(conn):
+    """Moves aside the tiers of histories that kept them per area; runs before _SCHEMA."""
+    if 'area' not in _columns(conn, 'outage_daily'):
+        return
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('ALTER TABLE outage_daily RENAME TO outage_daily_by_area')
+        conn.execute('ALTER TABLE outage_monthly RENAME TO outage_monthly_by_area')
+        if 'compacted_before' not in _columns(conn, 'retention_state'):
+            conn.execute("ALTER TABLE retention_state ADD COLUMN compacted_before TEXT NOT NULL DEFAULT ''")
+
+
+def _fold_area_tiers(conn):
+    """Sums the tiers moved aside by `_upgrade_schema` over their areas; runs after _SCHEMA."""
+    if not _columns(conn, 'outage_daily_by_area'):
+        return
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        for table, period in (('outage_daily', 'day'), ('outage_monthly', 'month')):
+            conn.execute(f'INSERT INTO {table} SELECT {period}, feeder, status, cause, SUM(count) '
+                         f'FROM {table}_by_area GROUP BY {period}, feeder, status, cause')
+            conn.execute(f'DROP TABLE {table}_by_area')
+        # Compaction went a whole month at a time, oldest first, so everything up to the
+        # newest compacted month is done; its watermark replaces the compacted row keys.
+        last = conn.execute('SELECT MAX(period) FROM (SELECT MAX(day) AS period FROM outage_daily '
+                            'UNION ALL SELECT MAX(month) FROM outage_monthly)').fetchone()[0]
+        if last:
+            conn.execute('UPDATE retention_state SET compacted_before = ? WHERE id = 0', (_next_month(last[:7]),))
+        conn.execute('DROP TABLE IF EXISTS compacted_keys')
+
+
+def row_key(date, feeder, reason, area):
+    """Returns the stable identity of an outage notice.
+
+    Status is left out on purpose: it is derived from the same undertaking text as the
+    feeder and reason, so it cannot change without one of them changing too.
+    """
+    raw = '\x1f'.join(str(value) for value in (date, feeder, reason, area))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class HistoryStore:
+    """Deduplicated history of every outage notice ever scraped.
+
+    Each scrape is merged in; rows already seen (by `row_key`) are ignored, so the
+    history keeps growing past the window shown on the CNN page. Rows are only ever
+    appended, unless a retention policy compacts the old ones into daily and monthly
+    counts (see `compact`); rows dated before the compacted ones are then ignored, as
+    they were counted already.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            _upgrade_schema(conn)
+            conn.executescript(_SCHEMA)
+            _fold_area_tiers(conn)
+            # Counts rows added before the rollup existed, or by a process that died mid-merge.
+            conn.execute('BEGIN IMMEDIATE')
+            self._update_rollup(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def merge(self, df):
+        """Inserts the rows of `df` that are not in the history yet.
+
+        Rows dated before `compacted_before()` are skipped: their months were compacted.
+
+        Args:
+            df (pandas.DataFrame): Scraped outage data with the standard columns.
+
+        Returns:
+            int: The number of new rows inserted.
+        """
+        if df.empty:
+            return 0
+        dates = date_strings(df['Date'])
+        keys = [row_key(*values) for values in zip(dates, df['Feeder'], df['Reason'], df['Area'])]
+        now = time.time()
+        rows = [
+            (key, date, feeder, status, reason, area, now)
+            for key, date, feeder, status, reason, area in
+            zip(keys, dates, df['Feeder'], df['Status'], df['Reason'], df['Area'])
+        ]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                before = conn.total_changes
+                conn.executemany(
+                    'INSERT OR IGNORE INTO outages (row_key, date, feeder, status, reason, area, first_seen) '
+                    'SELECT ?, ?, ?, ?, ?, ?, ? '
+                    'WHERE ?2 >= (SELECT compacted_before FROM retention_state WHERE id = 0)',
+                    rows
+                )
+                inserted = conn.total_changes - before
+                # Same transaction, so the rollup never disagrees with the committed rows.
+                self._update_rollup(conn)
+                return inserted
+        finally:
+            conn.close()
+
+    def _update_rollup(self, conn):
+        """Adds the rows inserted since the last update to the daily rollup.
+
+        Must run inside a write transaction. Only the new rows are read, so the cost
+        is proportional to what was just merged, not to the size of the history.
+        """
+        last_id = conn.execute('SELECT last_id FROM rollup_state WHERE id = 0').fetchone()[0]
+        records = conn.execute(
+            'SELECT id, date, feeder, status, area FROM outages WHERE id > ? ORDER BY id',
+            (last_id,)
+        ).fetchall()
+        if not records:
+            return
+        counts = {}
+        locations = {}
+        for _, day, feeder, status, area in records:
+            if area not in locations:
+                # Each distinct Area string is split once per merge
+                locations[area] = set(split_locations(area))
+            cells = [('total', ''), ('feeder', feeder), ('status', status)]
+            cells.extend(('area', location) for location in locations[area])
+            for dimension, value in cells:
+                key = (dimension, day, value)
+                counts[key] = counts.get(key, 0) + 1
+        conn.executemany(
+            'INSERT INTO outage_rollup (dimension, day, value, count) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (dimension, day, value) DO UPDATE SET count = count + excluded.count',
+            [(dimension, day, value, count) for (dimension, day, value), count in counts.items()]
+        )
+        conn.execute('UPDATE rollup_state SET last_id = ? WHERE id = 0', (records[-1][0],))
+
+    def trend_counts(self, date_from=None, date_to=None, granularity='day', by='total'):
+        """Returns outage counts per time bucket from the rollup.
+
+        The query reads only the daily rollup cells inside the date range, never the
+        raw outage rows.
+
+        Args:
+            date_from (str): First day to include, as YYYY-MM-DD (default: no bound).
+            date_to (str): Last day to include, as YYYY-MM-DD (default: no bound).
+            granularity (str): One of TREND_GRANULARITIES ('day', 'week' or 'month').
+            by (str): One of TREND_DIMENSIONS. 'total' counts all outages.
+
+        Returns:
+            list: (bucket start as YYYY-MM-DD, value, count) tuples ordered by bucket,
+                  then by descending count. The value is '' for 'total'.
+        """
+        bucket = TREND_GRANULARITIES[granularity]
+        if by not in TREND_DIMENSIONS:
+            raise KeyError(by)
+        conn = self._connect()
+        try:
+            return conn.execute(
+                f'SELECT {bucket} AS bucket, value, SUM(count) AS total FROM outage_rollup '
+                'WHERE dimension = ? AND day >= ? AND day <= ? '
+                'GROUP BY bucket, value ORDER BY bucket, total DESC, value',
+                (by, date_from or '0000-00-00', date_to or '9999-99-99')
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def max_id(self):
+        """Returns the id of the most recently inserted row (0 when empty)."""
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM outages').fetchone()[0]
+        finally:
+            conn.close()
+
+    def rows_since(self, last_id=0):
+        """Returns the rows added after `last_id`, in insertion order.
+
+        Args:
+            last_id (int): The highest row id already seen (0 loads everything).
+
+        Returns:
+            tuple: (canonical pandas.DataFrame with the standard columns, indexed by row id
+                    (named 'id'), highest row id returned).
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'SELECT id, date, feeder, status, reason, area FROM outages WHERE id > ? ORDER BY id',
+                (last_id,)
+            )
+            records = cursor.fetchall()
+        finally:
+            conn.close()
+        if not records:
+            return empty_frame(), last_id
+        df = pd.DataFrame([record[1:] for record in records], columns=COLUMNS,
+                          index=pd.Index([record[0] for record in records], name='id'))
+        return canonicalize(df), records[-1][0]
+
+    def retention_epoch(self):
+        """Returns the number of compactions so far; it changes whenever rows leave a tier."""
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT epoch FROM retention_state WHERE id = 0').fetchone()[0]
+        finally:
+            conn.close()
+
+    def compacted_before(self):
+        """Returns the first day ('YYYY-MM-DD') not compacted, or None if nothing is."""
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT compacted_before FROM retention_state WHERE id = 0').fetchone()[0] or None
+        finally:
+            conn.close()
+
+    def compact(self, raw_before, daily_before, batch_rows, exported=None):
+        """Moves one batch of old data down a tier, in a single transaction.
+
+        Raw rows are compacted a month at a time, oldest first. A month is started only
+        if it is before `raw_before` and, with `exported`, only once its export
+        partition holds all of its raw rows; `compacted_before()` then moves past it, so
+        no more rows are merged into it. Its rows are counted into the daily tier, per
+        day, feeder, status and cause, and deleted. Once no raw rows are due, daily
+        cells before `daily_before` are folded into the monthly tier. The trend rollup
+        already counted the rows, so it is left as it is.
+
+        Args:
+            raw_before (str): First day ('YYYY-MM-DD') whose raw rows are kept; month-aligned.
+            daily_before (str): First day whose daily cells are kept.
+            batch_rows (int): Most raw rows (or daily cells) moved.
+            exported (dict): Rows per exported month ('YYYY-MM'), from the export
+                             manifest; None compacts months whether exported or not.
+
+        Returns:
+            tuple: (raw rows compacted, daily cells compacted); both 0 once caught up.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                watermark = conn.execute('SELECT compacted_before FROM retention_state WHERE id = 0').fetchone()[0]
+                records = self._raw_batch(conn, watermark, batch_rows)
+                if not records:
+                    month, rows = conn.execute(
+                        'SELECT substr(MIN(date), 1, 7), COUNT(*) FROM outages WHERE substr(date, 1, 7) = '
+                        '(SELECT substr(MIN(date), 1, 7) FROM outages WHERE date < ?)', (raw_before,)
+                    ).fetchone()
+                    if month is not None and (exported is None or exported.get(month) == rows):
+                        watermark = _next_month(month)
+                        conn.execute('UPDATE retention_state SET compacted_before = ? WHERE id = 0', (watermark,))
+                        records = self._raw_batch(conn, watermark, batch_rows)
+                cells = []
+                if records:
+                    _, days, feeders, statuses, reasons = zip(*records)
+                    causes = classify_reasons(pd.Series(reasons, dtype='category')).astype(str)
+                    counts = {}
+                    for cell in zip(days, feeders, statuses, causes):
+                        counts[cell] = counts.get(cell, 0) + 1
+                    conn.executemany(
+                        'INSERT INTO outage_daily (day, feeder, status, cause, count) VALUES (?, ?, ?, ?, ?) '
+                        'ON CONFLICT (day, feeder, status, cause) DO UPDATE SET count = count + excluded.count',
+                        [(*cell, count) for cell, count in counts.items()]
+                    )
+                    conn.executemany('DELETE FROM outages WHERE id = ?', [(record[0],) for record in records])
+                else:
+                    cells = conn.execute(
+                        'SELECT day, feeder, status, cause, count FROM outage_daily '
+                        'WHERE day < ? ORDER BY day LIMIT ?', (daily_before, batch_rows)
+                    ).fetchall()
+                    conn.executemany(
+                        'INSERT INTO outage_monthly (month, feeder, status, cause, count) '
+                        'VALUES (substr(?, 1, 7) || \'-01\', ?, ?, ?, ?) '
+                        'ON CONFLICT (month, feeder, status, cause) DO UPDATE SET count = count + excluded.count',
+                        cells
+                    )
+                    conn.executemany(
+                        'DELETE FROM outage_daily WHERE day = ? AND feeder = ? AND status = ? AND cause = ?',
+                        [cell[:4] for cell in cells]
+                    )
+                if records or cells:
+                    conn.execute('UPDATE retention_state SET epoch = epoch + 1 WHERE id = 0')
+                return len(records), len(cells)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _raw_batch(conn, before, batch_rows):
+        return conn.execute(
+            'SELECT id, date, feeder, status, reason FROM outages WHERE date < ? ORDER BY date, id LIMIT ?',
+            (before, batch_rows)
+        ).fetchall()
+
+    def compacted_frame(self):
+        """Returns the daily and monthly tiers as one canonical frame.
+
+        Each row stands for `Count` outages, dated on its day or, for the monthly tier
+        (marked in the `Monthly` column), on the first day of its month. The tiers keep
+        neither the Reason nor the Area, so those columns are empty.
+        """
+        conn = self._connect()
+        try:
+            # One read transaction, so a concurrent compaction is not seen half-way.
+            conn.execute('BEGIN')
+            records = conn.execute(
+                'SELECT month, feeder, status, cause, count, 1 FROM outage_monthly '
+                'UNION ALL SELECT day, feeder, status, cause, count, 0 FROM outage_daily'
+            ).fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+        if not records:
+            return empty_frame().assign(**{COUNT_COLUMN: pd.Series(dtype='int64'),
+                                           MONTHLY_COLUMN: pd.Series(dtype='bool')})
+        days, feeders, statuses, causes, counts, monthly = zip(*records)
+        df = pd.DataFrame({'Date': days, 'Feeder': feeders, 'Status': statuses, 'Reason': None,
+                           'Area': None, 'Cause': pd.Categorical(causes)})
+        frame = canonicalize(df)
+        frame[COUNT_COLUMN] = np.asarray(counts, dtype='int64')
+        frame[MONTHLY_COLUMN] = np.asarray(monthly, dtype=bool)
+        return frame[FRAME_COLUMNS + [COUNT_COLUMN, MONTHLY_COLUMN]]
+
+    def last_page(self):
+        """Returns the last scraped page recorded with `record_changes`, as a canonical frame."""
+        conn = self._connect()
+        try:
+            records = conn.execute(
+                'SELECT date, feeder, status, reason, area FROM current_page ORDER BY position'
+            ).fetchall()
+        finally:
+            conn.close()
+        if not records:
+            return empty_frame()
+        return canonicalize(pd.DataFrame(records, columns=COLUMNS))
+
+    def record_changes(self, version, changes, page=None):
+        """Records the page changes published with a snapshot version.
+
+        Every published version must be recorded, with an empty list if nothing on the
+        page changed, so that `changes_since` can tell a quiet period from a gap.
+
+        Args:
+            version (int): The snapshot version the changes were published with.
+            changes (list): Change dicts from page_diff.diff_pages.
+            page (pandas.DataFrame): The scraped page the changes lead to, which the next
+                                     scrape is diffed against. None keeps the stored page.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO change_versions (version, created_at, changes) '
+                             'VALUES (?, ?, ?)', (version, time.time(), len(changes)))
+                conn.execute('DELETE FROM page_changes WHERE version = ?', (version,))
+                conn.executemany(
+                    'INSERT INTO page_changes (version, change, date, feeder, status, reason, area, previous) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(version, change['change'], change['Date'], change['Feeder'], change['Status'],
+                      change['Reason'], change['Area'],
+                      json.dumps(change['previous']) if 'previous' in change else None)
+                     for change in changes]
+                )
+                if page is not None:
+                    conn.execute('DELETE FROM current_page')
+                    conn.executemany(
+                        'INSERT INTO current_page (position, date, feeder, status, reason, area) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        [(position, *values) for position, values in enumerate(zip(
+                            date_strings(page['Date']), page['Feeder'], page['Status'],
+                            page['Reason'], page['Area']))]
+                    )
+                oldest = version - CHANGE_RING_VERSIONS
+                conn.execute('DELETE FROM change_versions WHERE version <= ?', (oldest,))
+                conn.execute('DELETE FROM page_changes WHERE version <= ?', (oldest,))
+        finally:
+            conn.close()
+
+    def changes_since(self, since):
+        """Returns the page changes of every version after `since`, if the ring still has them.
+
+        Args:
+            since (int): The last version the caller has applied.
+
+        Returns:
+            tuple: (latest recorded version, changes, resync). `resync` is True when the
+                   versions after `since` are no longer (or were never) all in the ring,
+                   in which case the caller must reload the full data; `changes` is
+                   then empty. Each change dict carries the version it belongs to.
+        """
+        conn = self._connect()
+        try:
+            # One read transaction, so the versions and their changes are consistent.
+            conn.execute('BEGIN')
+            latest, recorded = conn.execute(
+                'SELECT COALESCE(MAX(version), 0), COUNT(*) FROM change_versions WHERE version > ?',
+                (since,)
+            ).fetchone()
+            if not recorded:
+                latest = conn.execute('SELECT COALESCE(MAX(version), 0) FROM change_versions').fetchone()[0]
+            # Versions are consecutive, so any missing one means part of the delta is gone.
+            if since > latest or recorded != latest - since:
+                return latest, [], True
+            records = conn.execute(
+                'SELECT version, change, date, feeder, status, reason, area, previous '
+                'FROM page_changes WHERE version > ? ORDER BY id', (since,)
+            ).fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+        changes = []
+        for version, change, date, feeder, status, reason, area, previous in records:
+            entry = {"version": version, "change": change, "Date": date, "Feeder": feeder,
+                     "Status": status, "Reason": reason, "Area": area}
+            if previous is not None:
+                entry["previous"] = json.loads(previous)
+            changes.append(entry)
+        return latest, changes, False
@@ -0,0 +1,380 @@
+"""End-to-end load test: a stub CNN origin, the app under gunicorn, and a ramp of dashboard traffic.
+
+The harness starts synthetic.make_server as the CNN origin (with configurable page
+size, latency and change rate), boots `gunicorn app:app` with CNN_URL pointing at it and
+a throwaway DATA_DIR, then drives a weighted mix of dashboard requests at each
+concurrency level in turn. Per level it reports throughput, error rate, p50/p95/p99
+latency (overall and per endpoint) and the RSS of every gunicorn worker, and writes the
+whole run as JSON so releases can be compared.
+
+Needs gunicorn, and gevent for the worker class gunicorn.conf.py selects (both in
+requirements.txt), unless --url is given.
+
+Usage:
+    python loadtest.py --levels 1,8,32,128 --duration 20 --output loadtest.json
+    python loadtest.py --url http://127.0.0.1:5001   # drive an app that is already running
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import numpy as np
+import requests
+
+from synthetic import AREAS, make_server
+
+DEFAULT_LEVELS = (1, 4, 16, 64)
+DEFAULT_DURATION_SECONDS = 15
+# What the dashboard does: mostly the summary and location lookups, some raw data pulls,
+# page loads and manual refreshes. Weights are relative.
+DEFAULT_MIX = {
+    'page': 5,
+    'outage-summary': 40,
+    'location-data': 25,
+    'data': 25,
+    'refresh-data': 5,
+}
+# A level "passes" when its error rate and p99 stay within these limits.
+DEFAULT_MAX_ERROR_RATE = 0.01
+DEFAULT_MAX_P99_SECONDS = 1.0
+READY_TIMEOUT_SECONDS = 120
+REQUEST_TIMEOUT_SECONDS = 30
+PERCENTILES = (50, 95, 99)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def request_path(kind, rng):
+    """Returns a request path for one kind of dashboard request."""
+    if kind == 'page':
+        return '/'
+    if kind == 'outage-summary':
+        return '/api/outage-summary'
+    if kind == 'location-data':
+        return f'/api/location-data?location={quote(rng.choice(AREAS))}'
+    if kind == 'data':
+        return '/api/data'
+    if kind == 'refresh-data':
+        return '/refresh-data'
+    raise ValueError(f"Unknown request kind: {kind}")
+
+
+def parse_mix(text):
+    """Parses 'kind:weight,...' into a mix dict."""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition(':')
+        kind = kind.strip()
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown request kind: {kind} (expected one of {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes(pid):
+    """Returns the resident set size of a process, or None if it cannot be read (non-Linux)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _children(pid):
+    """Returns the pids of the direct children of a process (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+class RssSampler:
+    """Samples the RSS of gunicorn's workers in the background, keeping the peak per worker."""
+
+    def __init__(self, master_pid, interval=0.5):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in _children(self.master_pid):
+                rss = _rss_bytes(pid)
+                if rss is not None:
+                    self.peaks[pid] = max(rss, self.peaks.get(pid, 0))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self):
+        peaks = sorted(self.peaks.values())
+        return {
+            "workers": len(peaks),
+            "peak_rss_bytes_per_worker": peaks,
+            "peak_rss_bytes_total": sum(peaks),
+            "master_rss_bytes": _rss_bytes(self.master_pid),
+        }
+
+
+def _latency_summary(latencies):
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies)
+    summary = {"count": len(values), "mean": float(values.mean()), "max": float(values.max())}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{percentile}'] = float(value)
+    return summary
+
+
+def drive(base_url, concurrency, duration, mix, seed=0):
+    """Sends the request mix from `concurrency` clients for `duration` seconds.
+
+    Each client is a thread with its own keep-alive session that sends its next request
+    as soon as the previous one completes (a closed loop, like a browser tab).
+
+    Returns:
+        dict: Requests, errors, throughput and latency percentiles, overall and per kind.
+    """
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    samples = []  # (kind, seconds, ok), appended from every client
+    errors = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(number):
+        rng = random.Random(seed * 100003 + number)
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + request_path(kind, rng), timeout=REQUEST_TIMEOUT_SECONDS)
+                response.content  # Read the whole body, as a browser would
+                ok = response.status_code < 400
+                error = None if ok else f'HTTP {response.status_code}'
+            except requests.exceptions.RequestException as e:
+                ok, error = False, type(e).__name__
+            local.append((kind, time.perf_counter() - start, ok))
+            if error:
+                with lock:
+                    errors[error] = errors.get(error, 0) + 1
+        session.close()
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    failed = sum(1 for _, _, ok in samples if not ok)
+    result = {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "requests": len(samples),
+        "errors": failed,
+        "error_rate": failed / len(samples) if samples else 0.0,
+        "error_kinds": errors,
+        "requests_per_second": len(samples) / elapsed if elapsed else 0.0,
+        "latency": _latency_summary([seconds for _, seconds, ok in samples if ok]),
+        "by_kind": {},
+    }
+    for kind in kinds:
+        kind_samples = [(seconds, ok) for sample_kind, seconds, ok in samples if sample_kind == kind]
+        result["by_kind"][kind] = {
+            "requests": len(kind_samples),
+            "errors": sum(1 for _, ok in kind_samples if not ok),
+            "latency": _latency_summary([seconds for seconds, ok in kind_samples if ok]),
+        }
+    return result
+
+
+def start_gunicorn(port, data_dir, origin_url, workers, worker_class, log_path):
+    """Boots `gunicorn app:app` (with gunicorn.conf.py) against the stub origin."""
+    env = dict(os.environ, DATA_DIR=data_dir, CNN_URL=origin_url, WEB_CONCURRENCY=str(workers))
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)]
+    if worker_class:
+        command += ['--worker-class', worker_class]
+    command.append('app:app')
+    log = open(log_path, 'w')
+    return subprocess.Popen(command, cwd=_PACKAGE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_ready(base_url, process=None, timeout=READY_TIMEOUT_SECONDS):
+    """Waits for the app to serve a summary with data (i.e. the first scrape finished)."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if requests.get(base_url + '/api/outage-summary', timeout=REQUEST_TIMEOUT_SECONDS).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{base_url} was not ready after {timeout}s")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=_PACKAGE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(levels=DEFAULT_LEVELS, duration=DEFAULT_DURATION_SECONDS, mix=None, entries=2000, origin_latency=0.0,
+        change_seconds=60.0, workers=2, worker_class=None, url=None, max_error_rate=DEFAULT_MAX_ERROR_RATE,
+        max_p99=DEFAULT_MAX_P99_SECONDS, seed=0):
+    """Runs the whole load test and returns its report.
+
+    Args:
+        levels (iterable): Concurrency levels, run in order.
+        duration (float): Seconds per level.
+        mix (dict): Request kind -> weight (see DEFAULT_MIX).
+        entries (int): Notices on the stub CNN page.
+        origin_latency (float): Seconds the stub origin delays every response.
+        change_seconds (float): How often the stub page gains new notices (0: never).
+        workers (int): Gunicorn workers.
+        worker_class (str): Gunicorn worker class (default: gunicorn.conf.py's).
+        url (str): Drive this already-running app instead of starting origin and gunicorn.
+        max_error_rate (float), max_p99 (float): Limits a level must stay within to pass.
+        seed (int): Seed for the request mix.
+
+    Returns:
+        dict: The run's parameters, one result per level, and the highest passing level.
+    """
+    mix = mix or dict(DEFAULT_MIX)
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "parameters": {
+            "levels": list(levels), "duration_seconds": duration, "mix": mix, "entries": entries,
+            "origin_latency_seconds": origin_latency, "change_seconds": change_seconds, "workers": workers,
+            "worker_class": worker_class, "url": url, "max_error_rate": max_error_rate,
+            "max_p99_seconds": max_p99,
+        },
+        "levels": [],
+    }
+    origin = gunicorn = None
+    data_dir = None
+    try:
+        if url is None:
+            origin = make_server(0, entries, latency=origin_latency, change_seconds=change_seconds)
+            threading.Thread(target=origin.serve_forever, daemon=True).start()
+            origin_url = f'http://127.0.0.1:{origin.server_address[1]}/cnn/'
+            data_dir = tempfile.mkdtemp(prefix='loadtest-')
+            port = _free_port()
+            url = f'http://127.0.0.1:{port}'
+            log_path = os.path.join(data_dir, 'gunicorn.log')
+            gunicorn = start_gunicorn(port, data_dir, origin_url, workers, worker_class, log_path)
+            print(f"Started gunicorn (pid {gunicorn.pid}, {workers} workers) against {origin_url}; log: {log_path}")
+        started = time.perf_counter()
+        wait_until_ready(url, gunicorn)
+        report["seconds_to_ready"] = time.perf_counter() - started
+
+        for concurrency in levels:
+            if gunicorn is not None:
+                with RssSampler(gunicorn.pid) as sampler:
+                    result = drive(url, concurrency, duration, mix, seed)
+                result["memory"] = sampler.report()
+            else:
+                result = drive(url, concurrency, duration, mix, seed)
+            latency = result["latency"]
+            result["passed"] = result["error_rate"] <= max_error_rate and latency.get("p99", 0.0) <= max_p99
+            report["levels"].append(result)
+            memory = result.get("memory")
+            rss = f"RSS {memory['peak_rss_bytes_total'] / 2**20:7.1f} MiB  " if memory else ''
+            print(f"c={concurrency:<4d} {result['requests_per_second']:8.1f} req/s  "
+                  f"p50 {latency.get('p50', 0) * 1000:7.1f} ms  p95 {latency.get('p95', 0) * 1000:7.1f} ms  "
+                  f"p99 {latency.get('p99', 0) * 1000:7.1f} ms  errors {result['error_rate']:.2%}  "
+                  f"{rss}{'ok' if result['passed'] else 'FAIL'}")
+    finally:
+        if gunicorn is not None:
+            gunicorn.terminate()
+            try:
+                gunicorn.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                gunicorn.kill()
+        if origin is not None:
+            origin.shutdown()
+        if data_dir is not None and report["levels"]:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    passing = [level["concurrency"] for level in report["levels"] if level["passed"]]
+    report["max_passing_concurrency"] = max(passing) if passing else None
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-tests the dashboard under gunicorn against a stub CNN origin.")
+    parser.add_argument('--levels', default=','.join(str(level) for level in DEFAULT_LEVELS),
+                        help="comma-separated concurrency levels, run in order")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION_SECONDS, help="seconds per level")
+    parser.add_argument('--mix', help="request weights, e.g. 'outage-summary:40,location-data:25,data:25,"
+                                      "page:5,refresh-data:5'")
+    parser.add_argument('--entries', type=int, default=2000, help="notices on the stub CNN page")
+    parser.add_argument('--origin-latency', type=float, default=0.0, help="seconds the origin delays responses")
+    parser.add_argument('--change-seconds', type=float, default=60.0,
+                        help="how often the stub page gains new notices (0: never)")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers")
+    parser.add_argument('--worker-class', help="gunicorn worker class (default: gunicorn.conf.py's)")
+    parser.add_argument('--url', help="drive an already-running app instead of starting one")
+    parser.add_argument('--max-error-rate', type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument('--max-p99', type=float, default=DEFAULT_MAX_P99_SECONDS, help="seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix) if args.mix else None
+    except ValueError as e:
+        parser.error(str(e))
+    levels = [int(level) for level in args.levels.split(',') if level.strip()]
+    report = run(levels, args.duration, mix, args.entries, args.origin_latency, args.change_seconds, args.workers,
+                 args.worker_class, args.url, args.max_error_rate, args.max_p99, args.seed)
+    print(f"Highest concurrency within limits: {report['max_passing_concurrency']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0 if report['max_passing_concurrency'] is not None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
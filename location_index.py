@@ -0,0 +1,166 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Area is a free-text list such as "Ogba, Ikeja GRA; Opebi & Allen Avenue"
+_SEPARATOR_PATTERN = re.compile(r"\s*(?:,|;|&|\n)\s*")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_EDGE_PUNCTUATION = ' .:-()'
+_NOT_SPECIFIED = 'not specified'
+
+
+def normalize_location(text):
+    """Normalizes a location name or query for matching: lowercase, single spaces."""
+    return _WHITESPACE_PATTERN.sub(' ', str(text)).strip(_EDGE_PUNCTUATION).lower()
+
+
+def split_locations(area):
+    """Splits an Area string into its individual locations, in their original spelling."""
+    if not isinstance(area, str) or area.strip().lower() == _NOT_SPECIFIED:
+        return []
+    locations = []
+    for part in _SEPARATOR_PATTERN.split(area):
+        part = _WHITESPACE_PATTERN.sub(' ', part).strip(_EDGE_PUNCTUATION)
+        if part:
+            locations.append(part)
+    return locations
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class LocationIndex:
+    """Inverted index from individual locations to the snapshot rows that mention them.
+
+    Built once per snapshot. Each distinct Area string is tokenized only once, and each
+    normalized location keeps a sorted posting list of row positions. A trigram index
+    over the (few thousand) distinct locations answers substring lookups and
+    suggestions, so neither scans the rows.
+    """
+
+    def __init__(self, frame):
+        self.names = []          # location id -> display name (first spelling seen)
+        self.keys = []           # location id -> normalized name
+        self.postings = []       # location id -> sorted int array of row positions
+        self._ids = {}           # normalized name -> location id
+        self._trigram_index = {}
+        self._areas = []         # area code -> upper-cased Area string, for lookup()
+        self._area_codes = []    # location id -> codes of the Area strings that list it
+        self._unlisted = []      # codes of the Area strings without locations ("Not specified")
+        if frame.empty or 'Area' not in frame.columns:
+            self._sorted_keys = []
+            return
+
+        area_codes, distinct_areas = pd.factorize(frame['Area'])
+        self._row_areas = area_codes
+        # Row positions grouped by distinct Area value
+        self._order = np.argsort(area_codes, kind='stable')
+        self._bounds = np.searchsorted(area_codes[self._order], np.arange(len(distinct_areas) + 1))
+
+        rows_per_location = {}
+        for area_code, area in enumerate(distinct_areas):
+            self._areas.append(str(area).upper())
+            rows = self._area_rows(area_code)
+            locations = split_locations(area)
+            if not locations:
+                self._unlisted.append(area_code)
+            for location in locations:
+                key = normalize_location(location)
+                location_id = self._ids.get(key)
+                if location_id is None:
+                    location_id = self._ids[key] = len(self.keys)
+                    self.keys.append(key)
+                    self.names.append(location)
+                    self._area_codes.append([])
+                    rows_per_location[location_id] = []
+                if self._area_codes[location_id][-1:] != [area_code]:
+                    self._area_codes[location_id].append(area_code)
+                    rows_per_location[location_id].append(rows)
+
+        for location_id, key in enumerate(self.keys):
+            parts = rows_per_location[location_id]
+            self.postings.append(np.unique(np.concatenate(parts)) if len(parts) > 1 else parts[0])
+            for trigram in _trigrams(key):
+                self._trigram_index.setdefault(trigram, set()).add(location_id)
+        self._sorted_keys = sorted((key, location_id) for location_id, key in enumerate(self.keys))
+
+    def _area_rows(self, area_code):
+        return self._order[self._bounds[area_code]:self._bounds[area_code + 1]]
+
+    @classmethod
+    def for_snapshot(cls, snapshot):
+        """Returns the index of a snapshot, building it on first use."""
+        return snapshot.memo('location_index', lambda snap: cls(snap.frame))
+
+    def count(self, location_id):
+        return len(self.postings[location_id])
+
+    def matching_ids(self, query):
+        """Returns the ids of every location whose name contains `query`."""
+        key = normalize_location(query)
+        if not key:
+            return []
+        if len(key) < 3:
+            # Too short for trigrams; the distinct locations are few enough to scan.
+            return [location_id for location_id, candidate in enumerate(self.keys) if key in candidate]
+        candidates = None
+        for trigram in _trigrams(key):
+            ids = self._trigram_index.get(trigram)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+        return sorted(location_id for location_id in candidates if key in self.keys[location_id])
+
+    def lookup(self, query):
+        """Returns the sorted row positions of every row whose Area contains `query`.
+
+        Matches exactly what analysis.get_location_data finds by scanning, so a query may
+        span several locations ("Ikeja, Mag"). Each part of the query narrows down the
+        distinct Area strings through the locations; only those are checked for the
+        whole query.
+        """
+        candidates = None
+        for part in _SEPARATOR_PATTERN.split(str(query)):
+            if not normalize_location(part):
+                continue
+            area_codes = set(self._unlisted)
+            for location_id in self.matching_ids(part):
+                area_codes.update(self._area_codes[location_id])
+            candidates = area_codes if candidates is None else candidates & area_codes
+        if candidates is None:
+            candidates = range(len(self._areas))
+
+        needle = str(query).upper()
+        matched = [area_code for area_code in candidates if needle in self._areas[area_code]]
+        if not matched:
+            return np.array([], dtype=np.intp)
+        if len(matched) * 8 > len(self._areas):
+            # A broad query: one pass over the rows is cheaper than sorting their positions.
+            # The extra last slot is for the rows without an Area (code -1).
+            wanted = np.zeros(len(self._areas) + 1, dtype=bool)
+            wanted[matched] = True
+            return np.flatnonzero(wanted[self._row_areas])
+        return np.sort(np.concatenate([self._area_rows(area_code) for area_code in matched]))
+
+    def suggest(self, query, limit=10):
+        """Suggests locations for a partial query: prefix matches first, then by outage count.
+
+        Returns:
+            list: Up to `limit` dicts with the location name and its outage count.
+        """
+        key = normalize_location(query)
+        if not key:
+            ids = range(len(self.keys))
+        else:
+            ids = self.matching_ids(key)
+        ranked = sorted(ids, key=lambda location_id: (not self.keys[location_id].startswith(key),
+                                                      -self.count(location_id),
+                                                      self.keys[location_id]))
+        return [{"location": self.names[location_id], "count": self.count(location_id)}
+                for location_id in ranked[:limit]]
+
+    def all_locations(self):
+        """Returns every distinct location name, sorted alphabetically."""
+        return [self.names[location_id] for _, location_id in self._sorted_keys]
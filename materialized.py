@@ -0,0 +1,63 @@
+import hashlib
+
+from flask import Response, request
+
+import serialization
+
+# Materialized bodies are compressed once per snapshot, so spend more effort on size.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+
+
+class MaterializedResponse:
+    """A JSON response serialized and compressed once, then served many times.
+
+    The ETag is a hash of the body, so it is strong, identical across workers serving
+    the same snapshot, and only changes when the data behind the response does.
+    """
+
+    def __init__(self, payload, status=200):
+        self.status = status
+        self.body = serialization.dumps(payload) + b'\n'
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        # Each content coding is compressed on first use, as clients ask for it.
+        self.encoded = {}
+
+    def _encoded_body(self, encoding):
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = self.encoded[encoding] = serialization.compress(self.body, encoding, GZIP_LEVEL, BROTLI_QUALITY)
+        return body
+
+    def to_response(self):
+        """Builds the response for the current request, answering revalidations with a 304."""
+        encoding = serialization.negotiate_encoding(len(self.body))
+        # Each encoding is a distinct representation, so it needs its own strong ETag.
+        etags = {None: self.etag, 'gzip': self.etag + '-gz', 'br': self.etag + '-br'}
+
+        if any(request.if_none_match.contains(etag) for etag in etags.values()):
+            response = Response(status=304)
+        else:
+            response = Response(self._encoded_body(encoding) if encoding else self.body, status=self.status,
+                                mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etags[encoding])
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+def serve(snapshot, key, build):
+    """Serves the response `build(snapshot)` for a snapshot, building it once per version.
+
+    Args:
+        snapshot (Snapshot): The snapshot the response is derived from.
+        key (str): Identifies the response among others cached on the same snapshot.
+        build (callable): Returns `(payload, status)` for the snapshot.
+
+    Returns:
+        flask.Response: The (possibly 304) response.
+    """
+    materialized = snapshot.memo(('response', key), lambda snap: MaterializedResponse(*build(snap)))
+    return materialized.to_response()
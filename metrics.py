@@ -0,0 +1,256 @@
+import bisect
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import DATA_DIR
+
+# Each worker periodically writes its own metrics here; /metrics merges every file
+# written by workers of the same gunicorn master, so totals cover all workers.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(DATA_DIR, 'metrics'))
+FLUSH_INTERVAL_SECONDS = 1.0
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+ROWS_BUCKETS = (0, 10, 100, 1e3, 1e4, 1e5, 1e6)
+
+# name -> (type, help, buckets)
+_definitions = {}
+# (name, labels) -> value for counters/gauges, or [bucket counts..., sum, count] for histograms
+_values = {}
+_lock = threading.Lock()
+_dirty = False
+_flusher_pid = None
+_local = threading.local()
+
+
+def counter(name, help_text):
+    _definitions[name] = ('counter', help_text, None)
+
+
+def gauge(name, help_text):
+    _definitions[name] = ('gauge', help_text, None)
+
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    _definitions[name] = ('histogram', help_text, tuple(buckets))
+
+
+counter('snapshot_requests_total', 'Snapshot lookups by get_data(), by result (hit, stale, miss).')
+gauge('snapshot_age_seconds', 'Seconds since the current snapshot was published.')
+gauge('snapshot_version', 'Version of the current published snapshot.')
+histogram('cnn_fetch_seconds', 'Latency of fetching the CNN page, including retries.')
+histogram('cnn_fetch_bytes', 'Size of fetched CNN page bodies.', BYTES_BUCKETS)
+histogram('cnn_parse_seconds', 'Time spent turning page HTML into outage records.')
+histogram('cnn_parse_rows', 'Outage rows parsed per page.', ROWS_BUCKETS)
+histogram('cnn_dataframe_build_seconds', 'Time spent building and cleaning the parsed DataFrame.')
+histogram('analysis_seconds', 'Time spent in each analysis function.')
+histogram('http_request_seconds', 'Flask request latency by route, method and status.')
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _ensure_flusher():
+    global _flusher_pid
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    _flusher_pid = pid
+    # Values inherited from a parent process (e.g. gunicorn --preload) belong to the parent.
+    _values.clear()
+    threading.Thread(target=_flush_loop, name='metrics-flusher', daemon=True).start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL_SECONDS)
+        if _dirty:
+            flush()
+
+
+def observe(name, value, **labels):
+    """Records one observation in a histogram."""
+    global _dirty
+    _ensure_flusher()
+    buckets = _definitions[name][2]
+    key = _key(name, labels)
+    with _lock:
+        series = _values.get(key)
+        if series is None:
+            series = _values[key] = [0] * (len(buckets) + 2)
+        index = bisect.bisect_left(buckets, value)
+        if index < len(buckets): # Larger values only show up in the +Inf bucket
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+        _dirty = True
+
+
+def inc(name, amount=1, **labels):
+    """Increments a counter."""
+    global _dirty
+    _ensure_flusher()
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+        _dirty = True
+
+
+def set_gauge(name, value, **labels):
+    """Sets a gauge for this process."""
+    global _dirty
+    _ensure_flusher()
+    with _lock:
+        _values[_key(name, labels)] = value
+        _dirty = True
+
+
+@contextmanager
+def timer(name, **labels):
+    """Times the enclosed block into a latency histogram (and the request's Server-Timing)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(name, elapsed, **labels)
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings.append((labels.get('function', name), elapsed))
+
+
+def timed(name, **labels):
+    """Decorator form of `timer`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_timings():
+    """Starts collecting stage timings for the current request's Server-Timing header."""
+    _local.timings = []
+
+
+def pop_request_timings():
+    """Returns and stops collecting the stage timings recorded for the current request."""
+    timings = getattr(_local, 'timings', None) or []
+    _local.timings = None
+    return timings
+
+
+def _file_path():
+    return os.path.join(METRICS_DIR, f'metrics-{os.getppid()}-{os.getpid()}.json')
+
+
+def flush():
+    """Writes this process's metrics to its file in METRICS_DIR."""
+    global _dirty
+    with _lock:
+        payload = [[name, list(labels), value] for (name, labels), value in _values.items()]
+        _dirty = False
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _file_path()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove_stale_files():
+    """Deletes files left behind by earlier runs (a different, no longer running parent)."""
+    prefix = f'metrics-{os.getppid()}-'
+    for path in glob.glob(os.path.join(METRICS_DIR, 'metrics-*.json')):
+        name = os.path.basename(path)
+        if name.startswith(prefix):
+            continue
+        try:
+            if not _pid_alive(int(name.split('-')[1])):
+                os.remove(path)
+        except (ValueError, OSError):
+            continue
+
+
+def _collect():
+    """Merges the metrics files of every worker that shares this process's parent."""
+    flush()
+    _remove_stale_files()
+    merged = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, f'metrics-{os.getppid()}-*.json')):
+        pid = int(path.rsplit('-', 1)[1].split('.')[0])
+        alive = _pid_alive(pid)
+        try:
+            with open(path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in payload:
+            kind = _definitions.get(name, ('gauge',))[0]
+            key = (name, tuple(tuple(label) for label in labels))
+            if kind == 'gauge':
+                # Gauges of exited workers are stale; live ones report the largest value.
+                if alive:
+                    merged[key] = max(merged.get(key, value), value)
+            elif kind == 'histogram':
+                series = merged.setdefault(key, [0] * len(value))
+                for i, v in enumerate(value):
+                    series[i] += v
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """Returns all metrics, aggregated across workers, in the Prometheus text format."""
+    merged = _collect()
+    by_name = {}
+    for (name, labels), value in merged.items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text, buckets = _definitions.get(name, ('untyped', '', None))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", repr(float(bound)))])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {value[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {value[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from classifier import classify_reasons
+
+# Columns scraped from the page and stored in the history
+COLUMNS = ['Date', 'Feeder', 'Status', 'Reason', 'Area']
+# Columns of canonical frames: the scraped ones plus 'Cause', derived from 'Reason' on ingestion
+FRAME_COLUMNS = COLUMNS + ['Cause']
+# Low-cardinality text columns, dictionary-encoded so each distinct value is stored once
+CATEGORICAL_COLUMNS = ['Feeder', 'Status', 'Reason', 'Area', 'Cause']
+DATE_FORMAT = '%Y-%m-%d'
+# Rows compacted by retention.py stand for this many outages; rows without it count once.
+COUNT_COLUMN = 'Count'
+# True for compacted rows that count a whole month (dated on its first day)
+MONTHLY_COLUMN = 'Monthly'
+
+
+def empty_frame():
+    """Returns an empty outage DataFrame with the standard columns."""
+    return pd.DataFrame(columns=FRAME_COLUMNS)
+
+
+def canonicalize(df):
+    """Converts an outage DataFrame to the canonical typed form used by snapshots.
+
+    'Date' becomes datetime64 (day precision) and the text columns become categoricals,
+    so analysis functions can work on integer codes instead of re-normalizing strings.
+    The 'Cause' column is added from 'Reason' if missing. Already-canonical columns
+    are left as they are.
+
+    Args:
+        df (pandas.DataFrame): Outage data with the standard columns.
+
+    Returns:
+        pandas.DataFrame: A new DataFrame in canonical form.
+    """
+    if df.empty:
+        return df
+    columns = {}
+    date = df['Date']
+    if not pd.api.types.is_datetime64_dtype(date):
+        date = pd.to_datetime(date, errors='coerce').dt.normalize()
+    columns['Date'] = date
+    for column in COLUMNS[1:]:
+        values = df[column]
+        columns[column] = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+    columns['Cause'] = df['Cause'] if 'Cause' in df.columns else classify_reasons(columns['Reason'])
+    return pd.DataFrame(columns, index=df.index)[FRAME_COLUMNS]
+
+
+def concat(frames):
+    """Concatenates canonical frames, merging the categories of each text column."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return empty_frame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    frames = [canonicalize(frame) for frame in frames]
+    columns = {'Date': pd.concat([frame['Date'] for frame in frames], ignore_index=True)}
+    for column in CATEGORICAL_COLUMNS:
+        parts = [frame[column] for frame in frames]
+        # A column without any values (Reason in compacted rows) has untyped categories; type them
+        # like the other frames' so they can be merged.
+        typed = next((part.cat.categories.dtype for part in parts if len(part.cat.categories)), None)
+        if typed is not None:
+            parts = [part if len(part.cat.categories) else part.cat.set_categories(pd.Index([], dtype=typed))
+                     for part in parts]
+        columns[column] = pd.Series(union_categoricals(parts, ignore_order=True))
+    return pd.DataFrame(columns)[FRAME_COLUMNS]
+
+
+def date_strings(dates):
+    """Formats a Date column as 'YYYY-MM-DD' strings, whatever its dtype."""
+    if pd.api.types.is_datetime64_dtype(dates):
+        return dates.dt.strftime(DATE_FORMAT)
+    return dates.astype(str)
+
+
+def for_output(df):
+    """Returns a copy of (a slice of) a canonical frame with JSON-friendly 'YYYY-MM-DD' dates."""
+    if 'Date' not in df.columns or not pd.api.types.is_datetime64_dtype(df['Date']):
+        return df
+    return df.assign(Date=date_strings(df['Date']))
+
+
+def category_mask(series, predicate):
+    """Evaluates `predicate` once per distinct value and maps the result onto every row.
+
+    Args:
+        series (pandas.Series): A categorical (or plain) column.
+        predicate (callable): Takes the Index of distinct values, returns a boolean array.
+
+    Returns:
+        numpy.ndarray: Row mask; missing values are always False.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    per_category = np.asarray(predicate(series.cat.categories), dtype=bool)
+    # Code -1 (missing) picks the trailing False
+    return np.append(per_category, False)[series.cat.codes.to_numpy()]
+
+
+def row_weights(df):
+    """Returns how many outages each row of `df` stands for, or None if every row is one."""
+    if COUNT_COLUMN not in df.columns:
+        return None
+    return df[COUNT_COLUMN].to_numpy()
+
+
+def category_counts(series, keep=None, weights=None):
+    """Counts rows per distinct value, sorted by count, computed on integer codes.
+
+    Args:
+        series (pandas.Series): A categorical (or plain) column.
+        keep (callable): Optional predicate over the Index of distinct values; values for
+                         which it is False are left out (e.g. 'Unknown').
+        weights (numpy.ndarray): Optional outages per row (see `row_weights`).
+
+    Returns:
+        pandas.Series: Counts indexed by value, descending, without zero counts.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    categories = series.cat.categories
+    codes = series.cat.codes.to_numpy()
+    present = codes >= 0
+    if weights is None:
+        counts = np.bincount(codes[present], minlength=len(categories))
+    else:
+        counts = np.bincount(codes[present], weights[present], minlength=len(categories)).astype('int64')
+    selected = counts > 0
+    if keep is not None:
+        selected &= np.asarray(keep(categories), dtype=bool)
+    result = pd.Series(counts[selected], index=categories[selected], dtype='int64')
+    return result.sort_values(ascending=False, kind='stable')
@@ -0,0 +1,78 @@
+from collections import Counter
+
+from outage_frame import date_strings
+
+NEW = 'new'
+RESTORED = 'restored'    # On the previous page, gone from the current one
+MODIFIED = 'modified'
+
+# Fields that may change while a notice keeps its identity
+_MUTABLE_FIELDS = ('Status', 'Reason', 'Area')
+
+
+def _records(df):
+    """Returns the rows of an outage frame as (Date, Feeder, Status, Reason, Area) string tuples."""
+    if df is None or df.empty:
+        return []
+    return list(zip(date_strings(df['Date']), df['Feeder'].astype(str), df['Status'].astype(str),
+                    df['Reason'].astype(str), df['Area'].astype(str)))
+
+
+def _as_dict(record):
+    return dict(zip(('Date', 'Feeder') + _MUTABLE_FIELDS, record))
+
+
+def diff_pages(previous, current):
+    """Classifies how the notices on the CNN page changed between two scrapes.
+
+    A notice's identity is its date and feeder plus its position among that day's
+    notices for the feeder. Rows identical on both pages are matched first; the rest of
+    each (date, feeder) group is paired in page order, and a pair whose status, reason
+    or area differs is a modification. Leftover rows are new (only on the current page)
+    or restored (only on the previous page, i.e. the outage notice was taken down).
+
+    Args:
+        previous (pandas.DataFrame): The previously scraped page (may be None or empty).
+        current (pandas.DataFrame): The newly scraped page.
+
+    Returns:
+        list: Change dicts with a 'change' kind (NEW, RESTORED or MODIFIED), the
+              notice's Date, Feeder, Status, Reason and Area as of the current page
+              (the previous page for RESTORED), and 'previous' values for MODIFIED.
+    """
+    previous_records = _records(previous)
+    current_records = _records(current)
+
+    # Identical rows on both pages are unchanged (counting duplicates); the rest are
+    # grouped by (Date, Feeder), in page order.
+    unmatched = Counter(previous_records)
+    leftover_current = {}
+    for record in current_records:
+        if unmatched[record] > 0:
+            unmatched[record] -= 1
+        else:
+            leftover_current.setdefault(record[:2], []).append(record)
+    leftover_previous = {}
+    for record in previous_records:
+        if unmatched[record] > 0:
+            unmatched[record] -= 1
+            leftover_previous.setdefault(record[:2], []).append(record)
+
+    changes = []
+    for identity, records in leftover_current.items():
+        old_records = leftover_previous.pop(identity, [])
+        for position, record in enumerate(records):
+            if position >= len(old_records):
+                changes.append({'change': NEW, **_as_dict(record)})
+                continue
+            change = {'change': MODIFIED, **_as_dict(record)}
+            old = _as_dict(old_records[position])
+            change['previous'] = {field: old[field] for field in _MUTABLE_FIELDS
+                                  if old[field] != change[field]}
+            changes.append(change)
+        for record in old_records[len(records):]:
+            changes.append({'change': RESTORED, **_as_dict(record)})
+    for records in leftover_previous.values():
+        for record in records:
+            changes.append({'change': RESTORED, **_as_dict(record)})
+    return changes
@@ -0,0 +1,185 @@
+import os
+import time
+
+from outage_frame import concat, empty_frame
+from page_diff import diff_pages
+from refresher import REFRESH_INTERVAL_SECONDS, RETRY_INTERVAL_SECONDS, Snapshot
+
+# How long a worker without data waits for the writer's first publish before serving empty.
+COLD_START_WAIT_SECONDS = 35.0
+
+# When this process last attempted a scrape as the writer, and when one last succeeded.
+_last_scrape_attempt = 0.0
+_last_scrape_ok = 0.0
+
+
+def _scrape_due(store):
+    manifest = store.manifest()
+    now = time.time()
+    if store.refresh_requested_at() > _last_scrape_attempt:
+        return True
+    if now - _last_scrape_attempt < RETRY_INTERVAL_SECONDS:
+        return False
+    last_ok = max(_last_scrape_ok, manifest['created_at'] if manifest else 0.0)
+    return now - last_ok >= REFRESH_INTERVAL_SECONDS
+
+
+def _scrape_into_history(history):
+    """Scrapes the page and merges it into the history.
+
+    Returns:
+        pandas.DataFrame or None: The scraped page, or None if it is unchanged or failed.
+    """
+    global _last_scrape_attempt, _last_scrape_ok
+    # Only the writer scrapes, so the other workers never import requests and bs4.
+    from cnn_parser import scrape_if_changed
+
+    _last_scrape_attempt = time.time()
+    print(f"Process {os.getpid()} scraping new data...")
+    frame = scrape_if_changed()
+    if frame is None:
+        # 304 or identical body: nothing to parse or merge.
+        _last_scrape_ok = time.time()
+        return None
+    if frame.empty:
+        print("Scraping returned no data. Keeping the last published snapshot.")
+        return None
+    _last_scrape_ok = time.time()
+    inserted = history.merge(frame)
+    print(f"Data scraped successfully. {len(frame)} rows found, {inserted} new.")
+    return frame
+
+
+def _compact_history(history, retention, exports=None):
+    """Spends up to the policy's time budget moving old history rows into the compacted tiers.
+
+    With `exports`, only months whose partitions hold all of their raw rows are compacted.
+    """
+    try:
+        stats = retention.compact(history, exported=exports.month_rows() if exports is not None else None)
+    except Exception as e:
+        # Each batch is one transaction, so nothing is half-compacted; the next poll carries on.
+        print(f"Compacting the history failed: {e}")
+        return
+    if stats['rows'] or stats['daily_cells']:
+        print(f"Compacted {stats['rows']} raw rows and {stats['daily_cells']} daily counts"
+              f"{'' if stats['caught_up'] else ' (more to do)'}.")
+
+
+def _publish_history(store, history, current, page=None):
+    """Publishes a new snapshot if the history has rows the current one lacks, or the page changed.
+
+    The snapshot is the previous one plus the rows added since, so a publish costs
+    O(new rows) to read from SQLite rather than reloading the whole history. After a
+    compaction removed rows, the raw rows and the compacted tiers are reloaded instead
+    (both bounded by the retention policy). The changes between the last two scraped
+    pages are recorded under the new version.
+    """
+    changes = diff_pages(history.last_page(), page) if page is not None else []
+    manifest = store.manifest()
+    last_id = manifest.get('history_id', 0) if manifest else 0
+    epoch = history.retention_epoch()
+    compacted_since = manifest is not None and manifest.get('retention_epoch', 0) != epoch
+    if manifest is not None and history.max_id() <= last_id and not changes and not compacted_since:
+        return
+    base = store.load_latest(current) if manifest is not None else None
+    compacted = None
+    if base is None or compacted_since or base.frame.index.name != 'id':
+        # First publish, rows left the raw tier, or the snapshot predates row ids: reload.
+        base = None
+        last_id = 0
+        compacted = history.compacted_frame()
+    delta, new_id = history.rows_since(last_id)
+    if base is None:
+        frame = delta
+    elif delta.empty:
+        # Notices taken down from the page change the feed but not the history.
+        frame = base.frame
+    else:
+        frame = concat([base.frame, delta])
+        frame.index = base.frame.index.append(delta.index)
+    if frame.empty and not compacted_since and (compacted is None or compacted.empty):
+        return
+    manifest = store.publish(frame, compacted, history_id=new_id, retention_epoch=epoch)
+    history.record_changes(manifest['version'], changes, page)
+    print(f"Published snapshot v{manifest['version']}: {len(frame)} rows ({len(delta)} new, "
+          f"{len(changes)} page changes).")
+
+
+def _export_latest(store, exports, history, current):
+    """Brings the monthly export partitions up to the latest published version.
+
+    Months the retention policy compacted keep the partitions exported while their
+    rows were still raw.
+
+    Returns:
+        Snapshot: The latest snapshot, loaded for the export, to serve without mapping it again.
+    """
+    manifest = store.manifest()
+    if manifest is None or exports.version >= manifest['version']:
+        return current
+    snapshot = store.load_latest(current)
+    try:
+        compacted_before = history.compacted_before()
+        written = exports.update(snapshot.frame, snapshot.version, compacted_before and compacted_before[:7])
+        print(f"Exported snapshot v{snapshot.version}: {written} monthly partitions rewritten.")
+    except Exception as e:
+        # The snapshot is published regardless; the export catches up on the next poll.
+        print(f"Exporting snapshot v{snapshot.version} failed: {e}")
+    return snapshot
+
+
+def _process_alerts(history, alerts):
+    """Queues alerts for the history rows added since the last pass, and keeps delivering them."""
+    alerts.start_delivery()
+    try:
+        alerts.process(history)
+    except Exception as e:
+        # The rows stay unmatched (the cursor did not move), so the next poll retries them.
+        print(f"Matching alerts failed: {e}")
+
+
+def build_snapshot(store, history, current=None, exports=None, alerts=None, retention=None):
+    """Produces the snapshot this process should serve next.
+
+    Only the process holding the store's writer lock scrapes, and only when the data is
+    older than REFRESH_INTERVAL_SECONDS or a refresh was requested through
+    `store.request_refresh()`. Scrapes are merged into the outage history, and the
+    writer publishes the accumulated history whenever it gains rows, or a retention
+    policy compacted part of it. Compaction runs after the publish and export, so a
+    month's rows are exported before they leave the raw history; the compacted history
+    is published on the next poll. Every other worker just maps whatever version the
+    writer published last.
+
+    Args:
+        store (SnapshotStore): The shared snapshot store.
+        history (HistoryStore): The persistent outage history.
+        current (Snapshot): The snapshot this process is serving, if any.
+        exports (ExportStore): Monthly Parquet/Arrow partitions the writer keeps up to date.
+        alerts (AlertStore): Subscriptions the writer matches new history rows against.
+        retention (RetentionPolicy): How long raw rows are kept before the writer compacts them.
+
+    Returns:
+        Snapshot: The latest snapshot, or `current` if nothing newer exists.
+    """
+    if store.acquire_writer():
+        page = _scrape_into_history(history) if _scrape_due(store) else None
+        # Also picks up rows other processes (e.g. backfills) added to the history.
+        _publish_history(store, history, current, page)
+        if exports is not None:
+            current = _export_latest(store, exports, history, current)
+        if alerts is not None:
+            _process_alerts(history, alerts)
+        if retention is not None and retention.enabled:
+            _compact_history(history, retention, exports)
+    elif current is None:
+        # Another worker is scraping for the first time; wait for it rather than scraping too.
+        deadline = time.time() + COLD_START_WAIT_SECONDS
+        while store.manifest() is None and time.time() < deadline:
+            time.sleep(0.5)
+
+    snapshot = store.load_latest(current)
+    if snapshot is None:
+        # Nothing has been published yet; serve an empty snapshot until the writer succeeds.
+        snapshot = Snapshot(empty_frame(), 0)
+    return snapshot
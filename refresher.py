@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+
+import metrics
+
+# How often the published snapshot is rebuilt from a fresh scrape, in seconds.
+REFRESH_INTERVAL_SECONDS = float(os.environ.get('REFRESH_INTERVAL_SECONDS', 900))
+# How soon to retry when a scrape fails or returns nothing (e.g. the site was down at boot).
+RETRY_INTERVAL_SECONDS = float(os.environ.get('REFRESH_RETRY_SECONDS', 60))
+# How often each worker checks for a newer snapshot version. This only reads a small
+# manifest file, so it can be much shorter than the scrape interval.
+POLL_INTERVAL_SECONDS = float(os.environ.get('SNAPSHOT_POLL_SECONDS', 5))
+
+
+class Snapshot:
+    """An immutable, versioned view of the outage data served to requests.
+
+    `frame` holds the raw outage rows. With a retention policy, the older outages are
+    in `compacted` instead, as counts (see retention.analysis_frame).
+    """
+
+    def __init__(self, frame, version, created_at=None, compacted=None):
+        self.frame = frame
+        self.version = version
+        self.created_at = created_at if created_at is not None else time.time()
+        self.compacted = compacted
+        self._memo = {}
+        # Reentrant: builders may use other memoized values (e.g. retention.analysis_frame).
+        self._memo_lock = threading.RLock()
+
+    @property
+    def age_seconds(self):
+        return max(0.0, time.time() - self.created_at)
+
+    def memo(self, key, builder):
+        """Returns a value derived from this snapshot, building it at most once.
+
+        Anything cached here is dropped together with the snapshot when a newer
+        version replaces it, so callers never see results for stale data.
+        """
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        with self._memo_lock:
+            if key not in self._memo:
+                self._memo[key] = builder(self)
+            return self._memo[key]
+
+
+class SnapshotRefresher:
+    """Keeps the last good snapshot and rebuilds it off the request path.
+
+    Requests are always answered from the current snapshot (stale-while-revalidate).
+    Only a cold start waits, and concurrent misses share a single in-flight build.
+
+    `build(current)` returns the snapshot to serve next; returning `current`
+    (or None) keeps the one already being served. Listeners added with
+    `add_listener` are called as `listener(previous, snapshot)` after each swap.
+    """
+
+    def __init__(self, build, interval=POLL_INTERVAL_SECONDS):
+        self._build = build
+        self.interval = interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._thread = None
+        self._thread_pid = None
+        self._listeners = []
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def get(self):
+        """Returns the current snapshot, building the first one if necessary."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            metrics.inc('snapshot_requests_total', result='miss')
+            self.refresh()
+            snapshot = self._snapshot
+        elif time.time() - self._checked_at > 2 * self.interval:
+            # The background thread is not keeping up (or is not running); revalidate async.
+            metrics.inc('snapshot_requests_total', result='stale')
+            self.trigger()
+        else:
+            metrics.inc('snapshot_requests_total', result='hit')
+        return snapshot
+
+    def refresh(self):
+        """Rebuilds the snapshot, or waits for the build already in flight."""
+        with self._lock:
+            done = self._inflight
+            leader = done is None
+            if leader:
+                done = self._inflight = threading.Event()
+        if not leader:
+            done.wait()
+            return self._snapshot
+
+        try:
+            self._publish(self._build(self._snapshot))
+        except Exception as e:
+            print(f"Snapshot refresh failed: {e}")
+        finally:
+            self._checked_at = time.time()
+            with self._lock:
+                self._inflight = None
+            done.set()
+        return self._snapshot
+
+    def trigger(self):
+        """Starts an asynchronous rebuild. Returns False if one is already running."""
+        with self._lock:
+            if self._inflight is not None:
+                return False
+        threading.Thread(target=self.refresh, name='snapshot-refresh', daemon=True).start()
+        return True
+
+    def add_listener(self, listener):
+        """Registers `listener(previous, snapshot)`, called whenever a new snapshot is served."""
+        self._listeners.append(listener)
+
+    def preload(self, snapshot):
+        """Serves `snapshot` (e.g. the last one persisted) until the first build replaces it.
+
+        Listeners run as for any new snapshot, so caches derived from it are warm too.
+        Nothing is scraped, and no thread is started, so this is safe to call in a
+        process that forks workers afterwards (gunicorn --preload).
+        """
+        if snapshot is not None:
+            self._publish(snapshot)
+            self._checked_at = time.time()
+
+    def start(self):
+        """Starts the background thread that revalidates the snapshot on an interval.
+
+        Cheap to call on every request: threads do not survive fork, so a process
+        forked from the one that called `start` (or `preload`) starts its own thread.
+        """
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+        with self._lock:
+            if self._thread_pid == pid:
+                return
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+            self._thread_pid = pid
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
+
+    def _publish(self, snapshot):
+        current = self._snapshot
+        if snapshot is None or snapshot is current:
+            return
+        if (snapshot.frame.empty and snapshot.compacted is None
+                and current is not None and not current.frame.empty):
+            # Keep serving the last good snapshot rather than replacing it with nothing.
+            print("Refresh produced no data. Keeping the last good snapshot.")
+            return
+        self._snapshot = snapshot
+        print(f"Process {os.getpid()} now serving snapshot v{snapshot.version} ({len(snapshot.frame)} rows).")
+        for listener in self._listeners:
+            try:
+                listener(current, snapshot)
+            except Exception as e:
+                print(f"Snapshot listener failed: {e}")
@@ -0,0 +1,248 @@
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+from outage_frame import MONTHLY_COLUMN, row_weights
+from retention import analysis_frame
+
+# Rolling windows, in days, ending on the snapshot's day (or the latest outage, if later)
+WINDOWS = (7, 30, 90)
+# The trend is the slope of weekly outage counts over this many recent weeks.
+TREND_WEEKS = 13
+# Feeder names that do not identify a feeder; they are left out of the ranking.
+_UNKNOWN_FEEDERS = {'UNKNOWN', ''}
+# Sort keys accepted by `ranked`, all "worst first"
+SORT_KEYS = ('outages_30d', 'outages_7d', 'outages_90d', 'total_outages', 'trend_per_week',
+             'mean_days_between_outages')
+
+
+def _capacity(size):
+    """A buffer dimension for `size` rows or days, with room to grow."""
+    return size + max(size // 2, 16)
+
+
+class _Buffer:
+    """The storage behind the count matrices of successive tables.
+
+    Each matrix is the top-left corner of `array`. Only `owner`, the newest table,
+    may grow into the spare rows and columns.
+    """
+
+    def __init__(self, array):
+        self.array = array
+        self.owner = None
+
+
+class ReliabilityTable:
+    """Daily outage counts per feeder (a feeders x days matrix) and the metrics derived from it.
+
+    `extend` returns a new table with extra rows added, so a table built for one
+    snapshot can seed the next one. The matrix sits in a larger buffer, and the new
+    table grows into its spare rows and columns rather than copying it, which also
+    changes the counts of the table it was extended from: only use the newest one.
+
+    Outages compacted into monthly counts are only known by month; they are counted on
+    the month's first day, and left out of the first outage and the mean days between
+    outages, which only use the days from `daily_from` on.
+    """
+
+    def __init__(self, feeders=(), start=None, counts=None, rows=0, daily_from=None, buffer=None):
+        self.feeders = list(feeders)
+        self._ids = {feeder: i for i, feeder in enumerate(self.feeders)}
+        self.start = start  # numpy datetime64[D] of column 0
+        self.counts = counts if counts is not None else np.zeros((0, 0), dtype=np.int32)
+        self.rows = rows
+        self.daily_from = daily_from  # numpy datetime64[D]; earlier days only have monthly counts
+        self._buffer = buffer
+
+    @classmethod
+    def from_frame(cls, frame, daily_from=None, through=None):
+        return cls(daily_from=daily_from).extend(frame, through)
+
+    def extend(self, frame, through=None):
+        """Returns a new table that also counts the rows of `frame`.
+
+        Args:
+            frame (pandas.DataFrame): The rows to add.
+            through (numpy.datetime64): Optional day the table must reach even without
+                                        outages on it, such as the snapshot's day.
+
+        Returns:
+            ReliabilityTable: The extended table, or this one if there is nothing to add.
+        """
+        days = np.array([], dtype='datetime64[D]')
+        feeders = self.feeders
+        if not frame.empty:
+            days = frame['Date'].to_numpy().astype('datetime64[D]')
+            feeder_codes, feeder_names = pd.factorize(frame['Feeder'])
+            valid = ~np.isnat(days) & (feeder_codes >= 0)
+            days, feeder_codes = days[valid], feeder_codes[valid]
+            weights = row_weights(frame)
+            weights = weights[valid] if weights is not None else None
+
+            feeders = list(self.feeders)
+            ids = dict(self._ids)
+            # Delta feeder code -> table row
+            rows_for_codes = np.empty(len(feeder_names), dtype=np.intp)
+            for code, name in enumerate(feeder_names):
+                name = str(name)
+                if name not in ids:
+                    ids[name] = len(feeders)
+                    feeders.append(name)
+                rows_for_codes[code] = ids[name]
+
+        if self.start is None and not len(days):
+            return self
+        old_end = self.start + self.counts.shape[1] if self.start is not None else None
+        start = min(day for day in (self.start, days.min() if len(days) else None) if day is not None)
+        end = max(day for day in (old_end, days.max() + 1 if len(days) else None,
+                                  through + 1 if through is not None else None) if day is not None)
+        width = int((end - start).astype(int))
+        if not len(days) and start == self.start and width == self.counts.shape[1]:
+            return self
+
+        buffer = self._buffer_for(len(feeders), start, width)
+        counts = buffer.array[:len(feeders), :width]
+        if len(days):
+            cells = rows_for_codes[feeder_codes] * width + (days - start).astype(np.int64)
+            cells, positions = np.unique(cells, return_inverse=True)
+            counts[cells // width, cells % width] += np.bincount(positions, weights).astype(np.int32)
+        table = ReliabilityTable(feeders, start, counts, self.rows + len(frame), self.daily_from, buffer)
+        buffer.owner = table
+        return table
+
+    def _buffer_for(self, height, start, width):
+        """Returns this table's buffer if it can grow in place, otherwise a larger copy."""
+        buffer = self._buffer
+        if (buffer is not None and buffer.owner is self and start == self.start
+                and height <= buffer.array.shape[0] and width <= buffer.array.shape[1]):
+            return buffer
+        buffer = _Buffer(np.zeros((_capacity(height), _capacity(width)), dtype=np.int32))
+        if self.start is not None:
+            offset = int((self.start - start).astype(int))
+            buffer.array[:self.counts.shape[0], offset:offset + self.counts.shape[1]] = self.counts
+        return buffer
+
+    @timed('analysis_seconds', function='feeder_reliability')
+    def metrics(self):
+        """Computes every feeder's reliability metrics with whole-matrix operations.
+
+        Returns:
+            pandas.DataFrame: One row per known feeder with outages in the 7/30/90 days up
+                              to `as_of`, total outages, first/last outage dates, mean days
+                              between outages and the weekly trend slope (outages per week,
+                              per week; positive means getting worse). The first outage
+                              and mean days between outages only count days from
+                              `daily_from` on (NaT/NaN without any).
+        """
+        columns = ['feeder', 'outages_7d', 'outages_30d', 'outages_90d', 'total_outages',
+                   'first_outage', 'last_outage', 'days_since_last_outage',
+                   'mean_days_between_outages', 'trend_per_week']
+        keep = np.array([feeder.upper() not in _UNKNOWN_FEEDERS for feeder in self.feeders], dtype=bool)
+        if not keep.any() or self.counts.size == 0:
+            return pd.DataFrame(columns=columns)
+        counts = self.counts[keep]
+        n_days = counts.shape[1]
+
+        result = {'feeder': np.array(self.feeders, dtype=object)[keep]}
+        for window in WINDOWS:
+            result[f'outages_{window}d'] = counts[:, -window:].sum(axis=1)
+        total = counts.sum(axis=1)
+        result['total_outages'] = total
+
+        has_outage = counts > 0
+        last = n_days - 1 - has_outage[:, ::-1].argmax(axis=1)
+        result['last_outage'] = self.start + last
+        result['days_since_last_outage'] = n_days - 1 - last
+        # Interval metrics need the day of each outage, so monthly counts are left out.
+        offset = 0 if self.daily_from is None else int(np.clip((self.daily_from - self.start).astype(int), 0, n_days))
+        daily_total = counts[:, offset:].sum(axis=1)
+        first = offset + has_outage[:, offset:].argmax(axis=1)
+        result['first_outage'] = np.where(daily_total > 0, self.start + first, np.datetime64('NaT'))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Outages on the same day count as zero days apart
+            result['mean_days_between_outages'] = np.where(daily_total > 1, (last - first) / (daily_total - 1),
+                                                           np.nan)
+
+        # Least-squares slope of weekly counts, for all feeders at once
+        weeks = min(TREND_WEEKS, n_days // 7)
+        if weeks >= 2:
+            weekly = counts[:, n_days - weeks * 7:].reshape(len(counts), weeks, 7).sum(axis=2)
+            x = np.arange(weeks) - (weeks - 1) / 2
+            result['trend_per_week'] = (weekly - weekly.mean(axis=1, keepdims=True)) @ x / (x @ x)
+        else:
+            result['trend_per_week'] = np.zeros(len(counts))
+        return pd.DataFrame(result, columns=columns)
+
+    @property
+    def as_of(self):
+        """The last day covered by the table, which the windows end on, or None if empty."""
+        if self.start is None:
+            return None
+        return self.start + self.counts.shape[1] - 1
+
+
+def ranked(metrics, sort='outages_30d'):
+    """Orders a metrics table worst first, by `sort` and then by the 30/90-day counts and trend."""
+    if sort == 'mean_days_between_outages':
+        # Fewer days between outages is worse; feeders with a single outage go last.
+        return metrics.sort_values([sort, 'outages_30d'], ascending=[True, False], na_position='last',
+                                   kind='stable')
+    keys = [sort] + [key for key in ('outages_30d', 'outages_90d', 'trend_per_week') if key != sort]
+    return metrics.sort_values(keys, ascending=False, kind='stable')
+
+
+# The table of the last snapshot it was built for, to extend rather than rebuild.
+_latest = None
+_latest_lock = threading.Lock()
+
+
+def _last_row(frame):
+    return tuple(str(value) for value in frame.iloc[-1][['Date', 'Feeder', 'Reason', 'Area']])
+
+
+def _snapshot_day(snapshot):
+    return np.datetime64(date.fromtimestamp(snapshot.created_at), 'D')
+
+
+def _daily_from(compacted):
+    """Returns the first day after the monthly tier of `compacted`, or None if it has none."""
+    if compacted is None or MONTHLY_COLUMN not in compacted.columns or not compacted[MONTHLY_COLUMN].any():
+        return None
+    last_month = compacted['Date'][compacted[MONTHLY_COLUMN].to_numpy()].max()
+    return (np.datetime64(last_month, 'M') + 1).astype('datetime64[D]')
+
+
+def for_snapshot(snapshot):
+    """Returns the reliability metrics of a snapshot, computed once per snapshot.
+
+    The metrics cover the raw rows and the compacted tiers (see retention.py); compacted
+    rows count as many outages as they stand for, and the monthly tier is left out of
+    the interval metrics (see ReliabilityTable). The windows end on the day the snapshot
+    was published, so a feeder without recent outages shows none. Between compactions,
+    snapshots only append rows to the previous version, so when the new frame still
+    ends the old one at the same position, only the appended rows are counted.
+
+    Returns:
+        tuple: (ReliabilityTable, metrics DataFrame).
+    """
+    def build(snap):
+        global _latest
+        frame = analysis_frame(snap)
+        through = _snapshot_day(snap)
+        # Extending grows the previous table in place, so builds take turns.
+        with _latest_lock:
+            latest = _latest
+            if (latest is not None and latest[2] is snap.compacted and 0 < latest[0].rows <= len(frame)
+                    and _last_row(frame.iloc[:latest[0].rows]) == latest[1]):
+                table = latest[0].extend(frame.iloc[latest[0].rows:], through)
+            else:
+                table = ReliabilityTable.from_frame(frame, _daily_from(snap.compacted), through)
+            if not frame.empty:
+                _latest = (table, _last_row(frame), snap.compacted)
+            return table, table.metrics()
+
+    return snapshot.memo('reliability', build)
@@ -0,0 +1,150 @@
+"""Bounded retention of the outage history: a raw hot window plus compacted tiers.
+
+With RETENTION_HOT_DAYS set, raw rows are kept for whole months covering at least
+that many days back. Older rows are compacted into daily counts per feeder, status
+and cause. Daily counts older than RETENTION_DAILY_DAYS are folded further into
+monthly ones. The snapshot writer compacts in bounded batches on every poll (at
+most RETENTION_PASS_SECONDS each), so years of notices are worked through
+incrementally without ever holding the history lock for long. A month is only
+compacted once its export partition has all of its rows, and after that the history
+ignores rows dated in it (see HistoryStore.compact).
+
+Snapshots then hold the raw hot window as rows and the tiers as a separate frame.
+`analysis_frame` combines them with a 'Count' weight column, which every analysis
+function honours, so summaries still cover the whole history. Row-level endpoints
+(/api/data, /api/location-data) serve the raw window; the monthly export partitions of
+compacted months are kept as they were.
+
+    python retention.py --hot-days 90    # compact everything due (and exported) now, then report the tiers
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from outage_frame import COUNT_COLUMN, concat
+
+# Days of raw rows to keep; 0 keeps every raw row (no compaction).
+RETENTION_HOT_DAYS = int(os.environ.get('RETENTION_HOT_DAYS', 0))
+# Days of daily counts to keep before they are folded into monthly ones
+RETENTION_DAILY_DAYS = int(os.environ.get('RETENTION_DAILY_DAYS', 730))
+# Raw rows (or daily cells) moved per transaction
+RETENTION_BATCH_ROWS = int(os.environ.get('RETENTION_BATCH_ROWS', 20000))
+# Time the writer spends compacting per poll, so scrapes are never held up for long
+RETENTION_PASS_SECONDS = float(os.environ.get('RETENTION_PASS_SECONDS', 1.0))
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+class RetentionPolicy:
+    """How long each tier of the history is kept, and the compaction that enforces it.
+
+    Cutoffs are aligned to whole months, so a month is either raw or compacted and
+    its export partition never changes once it is compacted.
+    """
+
+    def __init__(self, hot_days=RETENTION_HOT_DAYS, daily_days=RETENTION_DAILY_DAYS,
+                 batch_rows=RETENTION_BATCH_ROWS, pass_seconds=RETENTION_PASS_SECONDS):
+        self.hot_days = hot_days
+        # The daily tier starts where the raw window ends.
+        self.daily_days = max(daily_days, hot_days)
+        self.batch_rows = batch_rows
+        self.pass_seconds = pass_seconds
+
+    @property
+    def enabled(self):
+        return self.hot_days > 0
+
+    def cutoffs(self, today=None):
+        """Returns (raw_before, daily_before): the first days, as 'YYYY-MM-DD', kept in each tier."""
+        today = today or date.today()
+        raw_before = _month_start(today - timedelta(days=self.hot_days))
+        daily_before = _month_start(today - timedelta(days=self.daily_days))
+        return raw_before.isoformat(), daily_before.isoformat()
+
+    def compact(self, history, today=None, budget_seconds=None, exported=None):
+        """Compacts batches of due data until caught up or out of time.
+
+        Args:
+            history (HistoryStore): The history to compact.
+            today (datetime.date): The day the windows are counted back from (default: today).
+            budget_seconds (float): Time to spend; None uses the policy's, 0 means no limit.
+            exported (dict): Rows per exported month; months whose raw rows are not all
+                             exported yet are left raw. None compacts them regardless.
+
+        Returns:
+            dict: Raw rows and daily cells compacted, and whether anything is still due.
+        """
+        stats = {"rows": 0, "daily_cells": 0, "caught_up": True}
+        if not self.enabled:
+            return stats
+        budget = self.pass_seconds if budget_seconds is None else budget_seconds
+        raw_before, daily_before = self.cutoffs(today)
+        deadline = time.monotonic() + budget
+        while True:
+            rows, cells = history.compact(raw_before, daily_before, self.batch_rows, exported)
+            stats["rows"] += rows
+            stats["daily_cells"] += cells
+            if not rows and not cells:
+                return stats
+            if budget and time.monotonic() >= deadline:
+                stats["caught_up"] = False
+                return stats
+
+
+def analysis_frame(snapshot):
+    """Returns the snapshot's raw rows and compacted tiers as one frame for analysis.
+
+    Compacted rows come first, with a 'Count' of the outages each stands for; raw rows
+    count once. Without compacted tiers this is just the snapshot's frame. Built once
+    per snapshot.
+    """
+    compacted = snapshot.compacted
+    if compacted is None or compacted.empty:
+        return snapshot.frame
+
+    def build(snap):
+        frame = concat([compacted, snap.frame])
+        counts = np.concatenate([compacted[COUNT_COLUMN].to_numpy(), np.ones(len(snap.frame), dtype='int64')])
+        return frame.assign(**{COUNT_COLUMN: counts})
+
+    return snapshot.memo('analysis-frame', build)
+
+
+def main(argv=None):
+    from export import ExportStore
+    from history_store import HISTORY_DB_PATH, HistoryStore
+
+    parser = argparse.ArgumentParser(description="Compacts the outage history according to a retention policy.")
+    parser.add_argument('--history', default=HISTORY_DB_PATH, help="history database (default: %(default)s)")
+    parser.add_argument('--hot-days', type=int, default=RETENTION_HOT_DAYS)
+    parser.add_argument('--daily-days', type=int, default=RETENTION_DAILY_DAYS)
+    parser.add_argument('--batch-rows', type=int, default=RETENTION_BATCH_ROWS)
+    parser.add_argument('--unexported', action='store_true',
+                        help="also compact months never exported (their rows are then only kept as counts)")
+    args = parser.parse_args(argv)
+
+    policy = RetentionPolicy(args.hot_days, args.daily_days, args.batch_rows)
+    if not policy.enabled:
+        print("Retention is disabled; set --hot-days (or RETENTION_HOT_DAYS).")
+        return 1
+    history = HistoryStore(args.history)
+    raw_before, daily_before = policy.cutoffs()
+    start = time.perf_counter()
+    exported = None if args.unexported else ExportStore().month_rows()
+    stats = policy.compact(history, budget_seconds=0, exported=exported)
+    tiers = history.compacted_frame()
+    print(f"Compacted {stats['rows']} raw rows before {raw_before} and {stats['daily_cells']} daily cells "
+          f"before {daily_before} in {time.perf_counter() - start:.1f}s.")
+    print(f"Raw rows: {len(history.rows_since(0)[0])}; compacted rows: {len(tiers)}, "
+          f"standing for {int(tiers[COUNT_COLUMN].sum())} outages.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""JSON encoding of API responses, straight from DataFrame columns.
+
+`df.to_dict(orient='records')` followed by the standard library encoder builds and
+then walks one dict per row, which is where most of a large /api/data request went.
+Here each column is dictionary-encoded instead: every distinct value (a category, a
+date) is encoded to JSON once with orjson, and rows are assembled by taking those
+encoded fragments by integer code. Frames can be sent as a list of records, or in
+the smaller columnar form:
+
+    {"columns": ["Date", "Feeder", ...], "data": [[...dates...], [...feeders...], ...]}
+
+Responses are compressed with brotli or gzip, whichever the client prefers of those
+available (brotli is optional; without the `brotli` package only gzip is offered).
+"""
+import gzip
+
+import numpy as np
+import orjson
+import pandas as pd
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+import metrics
+from outage_frame import DATE_FORMAT
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ORIENTS = ('records', 'columns')
+# Bodies smaller than this are not worth compressing.
+MIN_COMPRESS_BYTES = 512
+# Levels for responses compressed on every request, where speed matters more than size
+# (a 150 MB /api/data body takes about 1s at gzip level 1 and 4s at level 6).
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+# Dicts are encoded with sorted keys, like Flask's default provider did.
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+metrics.histogram('response_serialize_seconds', 'Time spent encoding JSON responses.')
+metrics.histogram('response_compress_seconds', 'Time spent compressing responses, by encoding.')
+
+
+def _dictionary(series):
+    """Dictionary-encodes a column.
+
+    Returns:
+        tuple: (codes, values): each row's index into `values`, or -1 where the value
+               is missing, and the distinct values as JSON-ready Python objects.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    if isinstance(uniques, pd.DatetimeIndex):
+        # Day-precision dates (the canonical 'Date' column) keep their 'YYYY-MM-DD' form
+        date_only = bool((uniques == uniques.normalize()).all())
+        return codes, uniques.strftime(DATE_FORMAT if date_only else _DATETIME_FORMAT).tolist()
+    return codes, uniques.tolist()
+
+
+def _lookup(encoded, missing):
+    """Returns an object array of `encoded` values plus `missing` last, for code -1."""
+    lookup = np.empty(len(encoded) + 1, dtype=object)
+    lookup[:-1] = encoded
+    lookup[-1] = missing
+    return lookup
+
+
+def _row_fragments(df):
+    """Returns each row of `df` as the encoded members of a JSON object, without braces."""
+    columns = []
+    for name in df.columns:
+        codes, values = _dictionary(df[name])
+        key = orjson.dumps(str(name)) + b':'
+        encoded = [key + orjson.dumps(value, default=_default, option=OPTIONS) for value in values]
+        columns.append(_lookup(encoded, key + b'null')[codes].tolist())
+    return [b','.join(members) for members in zip(*columns)]
+
+
+def encode_frame(df, orient='records'):
+    """Encodes a DataFrame as JSON without building a Python object per row.
+
+    Args:
+        df (pandas.DataFrame): The rows to encode. Datetime columns are written as
+                               'YYYY-MM-DD' when they only hold whole days; missing
+                               values (NaN, NaT, None) become null.
+        orient (str): 'records' for a list of {column: value} objects, or 'columns'
+                      for {"columns": [names], "data": [one list per column]}.
+
+    Returns:
+        bytes: The UTF-8 JSON document.
+    """
+    if orient == 'columns':
+        data = []
+        for name in df.columns:
+            codes, values = _dictionary(df[name])
+            data.append(_lookup(values, None)[codes].tolist())
+        return orjson.dumps({"columns": [str(name) for name in df.columns], "data": data},
+                            default=_default, option=OPTIONS)
+    if df.empty:
+        return b'[]'
+    return b'[{' + b'},{'.join(_row_fragments(df)) + b'}]'
+
+
+def encode_lines(df):
+    """Encodes a DataFrame as newline-delimited JSON records, ending with a newline."""
+    if df.empty:
+        return b''
+    return b'{' + b'}\n{'.join(_row_fragments(df)) + b'}\n'
+
+
+def _default(obj):
+    """Converts the objects orjson cannot encode by itself."""
+    if isinstance(obj, pd.DataFrame):
+        return orjson.loads(encode_frame(obj))
+    if isinstance(obj, pd.Series):
+        return dict(zip(obj.index.tolist(), obj.tolist()))
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload, orient='records'):
+    """Encodes a response payload as JSON bytes.
+
+    DataFrames, whether the payload itself or values of a payload dict, are encoded
+    with `encode_frame` in the given orient; pandas Series become {index: value}.
+
+    Returns:
+        bytes: The UTF-8 JSON document.
+    """
+    if isinstance(payload, pd.DataFrame):
+        return encode_frame(payload, orient)
+    if isinstance(payload, dict) and any(isinstance(value, pd.DataFrame) for value in payload.values()):
+        return b'{' + b','.join(orjson.dumps(str(key)) + b':' + dumps(payload[key], orient)
+                                for key in sorted(payload, key=str)) + b'}'
+    return orjson.dumps(payload, default=_default, option=OPTIONS)
+
+
+def negotiate_encoding(size):
+    """Returns the content coding the current request prefers for a body of `size` bytes.
+
+    Returns:
+        str: 'br', 'gzip', or None to send the body as it is.
+    """
+    if size < MIN_COMPRESS_BYTES:
+        return None
+    return request.accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+
+
+def compress(body, encoding, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+    """Compresses a body with a content coding returned by `negotiate_encoding`."""
+    with metrics.timer('response_compress_seconds', encoding=encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=brotli_quality)
+        return gzip.compress(body, gzip_level)
+
+
+def json_response(payload, status=200, orient='records'):
+    """Builds a JSON response, compressed as the client accepts.
+
+    Args:
+        payload: Anything `dumps` encodes.
+        status (int): The HTTP status.
+        orient (str): How DataFrames in the payload are laid out, one of ORIENTS.
+
+    Returns:
+        flask.Response: The response.
+    """
+    with metrics.timer('response_serialize_seconds'):
+        body = dumps(payload, orient) + b'\n'
+    encoding = negotiate_encoding(len(body))
+    response = Response(compress(body, encoding) if encoding else body, status=status,
+                        mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with `dumps`, so `jsonify` responses get the
+    same encoder (and DataFrame support) and negotiated compression."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        return json_response(self._prepare_response_obj(args, kwargs))
@@ -0,0 +1,180 @@
+import json
+import os
+import time
+
+import pyarrow as pa
+
+from config import DATA_DIR
+from refresher import Snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every process acts as the writer
+    fcntl = None
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(DATA_DIR, 'snapshots'))
+# Older snapshot files are kept around briefly so workers still mapping them are not disturbed.
+KEEP_VERSIONS = 3
+
+MANIFEST_NAME = 'CURRENT'
+WRITER_LOCK_NAME = 'writer.lock'
+REFRESH_REQUEST_NAME = 'refresh.request'
+
+
+class SnapshotStore:
+    """Versioned, memory-mapped Arrow snapshots shared by every worker process.
+
+    One process (the writer) scrapes and publishes `snapshot-<version>.arrow`, then
+    atomically repoints the `CURRENT` manifest at it. Every worker maps the current
+    file read-only, so N workers share one copy of the data in the page cache and
+    swap to a new version as soon as the manifest changes.
+
+    The compacted tiers of the history, when there are any, are a second file,
+    `compacted-<version>.arrow`, only written when they change; later versions keep
+    pointing at it, and each worker maps it once.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = None
+        self._manifest_cache = (None, None)
+        self._compacted_cache = (None, None)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def acquire_writer(self):
+        """Tries to become the single writer. Returns True if this process holds the lock."""
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            self._lock_file = True
+            return True
+        lock_file = open(self._path(WRITER_LOCK_NAME), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        print(f"Process {os.getpid()} is the snapshot writer.")
+        return True
+
+    def manifest(self):
+        """Returns the manifest of the current snapshot, or None if nothing is published yet."""
+        path = self._path(MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached_mtime, cached = self._manifest_cache
+        if cached_mtime == mtime:
+            return cached
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return cached
+        self._manifest_cache = (mtime, manifest)
+        return manifest
+
+    def _write(self, frame, file_name):
+        # The index (history row ids) is kept, for cursors that survive compaction.
+        table = pa.Table.from_pandas(frame)
+        tmp_path = self._path(file_name + '.tmp')
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self._path(file_name))
+        return table.num_rows
+
+    def publish(self, frame, compacted=None, **meta):
+        """Writes a frame as the next snapshot version and makes it current.
+
+        `compacted` replaces the compacted tiers; when None, the new version keeps the
+        previous version's. Extra keyword arguments are stored in the manifest for the
+        next writer to read.
+        """
+        manifest = self.manifest()
+        version = (manifest['version'] if manifest else 0) + 1
+        file_name = f'snapshot-{version:08d}.arrow'
+        rows = self._write(frame, file_name)
+
+        compacted_file = manifest.get('compacted_file') if manifest else None
+        if compacted is not None:
+            compacted_file = f'compacted-{version:08d}.arrow' if not compacted.empty else None
+            if compacted_file:
+                self._write(compacted, compacted_file)
+
+        new_manifest = {
+            "version": version,
+            "file": file_name,
+            "rows": rows,
+            "created_at": time.time(),
+            **meta
+        }
+        if compacted_file:
+            new_manifest["compacted_file"] = compacted_file
+        tmp_manifest = self._path(MANIFEST_NAME + '.tmp')
+        with open(tmp_manifest, 'w') as f:
+            json.dump(new_manifest, f)
+        os.replace(tmp_manifest, self._path(MANIFEST_NAME))
+        self._prune(version, compacted_file)
+        return new_manifest
+
+    def _map(self, file_name):
+        source = pa.memory_map(self._path(file_name), 'r')
+        # One block per column: pandas would otherwise consolidate the dates into a
+        # new array. The categorical codes and the index are views of the file either
+        # way; only the (small) categories are copied.
+        return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+    def load(self, manifest):
+        """Maps the snapshot described by a manifest without copying its columns.
+
+        The dates, categorical codes and row ids stay in the mapped pages, read-only;
+        each worker only builds its own copy of the category values.
+        """
+        compacted_file = manifest.get('compacted_file')
+        compacted = None
+        if compacted_file:
+            cached_file, compacted = self._compacted_cache
+            if cached_file != compacted_file:
+                # Versions share the compacted file until the next compaction; map it once.
+                compacted = self._map(compacted_file)
+                self._compacted_cache = (compacted_file, compacted)
+        return Snapshot(self._map(manifest['file']), manifest['version'], manifest['created_at'], compacted)
+
+    def load_latest(self, current=None):
+        """Returns the current snapshot, reusing `current` if its version is still the latest."""
+        manifest = self.manifest()
+        if manifest is None:
+            return current
+        if current is not None and current.version == manifest['version']:
+            return current
+        return self.load(manifest)
+
+    def request_refresh(self):
+        """Asks the writer, which may live in another process, to scrape on its next poll."""
+        with open(self._path(REFRESH_REQUEST_NAME), 'w') as f:
+            f.write(str(time.time()))
+
+    def refresh_requested_at(self):
+        try:
+            return os.stat(self._path(REFRESH_REQUEST_NAME)).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _prune(self, version, compacted_file=None):
+        for name in os.listdir(self.directory):
+            prefix = next((prefix for prefix in ('snapshot-', 'compacted-') if name.startswith(prefix)), None)
+            if prefix is None or not name.endswith('.arrow') or name == compacted_file:
+                continue
+            try:
+                file_version = int(name[len(prefix):-len('.arrow')])
+            except ValueError:
+                continue
+            if file_version <= version - KEEP_VERSIONS:
+                # Workers that still map an unlinked file keep their pages until they swap.
+                os.remove(self._path(name))
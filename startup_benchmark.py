@@ -0,0 +1,124 @@
+"""Measures how long a fresh app process takes to import and to answer its first request.
+
+Each run starts a new Python process against a stub CNN site (synthetic.make_server),
+imports app, and times the first /api/outage-summary response:
+
+    cold: an empty DATA_DIR, so the first request waits for a live scrape;
+    warm: a DATA_DIR with a published snapshot, which app loads at import, as a
+          restarted or recycled worker would.
+
+Usage:
+    python startup_benchmark.py --entries 5000 --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic import make_server
+
+DEFAULT_ENTRIES = 5000
+DEFAULT_REPEAT = 3
+# Modules the app should only import when they are actually needed
+HEAVY_MODULES = ('requests', 'bs4', 'pyarrow.parquet', 'pyarrow.csv', 'cnn_parser')
+
+# Runs in the child process and writes its timings to the file named by argv[1]
+# (stdout is shared with the app's background threads).
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/api/outage-summary')
+answered = time.perf_counter()
+with open(sys.argv[1], 'w') as f:
+    json.dump({
+        "import_seconds": imported - started,
+        "first_response_seconds": answered - imported,
+        "status": response.status_code,
+        "heavy_modules": [name for name in %r if name in sys.modules],
+    }, f)
+""" % (HEAVY_MODULES,)
+
+
+def _probe(data_dir, url):
+    """Runs the probe in a fresh interpreter. Returns its timings plus the process wall time."""
+    env = dict(os.environ, DATA_DIR=data_dir, CNN_URL=url, PYTHONDONTWRITEBYTECODE='1')
+    result_path = data_dir + '.json'
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', _PROBE, result_path], env=env, capture_output=True, check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall = time.perf_counter() - started
+    with open(result_path) as f:
+        result = json.load(f)
+    result["process_seconds"] = wall
+    return result
+
+
+def _summarize(runs):
+    summary = {"runs": runs}
+    for field in ('import_seconds', 'first_response_seconds', 'process_seconds'):
+        values = [run[field] for run in runs]
+        summary[field] = {"best": min(values), "median": statistics.median(values)}
+    summary["heavy_modules"] = runs[-1]["heavy_modules"]
+    summary["statuses"] = sorted({run["status"] for run in runs})
+    return summary
+
+
+def run(entries=DEFAULT_ENTRIES, repeat=DEFAULT_REPEAT):
+    """Times cold and warm starts against a local stub CNN site.
+
+    Args:
+        entries (int): Notices on the stub page.
+        repeat (int): Processes started per scenario.
+
+    Returns:
+        dict: Per scenario, the best and median import, first-response and whole-process
+              seconds, the response statuses, and which heavy modules were imported.
+    """
+    server = make_server(0, entries)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/cnn/'
+    root = tempfile.mkdtemp(prefix='startup-benchmark-')
+    try:
+        cold_runs = []
+        for attempt in range(repeat):
+            data_dir = os.path.join(root, f'cold-{attempt}')
+            cold_runs.append(_probe(data_dir, url))
+        # The last cold run left a published snapshot behind; every warm run starts from it.
+        warm_runs = [_probe(data_dir, url) for _ in range(repeat)]
+    finally:
+        server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+    return {"cold": _summarize(cold_runs), "warm": _summarize(warm_runs)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures app import time and time to first response.")
+    parser.add_argument('--entries', type=int, default=DEFAULT_ENTRIES, help="notices on the stub CNN page")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--output', help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.entries, args.repeat)
+    for scenario, summary in results.items():
+        print(f"{scenario:5s} import {summary['import_seconds']['median'] * 1000:8.1f} ms  "
+              f"first response {summary['first_response_seconds']['median'] * 1000:8.1f} ms  "
+              f"process {summary['process_seconds']['median'] * 1000:8.1f} ms  "
+              f"status {summary['statuses']}  heavy imports: {', '.join(summary['heavy_modules']) or 'none'}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "entries": args.entries, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
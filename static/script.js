@@ -22,9 +22,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let areasChartInstance;
     let reasonsChartInstance;
     let statusChartInstance;
-    
-    // Store all locations for filtering
-    let allLocations = [];
+    // Snapshot version the charts currently show (from the X-Snapshot-Version header)
+    let renderedVersion = null;
     
     // Debounce function to limit how often a function can be called
     function debounce(func, wait) {
@@ -54,6 +53,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error(errorMsg);
             }
             const data = await response.json();
+            const version = parseInt(response.headers.get('X-Snapshot-Version'), 10);
+            renderedVersion = Number.isNaN(version) ? null : version;
 
             if (lastUpdatedElem && data.last_updated) {
                 lastUpdatedElem.textContent = `Data loaded: ${data.last_updated}`;
@@ -61,65 +62,58 @@ document.addEventListener('DOMContentLoaded', () => {
                 lastUpdatedElem.textContent = `Data loaded: ${new Date().toLocaleString()}`;
             }
 
-            // Store all locations and populate dropdown
-            if (data.all_locations && data.all_locations.length > 0) {
-                allLocations = data.all_locations;
-                
-                if (locationDropdown) {
-                    // Clear existing options except the first one
-                    while (locationDropdown.options.length > 1) {
-                        locationDropdown.remove(1);
-                    }
-                    
-                    // Add new options
-                    allLocations.forEach(location => {
-                        const option = document.createElement('option');
-                        option.value = location;
-                        option.textContent = location;
-                        locationDropdown.appendChild(option);
-                    });
-                }
-            }
+            renderSummaryCharts(data);
+            
+        } catch (error) {
+            console.error('Error fetching or rendering data:', error);
+            if (lastUpdatedElem) lastUpdatedElem.textContent = 'Failed to load data.';
+            if (errorDisplayElem) errorDisplayElem.textContent = `Error: ${error.message}`;
+            if (feedersChartInstance) feedersChartInstance.destroy();
+            if (areasChartInstance) areasChartInstance.destroy();
+            if (reasonsChartInstance) reasonsChartInstance.destroy();
+            if (statusChartInstance) statusChartInstance.destroy();
+            feedersChartInstance = null;
+            areasChartInstance = null;
+            reasonsChartInstance = null;
+            statusChartInstance = null;
+        }
+    }
 
-            // Render all charts
+    // Renders the charts for the summary fields present in `data`; updates pushed over
+    // /api/stream only carry the fields that changed.
+    function renderSummaryCharts(data) {
+        if ('top_feeders' in data) {
             if (feedersCanvas) {
                 renderBarChart(feedersCanvas.getContext('2d'), feedersChartInstance, data.top_feeders, 'Top 5 Faulty Feeders', 'Feeder', 'Outage Count', 'feedersChart');
             } else {
                 console.error('Canvas for feeders chart (topFeedersChart) not found.');
                 if (errorDisplayElem) errorDisplayElem.textContent += ' Feeders chart canvas not found. ';
             }
-            
+        }
+        
+        if ('most_affected_areas' in data) {
             if (areasCanvas) {
                 renderBarChart(areasCanvas.getContext('2d'), areasChartInstance, data.most_affected_areas, 'Top 5 Affected Areas', 'Area', 'Outage Count', 'areasChart');
             } else {
                 console.error('Canvas for areas chart (mostAffectedAreasChart) not found.');
                 if (errorDisplayElem) errorDisplayElem.textContent += ' Areas chart canvas not found. ';
             }
-            
+        }
+        
+        if ('frequent_reasons' in data) {
             if (reasonsCanvas) {
                 renderPieChart(reasonsCanvas.getContext('2d'), reasonsChartInstance, data.frequent_reasons, 'Frequent Outage Reasons', 'reasonsChart');
             } else {
                 console.error('Canvas for reasons chart (reasonsChart) not found.');
             }
-            
+        }
+        
+        if ('status_distribution' in data) {
             if (statusCanvas) {
                 renderPieChart(statusCanvas.getContext('2d'), statusChartInstance, data.status_distribution, 'Outage Status Distribution', 'statusChart');
             } else {
                 console.error('Canvas for status chart (statusChart) not found.');
             }
-            
-        } catch (error) {
-            console.error('Error fetching or rendering data:', error);
-            if (lastUpdatedElem) lastUpdatedElem.textContent = 'Failed to load data.';
-            if (errorDisplayElem) errorDisplayElem.textContent = `Error: ${error.message}`;
-            if (feedersChartInstance) feedersChartInstance.destroy();
-            if (areasChartInstance) areasChartInstance.destroy();
-            if (reasonsChartInstance) reasonsChartInstance.destroy();
-            if (statusChartInstance) statusChartInstance.destroy();
-            feedersChartInstance = null;
-            areasChartInstance = null;
-            reasonsChartInstance = null;
-            statusChartInstance = null;
         }
     }
 
@@ -318,56 +312,123 @@ document.addEventListener('DOMContentLoaded', () => {
     // Initial data load
     fetchDataAndRenderCharts();
 
+    // Live updates: the server pushes an event whenever it starts serving a new snapshot
+    // version, so the dashboard never polls. An event that follows the version on screen
+    // carries just the changed fields; after a gap (e.g. a reconnect) we re-fetch.
+    let updateSource = null;
+    function subscribeToUpdates() {
+        if (!window.EventSource) {
+            return;
+        }
+        updateSource = new EventSource('/api/stream');
+        updateSource.addEventListener('snapshot', (event) => {
+            const update = JSON.parse(event.data);
+            if (renderedVersion !== null && update.version <= renderedVersion) {
+                return; // Already showing this version (or a newer one)
+            }
+            if (renderedVersion === null || update.previous_version !== renderedVersion) {
+                fetchDataAndRenderCharts();
+                return;
+            }
+            renderSummaryCharts(update.changed);
+            renderedVersion = update.version;
+            if (lastUpdatedElem && update.last_updated) {
+                lastUpdatedElem.textContent = `Data loaded: ${update.last_updated}`;
+            }
+            if (refreshStatusElem && refreshStatusElem.textContent) {
+                refreshStatusElem.textContent = 'New data received. Charts updated.';
+                setTimeout(() => { if (refreshStatusElem) refreshStatusElem.textContent = ''; }, 3000);
+            }
+        });
+        // EventSource reconnects by itself (the server asks for a 5 s retry delay).
+    }
+    subscribeToUpdates();
+
     // Make refreshData globally accessible for the button in HTML
     window.refreshData = async () => {
         if (refreshStatusElem) refreshStatusElem.textContent = 'Refreshing data...';
-        // The /refresh-data endpoint was removed from app.py as per the requirements.
-        // Re-fetching /api/outage-summary will get cached data from the server unless the server cache itself is cleared.
-        // This client-side refresh will effectively re-render with potentially the same data.
-        await fetchDataAndRenderCharts();
-        if (refreshStatusElem) refreshStatusElem.textContent = 'Data re-fetched. Charts updated.';
-        setTimeout(() => { if (refreshStatusElem) refreshStatusElem.textContent = ''; }, 3000); // Clear status after a few seconds
-    };
-    
-    // Function to filter locations based on search input
-    const filterLocations = debounce((searchText) => {
-        if (!locationDropdown || !allLocations.length) {
-            if (searchStatus) searchStatus.textContent = 'Location list not yet loaded.';
+        try {
+            // Starts a background re-scrape; new data arrives over /api/stream when ready.
+            const response = await fetch('/refresh-data');
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+        } catch (error) {
+            console.error('Error requesting a refresh:', error);
+            if (refreshStatusElem) refreshStatusElem.textContent = 'Refresh request failed.';
             return;
         }
-        
-        // Clear existing options except the first one ("Select your location...")
+        if (updateSource) {
+            if (refreshStatusElem) refreshStatusElem.textContent = 'Refresh requested. Charts will update when new data arrives.';
+        } else {
+            await fetchDataAndRenderCharts();
+            if (refreshStatusElem) refreshStatusElem.textContent = 'Data re-fetched. Charts updated.';
+        }
+        setTimeout(() => { if (refreshStatusElem) refreshStatusElem.textContent = ''; }, 5000); // Clear status after a few seconds
+    };
+    
+    // Replaces the dropdown options (except "Select your location...") with the given locations
+    function populateLocationDropdown(locations) {
         while (locationDropdown.options.length > 1) {
             locationDropdown.remove(1);
         }
+        locations.forEach(location => {
+            const option = document.createElement('option');
+            option.value = location;
+            option.textContent = location;
+            locationDropdown.appendChild(option);
+        });
+    }
+
+    // Fetches location names from the server's location index: the suggestions for
+    // `searchText`, or the locations with the most outages when it is empty.
+    async function fetchLocationSuggestions(searchText, limit) {
+        const response = await fetch(`/api/locations/suggest?q=${encodeURIComponent(searchText)}&limit=${limit}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        return (data.suggestions || []).map(suggestion => suggestion.location);
+    }
 
+    // Function to filter locations based on search input.
+    // Matching happens on the server against the location index, so only the
+    // suggestions for the current text are downloaded.
+    let latestSearch = 0;
+    const filterLocations = debounce(async (searchText) => {
+        if (!locationDropdown) {
+            return;
+        }
+
+        const searchId = ++latestSearch;
         if (!searchText.trim()) {
-            // If search text is empty, populate with all locations
-            allLocations.forEach(location => {
-                const option = document.createElement('option');
-                option.value = location;
-                option.textContent = location;
-                locationDropdown.appendChild(option);
-            });
+            // If search text is empty, offer the most affected locations
             if (searchStatus) searchStatus.textContent = 'Type to search locations.';
             locationResults.style.display = 'none'; // Hide results when search is cleared
+            try {
+                const topLocations = await fetchLocationSuggestions('', 50);
+                if (searchId === latestSearch) populateLocationDropdown(topLocations);
+            } catch (error) {
+                console.error('Error fetching locations:', error);
+            }
             return;
         }
         
         if (searchStatus) searchStatus.textContent = 'Searching...';
-        
-        // Filter locations that contain the search text (case insensitive)
-        const filteredLocations = allLocations.filter(location => 
-            location.toLowerCase().includes(searchText.toLowerCase().trim())
-        );
-        
-        // Add filtered options
-        filteredLocations.forEach(location => {
-            const option = document.createElement('option');
-            option.value = location;
-            option.textContent = location;
-            locationDropdown.appendChild(option);
-        });
+
+        let filteredLocations;
+        try {
+            filteredLocations = await fetchLocationSuggestions(searchText.trim(), 20);
+        } catch (error) {
+            console.error('Error fetching location suggestions:', error);
+            if (searchStatus) searchStatus.textContent = 'Location search failed. Please try again.';
+            return;
+        }
+        if (searchId !== latestSearch) {
+            return; // A newer search has started; drop these stale results
+        }
+
+        populateLocationDropdown(filteredLocations);
         
         // Update search status
         if (filteredLocations.length === 0) {
@@ -391,6 +452,8 @@ document.addEventListener('DOMContentLoaded', () => {
             filterLocations(e.target.value);
         });
     }
+    // Start with the most affected locations in the dropdown
+    filterLocations('');
     
     // Function to analyze location data
     function analyzeLocationData(outages) {
@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+
+# Idle streams get a comment line this often, so proxies and browsers keep them open.
+HEARTBEAT_SECONDS = float(os.environ.get('STREAM_HEARTBEAT_SECONDS', 15))
+# How long browsers wait before reconnecting a dropped stream.
+RECONNECT_MILLISECONDS = 5000
+
+
+class EventBroadcaster:
+    """Hands the latest event to every open stream of this process.
+
+    Only the most recent event is kept: a stream that wakes up late skips straight to
+    it, which is all a client needs, because every event describes a full snapshot
+    version. Under the gevent worker, waiting streams are greenlets parked on the
+    (monkey-patched) condition, so thousands of idle connections cost a few KB each.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._event = None
+
+    @property
+    def latest(self):
+        return self._event
+
+    def publish(self, event):
+        """Makes `event` (a dict with a unique 'id') the latest one and wakes every stream."""
+        with self._condition:
+            self._event = event
+            self._condition.notify_all()
+
+    def wait(self, last_id, timeout):
+        """Waits up to `timeout` seconds for an event other than `last_id`.
+
+        Returns:
+            dict: The latest event, or None if there was nothing new before the timeout.
+        """
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: self._event is not None and self._event['id'] != last_id, timeout)
+            return self._event if ready else None
+
+    def stream(self, last_id=None):
+        """Yields the text of a Server-Sent Events stream, forever.
+
+        Args:
+            last_id (str): The Last-Event-ID the client reconnected with, if any. If it is
+                           still the latest event, the client already has it.
+        """
+        yield f'retry: {RECONNECT_MILLISECONDS}\n\n'
+        while True:
+            event = self.wait(last_id, HEARTBEAT_SECONDS)
+            if event is None:
+                yield ': keep-alive\n\n'
+                continue
+            last_id = event['id']
+            yield format_event(event)
+
+
+def format_event(event):
+    """Formats an event dict ({'id', 'event', 'data'}) as a Server-Sent Events message."""
+    data = json.dumps(event['data'], separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
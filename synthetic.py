@@ -0,0 +1,255 @@
+"""Generates realistic synthetic Ikeja Electric CNN pages for benchmarks and offline runs.
+
+Usage:
+    python synthetic.py ENTRIES [--layout p|card-body|body] [--seed N] > page.html
+    python synthetic.py ENTRIES --serve PORT [--pages N]   # stub CNN site for offline runs
+    python synthetic.py ENTRIES --serve PORT --latency 0.3 --change-seconds 60
+"""
+import argparse
+import html
+import random
+import re
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The three page structures cnn_parser._extract_lines handles: notices in <p> tags,
+# <p> tags nested in 'card-body' divs, and bare text (with <br> line breaks) in the body.
+LAYOUTS = ('p', 'card-body', 'body')
+
+FEEDERS = [
+    'OGBA', 'ALAUSA', 'IKEJA GRA', 'AGEGE-2', 'OKE_IRA', 'ISOLO 11KV', 'OREGUN', 'OPEBI',
+    'ALLEN', 'MAGODO', 'OMOLE-1', 'OMOLE-2', 'OJODU', 'ABULE EGBA', 'IJU', 'ISHERI',
+    'AKOWONJO', 'EGBEDA', 'IKOTUN', 'IDIMU', 'IPAJA', 'AYOBO', 'SHOMOLU', 'BARIGA',
+    'OWOROSOKI', 'KETU', 'MILE-12', 'ALAPERE', 'ANTHONY', 'MARYLAND', 'ILUPEJU', 'PALMGROVE',
+]
+STATUS_KEYWORDS = ['FAULT', 'OUTAGE', 'DOWNTIME', 'MAINTENANCE', 'SHUTDOWN']
+REASONS = [
+    'Line fault', 'LINE FAULT on 11kV', 'Tree on line', 'Broken pole', 'Broken cross arm',
+    'Vandalized cable', 'Transformer upgrade', 'Planned maintenance', 'Load shedding',
+    'Upstream TCN outage', 'Insulator failure', 'Cable fault', 'Burnt jumper',
+    'Relay tripping', 'Rainstorm damage', 'Network reconfiguration',
+]
+AREAS = [
+    'Ogba', 'Ikeja', 'Agege', 'Alausa', 'Opebi', 'Allen Avenue', 'Oregun', 'Ojodu Berger',
+    'Ikeja GRA', 'Magodo Phase 1', 'Magodo Phase 2', 'Omole Phase 1', 'Omole Phase 2',
+    'Isheri', 'Berger', 'Ketu', 'Mile 12', 'Alapere', 'Anthony', 'Maryland', 'Ilupeju',
+    'Palmgrove', 'Shomolu', 'Bariga', 'Akowonjo', 'Egbeda', 'Ikotun', 'Idimu', 'Ipaja',
+    'Ayobo', 'Abule Egba', 'Iju', 'Ifako', 'Oke Ira', 'Isolo', 'Ejigbo', 'Okota',
+    'Toyin Street', 'Awolowo Way', 'Obafemi Awolowo Way', 'Adeniyi Jones', 'Kudirat Abiola Way',
+]
+AREA_SEPARATORS = [', ', ', ', ', ', '; ', ' & ']
+
+
+def _undertaking(rng):
+    """Returns the undertaking lines of one notice, covering the formats the parser handles."""
+    feeder = rng.choice(FEEDERS)
+    reason = rng.choice(REASONS)
+    style = rng.random()
+    if style < 0.55:
+        # "OGBA FAULT: Tree on line"
+        return [f"{feeder} {rng.choice(STATUS_KEYWORDS)}: {reason}"]
+    if style < 0.65:
+        # Status repeated in front of the reason
+        return [f"{feeder} {rng.choice(STATUS_KEYWORDS)}: {rng.choice(STATUS_KEYWORDS)} - {reason}"]
+    if style < 0.72:
+        # Nothing after the colon
+        return [f"{feeder} {rng.choice(STATUS_KEYWORDS)}:"]
+    if style < 0.82:
+        # Feeder without a status keyword
+        return [f"{feeder.replace(' ', '')}: {reason}"]
+    if style < 0.90:
+        # Undertaking spread over two lines
+        return [f"{feeder} {rng.choice(STATUS_KEYWORDS)}: {reason}", "Restoration in progress"]
+    return [f"General notice: {reason.lower()} affecting supply"]
+
+
+def _areas(rng):
+    if rng.random() < 0.03:
+        return "Not specified"
+    names = rng.sample(AREAS, rng.randint(1, 4))
+    text = names[0]
+    for name in names[1:]:
+        text += rng.choice(AREA_SEPARATORS) + name
+    return text
+
+
+def generate_notices(entries, seed=0, start=date(2023, 1, 1), days=730):
+    """Yields the text lines of `entries` synthetic notices, each starting with its date line.
+
+    Args:
+        entries (int): Number of notices.
+        seed (int): Random seed; the same arguments always produce the same notices.
+        start (datetime.date): Earliest notice date.
+        days (int): Number of days the notice dates are spread over.
+
+    Returns:
+        generator: One list of lines per notice.
+    """
+    rng = random.Random(seed)
+    for _ in range(entries):
+        day = start + timedelta(days=rng.randrange(days))
+        lines = [day.strftime('%a, %d %b %Y').replace(' 0', ' ', 1), 'UNDERTAKING:']
+        lines.extend(_undertaking(rng))
+        if rng.random() < 0.92:
+            # Some notices have no AREAS AFFECTED block at all
+            lines.extend(['AREAS AFFECTED:', _areas(rng)])
+        yield lines
+
+
+def _render_notice(lines, layout):
+    escaped = [html.escape(line) for line in lines]
+    if layout == 'body':
+        return '<br>\n'.join(escaped) + '<br>'
+    date_line, rest = escaped[0], escaped[1:]
+    notice = f"<p>{date_line}</p>\n<p>{'<br>'.join(rest)}</p>"
+    if layout == 'card-body':
+        return f'<div class="card">\n<div class="card-body">\n{notice}\n</div>\n</div>'
+    return notice
+
+
+def generate_page(entries, layout='p', seed=0, start=date(2023, 1, 1), days=730):
+    """Returns the HTML of a CNN page with `entries` synthetic notices.
+
+    Args:
+        entries (int): Number of notices.
+        layout (str): One of LAYOUTS.
+        seed (int): Random seed.
+        start (datetime.date): Earliest notice date.
+        days (int): Number of days the notice dates are spread over.
+
+    Returns:
+        str: The page HTML.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+    parts = [
+        '<!DOCTYPE html>\n<html>\n<head><title>CNN - Ikeja Electric</title></head>\n<body>',
+        '<nav><a href="/">Home</a> <a href="/cnn/">CNN</a></nav>',
+        '<h2>Customer Notification Network</h2>',
+        '<div class="notices">' if layout != 'body' else '',
+    ]
+    parts.extend(_render_notice(lines, layout)
+                 for lines in generate_notices(entries, seed, start, days))
+    parts.append('</div>' if layout != 'body' else '')
+    parts.append('</body>\n</html>\n')
+    return '\n'.join(parts)
+
+
+# Archive page n covers ARCHIVE_PAGE_DAYS days ending ARCHIVE_PAGE_STEP_DAYS * (n - 1)
+# days before ARCHIVE_END, so neighbouring pages overlap like a real paginated listing.
+ARCHIVE_END = date(2025, 1, 1)
+ARCHIVE_PAGE_DAYS = 45
+ARCHIVE_PAGE_STEP_DAYS = 30
+_PAGE_PATH_PATTERN = re.compile(r"^/cnn/(?:page/(\d+)/?)?$")
+
+
+def archive_page(page, entries, layout='p'):
+    """Returns the HTML of page `page` (1 is the newest) of a synthetic paginated archive."""
+    start = ARCHIVE_END - timedelta(days=ARCHIVE_PAGE_STEP_DAYS * (page - 1) + ARCHIVE_PAGE_DAYS)
+    return generate_page(entries, layout, seed=page, start=start, days=ARCHIVE_PAGE_DAYS)
+
+
+# Notices per day in the live page's stream of notices
+LIVE_NOTICES_PER_DAY = 20
+
+
+def live_page(revision, entries, layout='p', new_per_revision=10):
+    """Returns the HTML of the live CNN page at a revision.
+
+    The page shows the newest `entries` notices of an endless stream; each revision
+    adds `new_per_revision` new notices at the top and drops as many of the oldest, the
+    way the real page changes between scrapes.
+    """
+    newest = revision * new_per_revision + entries
+    notices = []
+    for number in range(newest - 1, newest - entries - 1, -1):
+        day = ARCHIVE_END + timedelta(days=number // LIVE_NOTICES_PER_DAY)
+        notices.extend(generate_notices(1, seed=number, start=day, days=1))
+    parts = [
+        '<!DOCTYPE html>\n<html>\n<head><title>CNN - Ikeja Electric</title></head>\n<body>',
+        '<div class="notices">' if layout != 'body' else '',
+    ]
+    parts.extend(_render_notice(lines, layout) for lines in notices)
+    parts.append('</div>' if layout != 'body' else '')
+    parts.append('</body>\n</html>\n')
+    return '\n'.join(parts)
+
+
+def make_server(port, entries, pages=1, layout='p', host='127.0.0.1', latency=0.0, change_seconds=0.0,
+                new_per_change=10):
+    """Creates a stub CNN server for offline runs; call serve_forever() on the result.
+
+    `/cnn/` serves the newest page and `/cnn/page/<n>/` page n of the archive, for n up to
+    `pages`; anything else is a 404. Responses carry an ETag so conditional GETs get 304s.
+
+    Args:
+        latency (float): Seconds every response is delayed, to mimic a slow origin.
+        change_seconds (float): If set, `/cnn/` is a live page (see `live_page`) that gains
+                                `new_per_change` notices every `change_seconds` seconds.
+    """
+    started = time.monotonic()
+    live_cache = {}
+    live_lock = threading.Lock()
+
+    def newest_page():
+        revision = int((time.monotonic() - started) / change_seconds)
+        with live_lock:
+            if revision not in live_cache:
+                live_cache.clear()
+                live_cache[revision] = live_page(revision, entries, layout, new_per_change).encode('utf-8')
+            return revision, live_cache[revision]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            match = _PAGE_PATH_PATTERN.match(self.path.split('?', 1)[0])
+            page = int(match.group(1) or 1) if match else 0
+            if not 1 <= page <= pages:
+                self.send_error(404)
+                return
+            if page == 1 and change_seconds:
+                revision, body = newest_page()
+            else:
+                revision, body = 0, None
+            etag = f'"{layout}-{entries}-{page}-{revision}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            if body is None:
+                body = archive_page(page, entries, layout).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Writes a synthetic CNN page to stdout, or serves a stub CNN site.")
+    parser.add_argument('entries', type=int, help="number of outage notices (per page)")
+    parser.add_argument('--layout', choices=LAYOUTS, default='p')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--serve', type=int, metavar='PORT', help="serve /cnn/ and /cnn/page/<n>/ on this port")
+    parser.add_argument('--pages', type=int, default=1, help="number of archive pages to serve")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to delay every response")
+    parser.add_argument('--change-seconds', type=float, default=0.0,
+                        help="make /cnn/ a live page that gains new notices this often")
+    args = parser.parse_args()
+    if args.serve:
+        print(f"Serving {args.pages} synthetic CNN page(s) on http://127.0.0.1:{args.serve}/cnn/")
+        make_server(args.serve, args.entries, args.pages, args.layout, latency=args.latency,
+                    change_seconds=args.change_seconds).serve_forever()
+    else:
+        sys.stdout.write(generate_page(args.entries, args.layout, args.seed))
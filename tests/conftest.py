@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+# The app's modules live at the top level of the repository.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Stores default to paths under DATA_DIR, read at import; keep them out of the checkout.
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='ikejacnn-tests-'))
+os.environ.setdefault('RAW_ARCHIVE', '0')
+# The app's background scrape must never reach the real site; nothing listens on port 9.
+os.environ.setdefault('CNN_URL', 'http://127.0.0.1:9/cnn/')
+
+from synthetic import make_server  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+@pytest.fixture
+def stub_origin():
+    """Yields start(entries, pages, **make_server_kwargs), which serves a synthetic.py
+    stub CNN site on a free port and returns its base URL."""
+    servers = []
+
+    def start(entries=20, pages=1, **kwargs):
+        server = make_server(0, entries, pages, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def client():
+    """A Flask test client for the app (imported on first use, with its stores under DATA_DIR)."""
+    import app
+    return app.app.test_client()
@@ -0,0 +1,121 @@
+"""The nested-scan parser cnn_parser.parse_outages replaced, kept as a test oracle.
+
+This is the original scrape_outage_data parse, minus the fetch and debug output. The
+single-pass engine must produce the same rows for any page.
+"""
+import re
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+DATE_PATTERN = re.compile(r"(Mon|Tue|Wed|Thu|Fri|Sat|Sun), \d{1,2} (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) \d{4}")
+UNDERTAKING_KEYWORD_PATTERN = re.compile(r"^UNDERTAKING:$", re.IGNORECASE)
+AREAS_KEYWORD_PATTERN = re.compile(r"^AREAS AFFECTED:$", re.IGNORECASE)
+FEEDER_REASON_PATTERN = re.compile(r"([A-Z0-9\s-]+(?:FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)):\s*(.*)", re.IGNORECASE)
+FEEDER_SIMPLE_PATTERN = re.compile(r"([A-Z0-9_-]+)\s+(?:FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)", re.IGNORECASE)
+
+
+def _lines(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    paragraphs = soup.find_all('p')
+    text_from_elements = []
+    if paragraphs:
+        for p in paragraphs:
+            text_from_elements.append(p.get_text(separator='\n', strip=True))
+    else:
+        card_bodies = soup.find_all('div', class_='card-body')
+        if card_bodies:
+            for cb in card_bodies:
+                for p_tag in cb.find_all('p'):
+                    text_from_elements.append(p_tag.get_text(separator='\n', strip=True))
+        else:
+            text_from_elements.append(soup.body.get_text(separator='\n', strip=True) if soup.body else "")
+    full_text = '\n'.join(filter(None, text_from_elements))
+    return [line.strip() for line in full_text.split('\n') if line.strip()]
+
+
+def parse_records(html):
+    """Returns the rows the original parser produced for a page, as cleaned dicts."""
+    lines = _lines(html)
+    data_entries = []
+    i = 0
+    while i < len(lines):
+        date_match = DATE_PATTERN.search(lines[i])
+        if date_match:
+            current_date_str = date_match.group(0)
+            try:
+                formatted_date = datetime.strptime(current_date_str, "%a, %d %b %Y").strftime("%Y-%m-%d")
+            except ValueError:
+                formatted_date = current_date_str
+            undertaking_text = ""
+            areas_text = ""
+            block_lines = []
+            j = i + 1
+            while j < len(lines) and not DATE_PATTERN.search(lines[j]):
+                block_lines.append(lines[j])
+                j += 1
+
+            k = 0
+            while k < len(block_lines):
+                line_to_check = block_lines[k]
+                if UNDERTAKING_KEYWORD_PATTERN.match(line_to_check) and not undertaking_text:
+                    temp_undertaking_lines = []
+                    k_undertaking = k + 1
+                    while k_undertaking < len(block_lines) and \
+                            not AREAS_KEYWORD_PATTERN.match(block_lines[k_undertaking]) and \
+                            not DATE_PATTERN.search(block_lines[k_undertaking]):
+                        if not UNDERTAKING_KEYWORD_PATTERN.match(block_lines[k_undertaking]):
+                            temp_undertaking_lines.append(block_lines[k_undertaking])
+                        k_undertaking += 1
+                    undertaking_text = " ".join(temp_undertaking_lines).strip()
+                    k = k_undertaking - 1
+                elif AREAS_KEYWORD_PATTERN.match(line_to_check) and not areas_text:
+                    temp_areas_lines = []
+                    k_areas = k + 1
+                    while k_areas < len(block_lines) and \
+                            not DATE_PATTERN.search(block_lines[k_areas]) and \
+                            not UNDERTAKING_KEYWORD_PATTERN.match(block_lines[k_areas]):
+                        if not AREAS_KEYWORD_PATTERN.match(block_lines[k_areas]):
+                            temp_areas_lines.append(block_lines[k_areas])
+                        k_areas += 1
+                    areas_text = " ".join(temp_areas_lines).strip()
+                    k = k_areas - 1
+                k += 1
+            i = j - 1
+
+            if undertaking_text:
+                feeder = "Unknown"
+                reason = undertaking_text
+                status = "Outage"
+                feeder_reason_match = FEEDER_REASON_PATTERN.search(undertaking_text)
+                if feeder_reason_match:
+                    feeder_part = feeder_reason_match.group(1).strip()
+                    reason = feeder_reason_match.group(2).strip()
+                    simple_feeder_match = FEEDER_SIMPLE_PATTERN.search(feeder_part)
+                    if simple_feeder_match:
+                        feeder = simple_feeder_match.group(1).strip()
+                    else:
+                        feeder = feeder_part.split(':')[0].strip()
+                    if "DOWNTIME" in feeder_part.upper(): status = "Downtime"
+                    elif "MAINTENANCE" in feeder_part.upper(): status = "Maintenance"
+                    elif "SHUTDOWN" in feeder_part.upper(): status = "Shutdown"
+                    elif "FAULT" in feeder_part.upper(): status = "Fault"
+                    reason = re.sub(r"^(FAULT|OUTAGE|DOWNTIME|MAINTENANCE|SHUTDOWN)[:\s-]*", "", reason, flags=re.IGNORECASE).strip()
+                elif ':' in undertaking_text and feeder == "Unknown":
+                    parts = undertaking_text.split(':', 1)
+                    potential_feeder = parts[0].strip()
+                    if potential_feeder.isupper() and ' ' not in potential_feeder.split()[0]:
+                        feeder = potential_feeder
+                        reason = parts[1].strip() if len(parts) > 1 else ""
+
+                data_entries.append({
+                    "Date": formatted_date,
+                    "Feeder": (feeder if feeder else "Unknown").strip().upper(),
+                    "Status": status.strip().capitalize(),
+                    "Reason": (reason if reason else "Not specified").strip(),
+                    "Area": (areas_text if areas_text else "Not specified").strip(),
+                })
+        i += 1
+
+    # Rows whose date does not parse were dropped
+    return [entry for entry in data_entries if re.match(r"^\d{4}-\d{2}-\d{2}$", entry["Date"])]
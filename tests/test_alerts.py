@@ -0,0 +1,207 @@
+import socket
+import threading
+
+import pandas as pd
+import pytest
+
+import alerts
+import app
+from alerts import AlertStore, SubscriptionMatcher, check_callback_url, make_sink, normalize_pattern
+from history_store import HistoryStore
+from outage_frame import canonicalize
+
+
+def _page(*rows):
+    return canonicalize(pd.DataFrame(list(rows), columns=['Date', 'Feeder', 'Status', 'Reason', 'Area']))
+
+
+GRA = ('2024-01-02', 'GRA', 'Fault', 'Tree on line', 'Ikeja GRA, Oba Akran')
+OGBA = ('2024-01-02', 'OGBA', 'Fault', 'Tree on line', 'Ogba')
+
+
+def test_feeder_patterns_match_the_word_the_parser_keeps():
+    # cnn_parser turns "IKEJA GRA FAULT: ..." into feeder "GRA"
+    assert normalize_pattern('feeder', 'Ikeja GRA') == 'gra'
+    assert normalize_pattern('feeder', 'agege-2*') == 'agege-2*'
+    assert normalize_pattern('area', ' Magodo  Phase 2. ') == 'magodo phase 2'
+    with pytest.raises(ValueError):
+        normalize_pattern('feeder', '*')
+    for missing in (None, 42, ['Ogba']):
+        with pytest.raises(ValueError):
+            normalize_pattern('area', missing)
+
+    matcher = SubscriptionMatcher([
+        {'id': 1, 'kind': 'feeder', 'pattern': normalize_pattern('feeder', 'IKEJA GRA')},
+        {'id': 2, 'kind': 'area', 'pattern': normalize_pattern('area', 'Oba*')},
+        {'id': 3, 'kind': 'feeder', 'pattern': normalize_pattern('feeder', 'ISOLO')},
+    ])
+    matches = {(position, subscription_id) for position, subscription_id, _ in matcher.match(_page(GRA, OGBA))}
+    assert matches == {(0, 1), (0, 2)}
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1:8940/', 'http://localhost/', 'http://10.1.2.3/', 'http://192.168.0.1/',
+    'http://169.254.169.254/latest/meta-data/', 'http://[::1]/', 'http://[::ffff:127.0.0.1]/',
+    'http://0.0.0.0/', 'http://224.0.0.1/', 'ftp://8.8.8.8/', 'http://8.8.8.8:99999/', 'not a url',
+])
+def test_callback_urls_must_be_public(url):
+    with pytest.raises(ValueError):
+        check_callback_url(url)
+
+
+def test_allow_listed_hosts_skip_the_address_check(monkeypatch):
+    check_callback_url('https://8.8.8.8/hook')
+    monkeypatch.setattr(alerts, 'ALERT_CALLBACK_ALLOW_HOSTS', {'127.0.0.1'})
+    check_callback_url('http://127.0.0.1:8940/')
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(alerts, 'ALERT_CALLBACK_ALLOW_HOSTS', {'127.0.0.1'})
+    return AlertStore(str(tmp_path / 'alerts.db'))
+
+
+@pytest.fixture
+def api(client, store, monkeypatch):
+    monkeypatch.setattr(app, 'ALERT_STORE', store)
+    monkeypatch.setattr(alerts, 'ALERTS_ADMIN_KEY', 'admin-key')
+    return client
+
+
+def _auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _subscribe(api, token, **body):
+    body = {'kind': 'area', 'pattern': 'Ogba', 'callback_url': 'http://127.0.0.1:8940/', **body}
+    return api.post('/api/alerts/subscriptions', json=body, headers=_auth(token))
+
+
+def test_subscription_routes_require_a_token(api, store):
+    assert api.get('/api/alerts/subscriptions').status_code == 401
+    assert api.post('/api/alerts/subscriptions', json={'subscriber': 'ops'}).status_code == 401
+    assert _subscribe(api, 'wrong').status_code == 401
+    store.issue_token('ops')
+    assert api.delete('/api/alerts/subscriptions/1', headers=_auth('wrong')).status_code == 401
+
+
+def test_malformed_subscriptions_are_rejected(api):
+    response = api.post('/api/alerts/subscriptions', json=[{'subscriber': 'ops'}], headers=_auth('admin-key'))
+    assert response.status_code == 400
+    assert 'JSON object' in response.get_json()['error']
+    response = api.post('/api/alerts/subscriptions', headers=_auth('admin-key'),
+                        json={'subscriber': 'ops', 'kind': 'area', 'callback_url': 'http://127.0.0.1:8940/'})
+    assert response.status_code == 400
+    assert 'pattern' in response.get_json()['error']
+    assert api.get('/api/alerts/subscriptions', headers=_auth('admin-key')).get_json() == {'subscriptions': []}
+
+
+def test_subscribers_only_manage_their_own_subscriptions(api, store):
+    ops, noc = store.issue_token('ops'), store.issue_token('noc')
+    response = _subscribe(api, ops)
+    assert response.status_code == 201
+    assert response.get_json()['subscriber'] == 'ops'
+    assert _subscribe(api, noc, subscriber='ops').status_code == 403
+    assert _subscribe(api, noc, callback_url='http://169.254.169.254/').status_code == 400
+    subscription_id = response.get_json()['id']
+
+    assert api.get('/api/alerts/subscriptions', headers=_auth(noc)).get_json() == {'subscriptions': []}
+    [listed] = api.get('/api/alerts/subscriptions', headers=_auth(ops)).get_json()['subscriptions']
+    assert listed['id'] == subscription_id
+    assert api.delete(f'/api/alerts/subscriptions/{subscription_id}', headers=_auth(noc)).status_code == 404
+    assert api.delete(f'/api/alerts/subscriptions/{subscription_id}', headers=_auth(ops)).status_code == 204
+
+    # The admin key acts for any subscriber
+    assert _subscribe(api, 'admin-key', subscriber='noc').status_code == 201
+    listed = api.get('/api/alerts/subscriptions', headers=_auth('admin-key')).get_json()['subscriptions']
+    assert [subscription['subscriber'] for subscription in listed] == ['noc']
+    assert api.delete(f"/api/alerts/subscriptions/{listed[0]['id']}",
+                      headers=_auth('admin-key')).status_code == 204
+
+    # A re-issued token replaces the old one
+    store.issue_token('ops')
+    assert api.get('/api/alerts/subscriptions', headers=_auth(ops)).status_code == 401
+
+
+@pytest.fixture
+def sink():
+    server = make_sink(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _queue(store, tmp_path, count, url):
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    store.add_subscription('ops', 'feeder', 'Ikeja GRA', url)
+    store.process(history)      # The first call only starts the cursor at the end of the history
+    history.merge(_page(*[('2024-01-02', 'GRA', 'Fault', f'Tree on line {n}', 'Ikeja GRA') for n in range(count)]))
+    assert store.process(history) == count
+
+
+def test_alerts_are_posted_in_batches(store, sink, tmp_path, monkeypatch):
+    monkeypatch.setattr(alerts, 'ALERT_BATCH_SIZE', 3)
+    _queue(store, tmp_path, 7, f'http://127.0.0.1:{sink.server_address[1]}/')
+
+    assert store.deliver_due() == {alerts.DELIVERED: 7, 'retry': 0, alerts.FAILED: 0}
+    assert [len(batch['alerts']) for batch in sink.received] == [3, 3, 1]
+    delivered = [alert for batch in sink.received for alert in batch['alerts']]
+    assert len({alert['id'] for alert in delivered}) == 7
+    assert {alert['matched'] for alert in delivered} == {'gra'}
+    assert store.deliver_due() == {alerts.DELIVERED: 0, 'retry': 0, alerts.FAILED: 0}
+
+
+def test_failed_posts_are_retried(store, sink, tmp_path, monkeypatch):
+    monkeypatch.setattr(alerts, 'ALERT_BATCH_SIZE', 2)
+    monkeypatch.setattr(alerts, 'ALERT_MAX_ATTEMPTS', 3)
+    _queue(store, tmp_path, 4, f'http://127.0.0.1:{sink.server_address[1]}/')
+    far_future = 1e12
+
+    sink.fail_rate = 1.0
+    # A failing endpoint gets one attempt per pass; its other batches wait for the retry.
+    assert store.deliver_due() == {alerts.DELIVERED: 0, 'retry': 2, alerts.FAILED: 0}
+    assert sink.attempts == 1
+    assert store.queue_counts() == {alerts.PENDING: 4}
+
+    sink.fail_rate = 0.0
+    assert store.deliver_due(now=far_future) == {alerts.DELIVERED: 4, 'retry': 0, alerts.FAILED: 0}
+    assert sorted(alert['id'] for batch in sink.received for alert in batch['alerts']) == [1, 2, 3, 4]
+
+
+def test_failed_posts_are_given_up_after_the_last_attempt(store, sink, tmp_path, monkeypatch):
+    monkeypatch.setattr(alerts, 'ALERT_MAX_ATTEMPTS', 3)
+    _queue(store, tmp_path, 1, f'http://127.0.0.1:{sink.server_address[1]}/')
+    sink.fail_rate = 1.0
+
+    results = [store.deliver_due(now=1e12) for _ in range(4)]
+    assert [result[alerts.FAILED] for result in results] == [0, 0, 1, 0]
+    assert sink.attempts == 3
+    assert store.queue_counts() == {alerts.FAILED: 1}
+
+
+def test_callbacks_are_checked_again_before_delivery(store, sink, tmp_path, monkeypatch):
+    _queue(store, tmp_path, 1, f'http://127.0.0.1:{sink.server_address[1]}/')
+    monkeypatch.setattr(alerts, 'ALERT_CALLBACK_ALLOW_HOSTS', set())
+
+    assert store.deliver_due()['retry'] == 1
+    assert sink.attempts == 0
+
+
+def test_rebinding_hosts_cannot_reach_private_addresses(store, sink, tmp_path, monkeypatch):
+    # The host resolves to a public address for the checks, then to the local sink.
+    resolve = socket.getaddrinfo
+    answers = ['93.184.216.34', '93.184.216.34', '127.0.0.1']
+
+    def rebinding(host, port, *args, **kwargs):
+        if host != 'rebind.example':
+            return resolve(host, port, *args, **kwargs)
+        address = answers.pop(0) if len(answers) > 1 else answers[0]
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', (address, port))]
+
+    monkeypatch.setattr(socket, 'getaddrinfo', rebinding)
+    _queue(store, tmp_path, 1, f'http://rebind.example:{sink.server_address[1]}/')
+
+    result = store.deliver_due()
+    assert result['retry'] == 1
+    assert sink.attempts == 0
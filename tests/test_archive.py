@@ -0,0 +1,67 @@
+import os
+import shutil
+
+import pytest
+
+import archive
+from cnn_parser import fetch_page, parse_outages
+from history_store import HistoryStore
+
+
+@pytest.fixture
+def archive_dir(monkeypatch):
+    """Turns archiving on, into an empty ARCHIVE_DIR (under the tests' DATA_DIR)."""
+    shutil.rmtree(archive.ARCHIVE_DIR, ignore_errors=True)
+    monkeypatch.setattr(archive, 'ARCHIVE_ENABLED', True)
+    yield archive.ARCHIVE_DIR
+    shutil.rmtree(archive.ARCHIVE_DIR, ignore_errors=True)
+
+
+def test_fetched_pages_are_archived_once_in_fetch_order(stub_origin, archive_dir):
+    base = stub_origin(entries=10, pages=3)
+    bodies = [fetch_page(f'{base}/cnn/page/{page}/').content for page in (2, 1, 2, 3)]
+
+    pages = archive.archived_pages(archive_dir)
+
+    assert [archive.load(path) for path in pages] == [bodies[0], bodies[1], bodies[3]]
+
+
+def test_reparse_rebuilds_the_history_of_a_crawl(stub_origin, archive_dir, tmp_path):
+    base = stub_origin(entries=25, pages=4)
+    live = HistoryStore(str(tmp_path / 'live.db'))
+    for page in range(1, 5):
+        live.merge(parse_outages(fetch_page(f'{base}/cnn/page/{page}/').content))
+
+    rebuilt = HistoryStore(str(tmp_path / 'rebuilt.db'))
+    stats = archive.reparse(archive.archived_pages(archive_dir), rebuilt, processes=2, batch_pages=3)
+
+    assert (stats['pages'], stats['failed'], stats['rows']) == (4, 0, 100)
+    expected, _ = live.rows_since(0)
+    actual, _ = rebuilt.rows_since(0)
+    assert stats['inserted'] == len(expected)
+    assert actual.reset_index(drop=True).equals(expected.reset_index(drop=True))
+    # Re-parsing again adds nothing
+    assert archive.reparse(archive.archived_pages(archive_dir), rebuilt, processes=1)['inserted'] == 0
+
+
+def test_corrupt_page_is_reported_and_skipped(stub_origin, archive_dir, tmp_path):
+    base = stub_origin(entries=10, pages=2)
+    fetch_page(f'{base}/cnn/page/1/')
+    fetch_page(f'{base}/cnn/page/2/')
+    pages = archive.archived_pages(archive_dir)
+    with open(pages[0], 'wb') as f:
+        f.write(b'not gzip')
+
+    stats = archive.reparse(pages, HistoryStore(str(tmp_path / 'history.db')), processes=1)
+
+    assert (stats['pages'], stats['failed'], stats['rows']) == (1, 1, 10)
+
+
+def test_pages_outside_the_index_come_last(archive_dir):
+    first = archive.store(b'<p>first</p>', 'http://a/', archive_dir)
+    os.remove(os.path.join(archive_dir, archive.INDEX_NAME))
+    second = archive.store(b'<p>second</p>', 'http://b/', archive_dir)
+
+    pages = archive.archived_pages(archive_dir)
+
+    assert pages == [archive.page_path(second, archive_dir), archive.page_path(first, archive_dir)]
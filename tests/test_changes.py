@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+import app
+from history_store import HistoryStore
+from outage_frame import canonicalize
+from page_diff import MODIFIED, NEW, RESTORED, diff_pages
+
+
+def _page(*rows):
+    return canonicalize(pd.DataFrame(list(rows), columns=['Date', 'Feeder', 'Status', 'Reason', 'Area']))
+
+
+OGBA = ('2024-01-02', 'OGBA', 'Fault', 'Tree on line', 'Ogba')
+ALLEN = ('2024-01-02', 'ALLEN', 'Outage', 'Line fault', 'Allen Avenue')
+KETU = ('2024-01-03', 'KETU', 'Downtime', 'Cable fault', 'Ketu')
+
+
+def _kinds(changes):
+    return sorted((change['change'], change['Feeder']) for change in changes)
+
+
+def test_identical_pages_have_no_changes():
+    assert diff_pages(_page(OGBA, ALLEN), _page(ALLEN, OGBA)) == []
+
+
+def test_new_restored_and_modified_notices():
+    fixed = ('2024-01-02', 'OGBA', 'Fault', 'Tree on line', 'Ogba; Ikeja')
+    changes = diff_pages(_page(OGBA, ALLEN), _page(fixed, KETU))
+
+    assert _kinds(changes) == [(MODIFIED, 'OGBA'), (NEW, 'KETU'), (RESTORED, 'ALLEN')]
+    [modified] = [change for change in changes if change['change'] == MODIFIED]
+    assert modified['Area'] == 'Ogba; Ikeja'
+    assert modified['previous'] == {'Area': 'Ogba'}
+
+
+def test_duplicate_notices_are_counted():
+    assert _kinds(diff_pages(_page(OGBA), _page(OGBA, OGBA))) == [(NEW, 'OGBA')]
+    assert _kinds(diff_pages(_page(OGBA, OGBA), _page(OGBA))) == [(RESTORED, 'OGBA')]
+
+
+def test_first_page_is_all_new():
+    assert _kinds(diff_pages(None, _page(OGBA, KETU))) == [(NEW, 'KETU'), (NEW, 'OGBA')]
+
+
+@pytest.fixture
+def history(tmp_path):
+    return HistoryStore(str(tmp_path / 'history.db'))
+
+
+def _record(history, version, *rows):
+    page = _page(*rows)
+    history.record_changes(version, diff_pages(history.last_page(), page), page)
+
+
+def test_changes_since_returns_every_later_version(history):
+    _record(history, 1, OGBA)
+    _record(history, 2, OGBA, ALLEN)
+    _record(history, 3, OGBA, ALLEN)       # Quiet version: nothing changed
+    _record(history, 4, ALLEN, KETU)
+
+    latest, changes, resync = history.changes_since(1)
+
+    assert (latest, resync) == (4, False)
+    assert [(change['version'], change['change'], change['Feeder']) for change in changes] == [
+        (2, NEW, 'ALLEN'), (4, NEW, 'KETU'), (4, RESTORED, 'OGBA')]
+    assert history.changes_since(4) == (4, [], False)
+
+
+def test_missing_version_forces_a_resync(history):
+    _record(history, 1, OGBA)
+    _record(history, 3, OGBA, KETU)        # Version 2 was never recorded
+
+    assert history.changes_since(1) == (3, [], True)
+    assert history.changes_since(2)[2] is False
+
+
+def test_since_ahead_of_the_ring_forces_a_resync(history):
+    _record(history, 1, OGBA)
+    assert history.changes_since(5) == (1, [], True)
+
+
+def test_versions_evicted_from_the_ring_force_a_resync(history, monkeypatch):
+    monkeypatch.setattr('history_store.CHANGE_RING_VERSIONS', 3)
+    for version in range(1, 7):
+        # KETU appears on even versions and is taken down on odd ones
+        rows = (OGBA, KETU) if version % 2 == 0 else (OGBA,)
+        _record(history, version, *rows)
+
+    assert history.changes_since(2)[2] is True
+    latest, changes, resync = history.changes_since(3)
+    assert (latest, len(changes), resync) == (6, 3, False)
+
+
+def test_changes_endpoint(client, history, monkeypatch):
+    monkeypatch.setattr(app, 'HISTORY_STORE', history)
+    _record(history, 1, OGBA)
+    _record(history, 2, OGBA, KETU)
+
+    assert client.get('/api/changes').status_code == 400
+    assert client.get('/api/changes?since=-1').status_code == 400
+    body = client.get('/api/changes?since=1').get_json()
+    assert (body['version'], body['resync'], _kinds(body['changes'])) == (2, False, [(NEW, 'KETU')])
+    assert client.get('/api/changes?since=7').get_json()['resync'] is True
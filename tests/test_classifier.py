@@ -0,0 +1,74 @@
+import random
+
+import pandas as pd
+import pytest
+
+from classifier import (CAUSE_KEYWORDS, OTHER, UNSPECIFIED, CauseMatcher, classify_reasons,
+                        normalize_reason)
+
+
+def _brute_force(reason):
+    """Tries each category's keywords in priority order, anchored at the start of a word."""
+    text = normalize_reason(reason)
+    if text.strip() in ('', 'not specified', 'nil', 'none', 'n a'):
+        return UNSPECIFIED
+    for category, words in CAUSE_KEYWORDS:
+        if any(' ' + normalize_reason(word).strip() in text for word in words):
+            return category
+    return OTHER
+
+
+# Keywords, words that contain a keyword not at their start, and filler
+_VOCABULARY = sorted({word for _, words in CAUSE_KEYWORDS for word in words} | {
+    'street', 'retreat', 'default', 'faulty', 'frain', 'drain', 'agrid', 'upgrade', 'poles', 'repole',
+    'cablet', 'windy', 'overload', 'shedding', 'allocation', 'on', 'the', 'at', '11kv', '33kv', 'feeder',
+    'n/a', 'nil', 'none', 'not', 'specified', '', 'ikeja', 'line', 'earth', 'load',
+})
+_JOINERS = [' ', '  ', '-', '/', ', ', '.', '(', ') ', '_', '\t']
+
+
+def _random_reasons(count, seed):
+    rng = random.Random(seed)
+    reasons = []
+    for _ in range(count):
+        words = [rng.choice(_VOCABULARY) for _ in range(rng.randint(1, 5))]
+        words = [word.upper() if rng.random() < 0.2 else word for word in words]
+        reason = words[0]
+        for word in words[1:]:
+            reason += rng.choice(_JOINERS) + word
+        reasons.append(reason)
+    return reasons
+
+
+@pytest.mark.parametrize('reason, category', [
+    ('Vandalized cable on 11kV line', 'Vandalism'),       # Vandalism outranks equipment
+    ('Tree fell on line, line fault', 'Vegetation'),
+    ('Fault on street light', 'Line fault'),                # "tree" inside "street" is not a word start
+    ('Load-shedding (TCN)', 'Load shedding'),
+    ('Earth fault', 'Line fault'),
+    ('Faulty breaker', 'Equipment failure'),
+    ('DEFAULT', OTHER),
+    ('N/A', UNSPECIFIED),
+    ('  ', UNSPECIFIED),
+])
+def test_known_reasons(reason, category):
+    assert CauseMatcher().classify(reason) == category == _brute_force(reason)
+
+
+def test_matcher_agrees_with_a_brute_force_scan():
+    matcher = CauseMatcher()
+    reasons = _random_reasons(5000, seed=16)
+    mismatches = [(reason, matcher.classify(reason), _brute_force(reason))
+                  for reason in reasons if matcher.classify(reason) != _brute_force(reason)]
+    assert mismatches == []
+    # The sample exercises every category
+    assert {_brute_force(reason) for reason in reasons} == {category for category, _ in CAUSE_KEYWORDS} | {
+        OTHER, UNSPECIFIED}
+
+
+def test_classify_reasons_maps_every_row():
+    reasons = _random_reasons(500, seed=17) + [None]
+    for column in (pd.Series(reasons, dtype='category'), pd.Series(reasons, dtype=object)):
+        causes = classify_reasons(column)
+        assert causes.tolist() == [_brute_force(reason) if reason is not None else UNSPECIFIED
+                                   for reason in reasons]
@@ -0,0 +1,60 @@
+import glob
+import gzip
+import os
+
+import pytest
+
+from cnn_parser import parse_outages
+from conftest import FIXTURES
+from outage_frame import date_strings
+from reference_parser import parse_records
+
+PAGES = sorted(glob.glob(os.path.join(FIXTURES, 'cnn', '*.html')) +
+               glob.glob(os.path.join(FIXTURES, 'cnn', '*.html.gz')))
+
+
+def _read(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        return f.read()
+
+
+def _records(df):
+    if df.empty:
+        return []
+    df = df.assign(Date=date_strings(df['Date']))
+    return df[['Date', 'Feeder', 'Status', 'Reason', 'Area']].astype(str).to_dict(orient='records')
+
+
+@pytest.mark.parametrize('path', PAGES, ids=os.path.basename)
+def test_fixture_matches_reference_parser(path):
+    html = _read(path)
+    expected = parse_records(html)
+    assert expected, "fixture should contain notices"
+    assert _records(parse_outages(html)) == expected
+
+
+def test_block_element_inside_paragraph_keeps_areas():
+    html = "<p>Mon, 1 Jan 2024<br>UNDERTAKING:<br>OGBA FAULT: x<div>AREAS AFFECTED:</div>Ikeja</p>"
+    [row] = _records(parse_outages(html))
+    assert row['Area'] == 'Ikeja'
+    assert row['Reason'] == 'x'
+
+
+def test_table_inside_paragraph_does_not_move_areas_into_reason():
+    html = ("<p>Mon, 1 Jan 2024<br>UNDERTAKING:<br>OGBA FAULT: x"
+            "<table><tr><td>AREAS AFFECTED:</td></tr></table>Ikeja</p>")
+    [row] = _records(parse_outages(html))
+    assert (row['Reason'], row['Area']) == ('x', 'Ikeja')
+
+
+def test_multi_word_feeder_keeps_last_word():
+    html = "<p>Mon, 1 Jan 2024</p><p>UNDERTAKING:<br>IKEJA GRA FAULT: x<br>AREAS AFFECTED:<br>Ikeja GRA</p>"
+    [row] = _records(parse_outages(html))
+    assert row['Feeder'] == 'GRA'
+
+
+def test_page_without_notices_is_empty():
+    df = parse_outages("<html><body><p>No notices today.</p></body></html>")
+    assert df.empty
+    assert list(df.columns) == ['Date', 'Feeder', 'Status', 'Reason', 'Area']
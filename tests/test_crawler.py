@@ -0,0 +1,76 @@
+import socket
+import time
+
+import pytest
+
+import cnn_parser
+from crawler import Checkpoint, HostRateLimiter, crawl, page_urls
+from history_store import HistoryStore
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(cnn_parser, 'BACKOFF_BASE_SECONDS', 0.0)
+
+
+def _crawl(urls, history, checkpoint):
+    return crawl(urls, history, checkpoint, concurrency=3, rate=0, processes=1)
+
+
+def test_crawl_merges_every_page_and_checkpoints(stub_origin, tmp_path):
+    base = stub_origin(entries=30, pages=4)
+    urls = page_urls(base + '/cnn/page/{page}/', 1, 5)
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    checkpoint = Checkpoint(str(tmp_path / 'crawl.json'))
+
+    stats = _crawl(urls, history, checkpoint)
+
+    assert stats['pages'] == 4
+    assert stats['missing'] == 1          # page 5 is a 404
+    assert stats['failed'] == 0
+    assert stats['rows'] == 4 * 30
+    # Neighbouring archive pages overlap, so not every row is new
+    assert 0 < stats['inserted'] <= stats['rows']
+    assert len(history.rows_since(0)[0]) == stats['inserted']
+    assert set(Checkpoint(checkpoint.path).done) == set(urls)
+
+
+def test_resumed_crawl_skips_finished_pages(stub_origin, tmp_path):
+    base = stub_origin(entries=10, pages=3)
+    urls = page_urls(base + '/cnn/page/{page}/', 1, 3)
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    path = str(tmp_path / 'crawl.json')
+    first = _crawl(urls[:2], history, Checkpoint(path))
+
+    stats = _crawl(urls, history, Checkpoint(path))
+
+    assert first['pages'] == 2
+    assert (stats['skipped'], stats['pages']) == (2, 1)
+    again = _crawl(urls, history, Checkpoint(path))
+    assert (again['skipped'], again['pages'], again['inserted']) == (3, 0, 0)
+
+
+def test_failed_pages_are_not_checkpointed(stub_origin, tmp_path, monkeypatch):
+    monkeypatch.setattr(cnn_parser, 'FETCH_RETRIES', 0)
+    base = stub_origin(entries=10, pages=1)
+    with socket.socket() as sock:
+        # A port nothing listens on
+        sock.bind(('127.0.0.1', 0))
+        dead = f"http://127.0.0.1:{sock.getsockname()[1]}/cnn/page/1/"
+    checkpoint = Checkpoint(str(tmp_path / 'crawl.json'))
+
+    stats = _crawl([base + '/cnn/page/1/', dead], HistoryStore(str(tmp_path / 'history.db')), checkpoint)
+
+    assert (stats['pages'], stats['failed']) == (1, 1)
+    assert dead not in checkpoint
+    assert base + '/cnn/page/1/' in checkpoint
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    limiter = HostRateLimiter(20)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait('http://a.example/cnn/page/1/')
+    limiter.wait('http://b.example/cnn/page/1/')
+    # Four intervals of 50ms for host a; host b has its own slot
+    assert 0.19 <= time.monotonic() - start < 0.5
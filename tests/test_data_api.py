@@ -0,0 +1,101 @@
+import json
+
+import pandas as pd
+import pytest
+
+import app
+from cnn_parser import parse_outages
+from refresher import Snapshot
+from synthetic import generate_page
+
+
+@pytest.fixture
+def frame():
+    frame = parse_outages(generate_page(200, seed=5))
+    # History row ids, with gaps like after a compaction
+    frame.index = pd.Index([3 * n + 10 for n in range(len(frame))], name='id')
+    return frame
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    def serve(frame):
+        snapshot = Snapshot(frame, 1)
+        monkeypatch.setattr(app, 'get_snapshot', lambda: snapshot)
+    return serve
+
+
+def _pages(client, limit):
+    rows, cursor, pages = [], None, 0
+    while True:
+        url = f'/api/data?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(url).get_json()
+        rows += body['data']
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            return rows, pages, body['total']
+
+
+def test_cursor_pages_cover_every_row_once(client, frame, serve):
+    serve(frame)
+    everything = client.get('/api/data').get_json()
+    rows, pages, total = _pages(client, 30)
+
+    assert rows == everything
+    assert total == len(frame)
+    assert pages == -(-len(frame) // 30)
+
+
+def test_cursors_survive_removed_rows(client, frame, serve):
+    serve(frame)
+    first = client.get('/api/data?limit=50').get_json()
+    # The next snapshot lost the oldest rows (e.g. compacted away)
+    serve(frame.iloc[20:])
+    second = client.get(f"/api/data?limit=50&cursor={first['next_cursor']}").get_json()
+
+    assert second['data'] == client.get('/api/data').get_json()[30:80]
+
+
+def test_fields_are_projected(client, frame, serve):
+    serve(frame)
+    rows = client.get('/api/data?fields=Feeder, Date').get_json()
+    assert [list(row) for row in rows[:1]] == [['Feeder', 'Date']]
+    assert [row['Feeder'] for row in rows] == frame['Feeder'].astype(str).tolist()
+
+    response = client.get('/api/data?fields=Feeder,Voltage')
+    assert response.status_code == 400
+    assert 'Voltage' in response.get_json()['error']
+
+
+def test_filters_match_the_frame(client, frame, serve):
+    serve(frame)
+    feeder = frame['Feeder'].value_counts().index[0]
+    status = frame['Status'].iloc[0]
+    dates = frame['Date'].sort_values()
+    date_from, date_to = dates.iloc[len(dates) // 4], dates.iloc[3 * len(dates) // 4]
+    area = frame['Area'].iloc[0].split(',')[0][1:5]
+
+    query = (f'from={date_from:%Y-%m-%d}&to={date_to:%Y-%m-%d}&feeder={feeder.lower()}'
+             f'&status={status.upper()}&fields=Date')
+    expected = frame[(frame['Date'] >= date_from) & (frame['Date'] <= date_to)
+                     & (frame['Feeder'] == feeder) & (frame['Status'] == status)]
+    assert len(expected) > 0
+    assert len(client.get(f'/api/data?{query}').get_json()) == len(expected)
+
+    rows = client.get(f'/api/data?area={area}&fields=Area').get_json()
+    assert 0 < len(rows) < len(frame)
+    assert [row['Area'] for row in rows] == frame['Area'][frame['Area'].str.contains(area, case=False)].tolist()
+
+    assert client.get('/api/data?from=2024-13-01').status_code == 400
+    assert client.get('/api/data?limit=5&cursor=not-a-cursor').status_code == 400
+
+
+def test_ndjson_streams_the_same_rows(client, frame, serve, monkeypatch):
+    serve(frame)
+    monkeypatch.setattr(app, 'STREAM_CHUNK_ROWS', 7)
+    response = client.get('/api/data?format=ndjson&fields=Date,Feeder,Reason')
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == client.get('/api/data?fields=Date,Feeder,Reason').get_json()
@@ -0,0 +1,114 @@
+import datetime
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import pytest
+
+import app
+from export import FORMATS as EXPORT_FORMATS, ExportStore
+from outage_frame import canonicalize
+
+
+def _frame():
+    rows = [(f'2024-01-{day:02d}', 'OGBA', 'Fault', 'Tree on line', 'Ogba') for day in range(1, 21)]
+    # Enough distinct feeders that February's categories need wider dictionary indices
+    rows += [(f'2024-02-{n % 28 + 1:02d}', f'F{n}', 'Outage', f'Reason {n}', f'Area {n}') for n in range(300)]
+    rows += [(f'2024-03-{day:02d}', 'KETU', 'Downtime', 'Cable fault', 'Ketu') for day in range(1, 11)]
+    return canonicalize(pd.DataFrame(rows, columns=['Date', 'Feeder', 'Status', 'Reason', 'Area']))
+
+
+@pytest.fixture
+def exports(tmp_path):
+    store = ExportStore(str(tmp_path / 'export'))
+    store.update(_frame(), 1)
+    return store
+
+
+def _read(format, data):
+    if format == 'csv':
+        return pa_csv.read_csv(io.BytesIO(data))
+    if format == 'arrow':
+        return pa.ipc.open_stream(data).read_all()
+    return pq.read_table(io.BytesIO(data))
+
+
+@pytest.mark.parametrize('format', ['csv', 'arrow', 'parquet'])
+def test_stream_returns_the_rows_in_range(exports, format):
+    data = b''.join(exports.stream(format, datetime.date(2024, 1, 15), datetime.date(2024, 3, 5), batch_rows=64))
+    table = _read(format, data)
+
+    assert table.num_rows == 6 + 300 + 5
+    feeders = table.column('Feeder').to_pylist()
+    assert feeders[:6] == ['OGBA'] * 6 and feeders[-5:] == ['KETU'] * 5
+    assert set(feeders[6:-5]) == {f'F{n}' for n in range(300)}
+
+
+@pytest.mark.parametrize('format', ['csv', 'arrow', 'parquet'])
+def test_empty_range_still_has_the_schema(exports, format):
+    table = _read(format, b''.join(exports.stream(format, datetime.date(2030, 1, 1))))
+
+    assert table.num_rows == 0
+    assert {'Date', 'Feeder', 'Area'} <= set(table.column_names)
+
+
+def test_stream_writes_each_month_before_reading_the_next(exports, monkeypatch):
+    events = []
+    read = ExportStore._read
+    monkeypatch.setattr(ExportStore, '_read', lambda self, partition: events.append('read') or read(self, partition))
+
+    for _ in exports.stream('arrow', batch_rows=1000):
+        events.append('chunk')
+
+    # Each month is written out before the next one is read
+    assert events.count('read') == 3
+    reads = [position for position, event in enumerate(events) if event == 'read']
+    assert all(events[position + 1] == 'chunk' for position in reads)
+
+
+@pytest.fixture
+def api(client, exports, monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_STORE', exports)
+    return client
+
+
+def test_a_whole_month_is_sent_from_disk(api, exports):
+    response = api.get('/api/export?from=2024-02-01&to=2024-02-29')
+
+    assert response.status_code == 200
+    assert response.mimetype == EXPORT_FORMATS['parquet'][0]
+    assert 'outages-2024-02-01-2024-02-29.parquet' in response.headers['Content-Disposition']
+    path = exports.partition_file(datetime.date(2024, 2, 1), datetime.date(2024, 2, 29), 'parquet')
+    with open(path, 'rb') as f:
+        assert response.get_data() == f.read()
+
+
+def test_streamed_exports_keep_the_column_types(api):
+    response = api.get('/api/export?format=arrow&from=2024-01-11')
+    table = pa.ipc.open_stream(response.get_data()).read_all()
+
+    assert table.num_rows == 10 + 300 + 10
+    assert pa.types.is_timestamp(table.schema.field('Date').type)
+    assert pa.types.is_dictionary(table.schema.field('Feeder').type)
+    assert response.headers['X-Export-Version'] == '1'
+
+
+def test_exports_are_revalidated_until_the_next_version(api, exports):
+    etag = api.get('/api/export?format=csv&to=2024-01-31').headers['ETag']
+    assert api.get('/api/export?format=csv&to=2024-01-31', headers={'If-None-Match': etag}).status_code == 304
+    assert api.get('/api/export?format=csv', headers={'If-None-Match': etag}).status_code == 200
+
+    exports.update(_frame(), 2)
+    assert api.get('/api/export?format=csv&to=2024-01-31', headers={'If-None-Match': etag}).status_code == 200
+
+
+@pytest.mark.parametrize('query', ['format=xlsx', 'from=2024-02-30', 'to=yesterday'])
+def test_invalid_export_requests_are_rejected(api, query):
+    assert api.get(f'/api/export?{query}').status_code == 400
+
+
+def test_nothing_to_export_yet(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_STORE', ExportStore(str(tmp_path / 'empty')))
+    assert client.get('/api/export').status_code == 503
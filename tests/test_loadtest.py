@@ -0,0 +1,18 @@
+import pytest
+
+import loadtest
+
+pytest.importorskip('gunicorn')
+pytest.importorskip('gevent')
+
+
+def test_short_run_under_gunicorn():
+    """Boots the app under gunicorn (gunicorn.conf.py: preload, gevent) against the stub origin."""
+    report = loadtest.run(levels=(1, 4), duration=2, entries=200, change_seconds=2, workers=2)
+
+    assert report["seconds_to_ready"] < loadtest.READY_TIMEOUT_SECONDS
+    for level in report["levels"]:
+        assert level["requests"] > 0
+        assert level["errors"] == 0, level["error_kinds"]
+        assert set(level["by_kind"]) == set(loadtest.DEFAULT_MIX)
+        assert level["memory"]["workers"] == 2
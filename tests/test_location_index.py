@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from analysis import filter_rows, get_location_data
+from location_index import LocationIndex
+from outage_frame import canonicalize
+from refresher import Snapshot
+
+AREAS = [
+    'Ikeja, Magodo', 'Magodo Phase 2; Ikeja GRA', 'Ogba & Agidingbi', 'Opebi,  Allen Avenue',
+    'Allen Avenue', 'Ojodu-Berger (part)', 'Not specified', 'Oba Akran\nIkeja', 'ALAUSA, ogba',
+]
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rows = [('2024-01-02', f'F{n}', 'Fault', 'Tree on line', area) for n, area in enumerate(AREAS * 3)]
+    return canonicalize(pd.DataFrame(rows, columns=['Date', 'Feeder', 'Status', 'Reason', 'Area']))
+
+
+@pytest.mark.parametrize('query', [
+    'ja', 'ja, mag', 'Ikeja', 'IKEJA GRA', 'o', 'ob', 'gra', 'magodo phase', 'Phase 2; Ikeja',
+    'ogba &', 'Avenue', 'Opebi,  Allen', 'Opebi, Allen', '(part)', 'Berger', 'specified',
+    'Akran\nIk', 'a, o', ', ', 'Lekki', 'Ikeja; Magodo',
+])
+def test_index_lookup_matches_the_scan(frame, query):
+    index = LocationIndex(frame)
+    scanned = get_location_data(frame, query)
+    assert get_location_data(frame, query, index).index.tolist() == scanned.index.tolist()
+
+    positions = filter_rows(frame, area=query, index=index)
+    assert np.array_equal(positions, filter_rows(frame, area=query))
+
+
+def test_queries_span_locations(frame):
+    index = LocationIndex(frame)
+    assert set(frame['Area'].iloc[index.lookup('ja')]) == {'Ikeja, Magodo', 'Magodo Phase 2; Ikeja GRA',
+                                                           'Oba Akran\nIkeja'}
+    assert set(frame['Area'].iloc[index.lookup('ja, mag')]) == {'Ikeja, Magodo'}
+
+
+def test_short_suggestions_match_anywhere_in_the_name(frame):
+    suggestions = [suggestion['location'] for suggestion in LocationIndex(frame).suggest('ja')]
+    assert suggestions == ['Ikeja', 'Ikeja GRA']
+
+
+def test_dropdown_locations_come_from_the_suggestions(client, frame, monkeypatch):
+    monkeypatch.setattr(app, 'get_snapshot', lambda: Snapshot(frame, 1))
+    assert 'all_locations' not in client.get('/api/outage-summary').get_json()
+
+    # Without a query: the locations with the most outages, ties alphabetically
+    suggestions = client.get('/api/locations/suggest?limit=4').get_json()['suggestions']
+    assert [(suggestion['location'], suggestion['count']) for suggestion in suggestions] == [
+        ('Allen Avenue', 6), ('Ikeja', 6), ('Ogba', 6), ('Agidingbi', 3)]
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+import reliability
+from cnn_parser import parse_outages
+from outage_frame import canonicalize
+from refresher import Snapshot
+from synthetic import generate_page
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    snapshot = Snapshot(parse_outages(generate_page(300, seed=3)), 1)
+    monkeypatch.setattr(app, 'get_snapshot', lambda: snapshot)
+    return snapshot
+
+
+def test_limit_returns_the_worst_feeders(client, snapshot):
+    everything = client.get('/api/feeders/reliability?sort=total_outages').get_json()
+    worst = client.get('/api/feeders/reliability?sort=total_outages&limit=3').get_json()
+
+    assert worst['count'] == 3
+    assert worst['feeders'] == everything['feeders'][:3]
+    totals = [feeder['total_outages'] for feeder in everything['feeders']]
+    assert totals == sorted(totals, reverse=True)
+    # Every outage of a known feeder is counted once
+    known = snapshot.frame['Feeder'].astype(str) != 'UNKNOWN'
+    assert sum(totals) == int(known.sum())
+
+
+@pytest.mark.parametrize('url', [
+    '/api/feeders/reliability?limit=-1',
+    '/api/feeders/reliability?limit=0',
+    '/api/feeders/reliability?limit=abc',
+    '/api/data?limit=abc',
+    '/api/data?limit=-5',
+    '/api/data?limit=2.5',
+    '/api/locations/suggest?q=ik&limit=x',
+])
+def test_invalid_limit_is_rejected(client, snapshot, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert 'limit' in response.get_json()['error']
+
+
+def test_data_limit_is_capped(client, snapshot):
+    body = client.get(f'/api/data?limit={app.MAX_PAGE_SIZE * 10}').get_json()
+    assert body['count'] == len(snapshot.frame)
+    assert client.get('/api/data?limit=7').get_json()['count'] == 7
+
+
+def _outages(*days, feeder='OGBA'):
+    rows = [(day, feeder, 'Fault', f'Tree on line {n}', 'Ogba') for n, day in enumerate(days)]
+    return canonicalize(pd.DataFrame(rows, columns=['Date', 'Feeder', 'Status', 'Reason', 'Area']))
+
+
+def test_windows_end_on_the_snapshot_day():
+    published = datetime(2024, 3, 31, 12).timestamp()
+    snapshot = Snapshot(_outages('2024-02-20', '2024-03-21', '2024-03-21'), 1, created_at=published)
+
+    payload = app.reliability_payload(snapshot)
+    assert payload['as_of'] == '2024-03-31'
+    [feeder] = payload['feeders'].to_dict('records')
+    assert (feeder['outages_7d'], feeder['outages_30d'], feeder['outages_90d']) == (0, 2, 3)
+    assert feeder['days_since_last_outage'] == 10
+    assert feeder['last_outage'] == '2024-03-21'
+
+
+def test_extending_grows_the_matrix_in_place():
+    days = [str(day.date()) for day in pd.date_range('2024-01-01', periods=60)]
+    frame = pd.concat([_outages(*days[:40]), _outages(*days[::3], feeder='KETU')], ignore_index=True)
+    frame = frame.sort_values('Date', kind='stable', ignore_index=True)
+
+    table = reliability.ReliabilityTable.from_frame(frame.iloc[:5])
+    buffers = [table._buffer]
+    for end in range(10, len(frame) + 5, 5):
+        table = table.extend(frame.iloc[end - 5:end])
+        buffers.append(table._buffer)
+    table = table.extend(frame.iloc[:0], through=np.datetime64('2024-03-15'))
+    buffers.append(table._buffer)
+    # 12 extensions over 75 days only needed three larger buffers
+    assert len(buffers) == 13 and len(set(map(id, buffers))) == 4
+    buffer = table._buffer
+
+    expected = reliability.ReliabilityTable.from_frame(frame, through=np.datetime64('2024-03-15'))
+    assert table.rows == len(frame)
+    assert table.as_of == np.datetime64('2024-03-15')
+    pd.testing.assert_frame_equal(table.metrics(), expected.metrics())
+
+    # Outages before the first day need a new buffer
+    earlier = table.extend(_outages('2023-12-25', feeder='ISOLO'))
+    assert earlier._buffer is not buffer
+    assert int(earlier.counts.sum()) == int(expected.counts.sum()) + 1
@@ -0,0 +1,133 @@
+import io
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow.csv as pa_csv
+import pytest
+
+import app
+import pipeline
+import reliability
+from export import ExportStore
+from history_store import HistoryStore
+from outage_frame import COUNT_COLUMN, MONTHLY_COLUMN, canonicalize
+from refresher import Snapshot
+from retention import RetentionPolicy
+from snapshot_store import SnapshotStore
+
+TODAY = date.today()
+
+
+def _month(months_ago):
+    """The first day of the month `months_ago` months before this one."""
+    day = TODAY.replace(day=1)
+    for _ in range(months_ago):
+        day = (day - timedelta(days=1)).replace(day=1)
+    return day
+
+
+def _rows(day, count, feeder='OGBA', reason='Tree on line', area='Ogba'):
+    return canonicalize(pd.DataFrame(
+        [(day.isoformat(), feeder, 'Fault', f'{reason} {n}', f'{area} {n}') for n in range(count)],
+        columns=['Date', 'Feeder', 'Status', 'Reason', 'Area']))
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    """(history, exports, build), where build() runs one writer poll without scraping."""
+    monkeypatch.setattr(pipeline, '_scrape_due', lambda store: False)
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    exports = ExportStore(str(tmp_path / 'export'))
+    snapshots = SnapshotStore(str(tmp_path / 'snapshots'))
+    policy = RetentionPolicy(hot_days=60, daily_days=365, pass_seconds=0)
+
+    def build():
+        return pipeline.build_snapshot(snapshots, history, None, exports, None, policy)
+
+    return history, exports, build
+
+
+def _exported(exports, month):
+    data = b''.join(exports.stream('csv', month, (month + timedelta(days=31)).replace(day=1) - timedelta(days=1)))
+    return pa_csv.read_csv(io.BytesIO(data)).num_rows
+
+
+def test_backfilled_months_are_exported_before_they_are_compacted(writer):
+    history, exports, build = writer
+    old, older = _month(14), _month(20)
+    history.merge(_rows(TODAY, 3))
+    history.merge(_rows(old, 5))
+
+    build()
+    assert _exported(exports, old) == 5
+    assert history.compacted_before() == _month(13).isoformat()
+    assert len(history.rows_since(0)[0]) == 3
+    snapshot = build()
+    assert int(snapshot.compacted[COUNT_COLUMN].sum()) == 5
+    assert exports.month_rows()[old.strftime('%Y-%m')] == 5
+
+    # Compacted months take no more rows; their export stays complete.
+    assert history.merge(_rows(older, 4)) == 0
+    assert history.merge(_rows(old.replace(day=9), 2, reason='Other')) == 0
+    build()
+    assert _exported(exports, old) == 5
+
+
+def test_months_are_not_compacted_until_exported(writer):
+    history, exports, build = writer
+    old = _month(12)
+    history.merge(_rows(TODAY, 3))
+    build()
+
+    history.merge(_rows(old, 6))
+    # A compaction that runs before the export leaves the month raw
+    policy = RetentionPolicy(hot_days=60, pass_seconds=0)
+    assert policy.compact(history, exported=exports.month_rows())['rows'] == 0
+    assert history.compacted_before() is None
+
+    build()
+    assert _exported(exports, old) == 6
+    assert history.compacted_before() == _month(11).isoformat()
+    assert history.merge(_rows(old, 1, reason='Late')) == 0
+
+
+def test_tiers_are_keyed_without_the_area(tmp_path):
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    old = _month(6)
+    history.merge(_rows(old, 100))            # One feeder, day and cause, 100 different areas
+    history.merge(_rows(old + timedelta(days=1), 10, feeder='KETU'))
+
+    stats = RetentionPolicy(hot_days=60, pass_seconds=0).compact(history)
+    assert stats['rows'] == 110
+    tiers = history.compacted_frame()
+    assert sorted(tiers[COUNT_COLUMN]) == [10, 100]
+    assert tiers['Area'].isna().all()
+    assert not tiers[MONTHLY_COLUMN].any()
+
+
+def test_interval_metrics_leave_monthly_counts_out(tmp_path):
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    history.merge(_rows(_month(30), 20))                  # Folded into the monthly tier
+    recent = [TODAY - timedelta(days=days) for days in (40, 30, 10)]
+    for day in recent:
+        history.merge(_rows(day, 1, reason=f'Fault on {day}'))
+
+    RetentionPolicy(hot_days=90, daily_days=365, pass_seconds=0).compact(history)
+    tiers = history.compacted_frame()
+    assert tiers[MONTHLY_COLUMN].all()
+    snapshot = Snapshot(history.rows_since(0)[0], 1, compacted=tiers)
+    payload = app.reliability_payload(snapshot, feeder='OGBA')
+
+    assert payload['daily_from'] == _month(29).isoformat()
+    [feeder] = payload['feeders'].to_dict('records')
+    assert feeder['total_outages'] == 23
+    assert feeder['first_outage'] == recent[0].isoformat()
+    assert feeder['mean_days_between_outages'] == 15.0
+
+
+def test_reliability_without_monthly_counts_is_unchanged():
+    table = reliability.ReliabilityTable.from_frame(_rows(TODAY - timedelta(days=4), 2))
+    metrics = table.metrics()
+    assert table.daily_from is None
+    assert metrics['first_outage'].iloc[0] == pd.Timestamp(TODAY - timedelta(days=4))
+    assert metrics['mean_days_between_outages'].iloc[0] == 0
@@ -0,0 +1,108 @@
+import gzip
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+import serialization
+from cnn_parser import parse_outages
+from outage_frame import for_output
+from refresher import Snapshot
+from synthetic import generate_page
+
+
+@pytest.fixture(scope='module')
+def frame():
+    frame = parse_outages(generate_page(120, seed=23))
+    # Missing values of every kind the encoder handles
+    frame['Area'] = frame['Area'].where(frame.index % 7 != 0)
+    return frame.assign(
+        Count=np.arange(len(frame), dtype=np.int64),
+        Share=np.where(frame.index % 5 == 0, np.nan, frame.index / 3),
+        Seen=pd.Timestamp('2024-01-02 03:04:05') + pd.to_timedelta(frame.index, unit='min'),
+        Note=[None if n % 4 else f'note "{n}" ü' for n in range(len(frame))],
+    )
+
+
+def _plain(value):
+    """What the encoder writes for a value of `to_dict`: null for missing, ISO for timestamps."""
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def test_records_match_to_dict(frame):
+    expected = [{key: _plain(value) for key, value in row.items()} for row in for_output(frame).to_dict('records')]
+    assert json.loads(serialization.encode_frame(frame)) == expected
+    assert [json.loads(line) for line in serialization.encode_lines(frame).splitlines()] == expected
+    assert json.loads(serialization.encode_frame(frame.iloc[:0])) == []
+
+
+def test_columns_match_to_dict(frame):
+    expected = {name: [_plain(value) for value in values] for name, values in for_output(frame).to_dict('list').items()}
+    encoded = json.loads(serialization.encode_frame(frame, orient='columns'))
+    assert encoded['columns'] == list(frame.columns)
+    assert dict(zip(encoded['columns'], encoded['data'])) == expected
+
+
+# A materialized (once per snapshot) response large enough to be compressed
+URL = '/api/feeders/reliability'
+
+
+@pytest.fixture
+def served(monkeypatch):
+    snapshot = Snapshot(parse_outages(generate_page(300, seed=29)), 1)
+    monkeypatch.setattr(app, 'get_snapshot', lambda: snapshot)
+    return snapshot
+
+
+def test_materialized_responses_are_revalidated_per_encoding(client, served, monkeypatch):
+    plain = client.get(URL)
+    zipped = client.get(URL, headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    plain_etag, zipped_etag = plain.headers['ETag'], zipped.headers['ETag']
+    assert zipped_etag != plain_etag
+
+    assert client.get(URL, headers={'If-None-Match': plain_etag}).status_code == 304
+    revalidated = client.get(URL, headers={'If-None-Match': zipped_etag, 'Accept-Encoding': 'gzip'})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == zipped_etag
+
+    # A new version with the same data keeps the ETag; different data changes it
+    monkeypatch.setattr(app, 'get_snapshot', lambda: Snapshot(served.frame, 2))
+    assert client.get(URL, headers={'If-None-Match': plain_etag}).status_code == 304
+    monkeypatch.setattr(app, 'get_snapshot', lambda: Snapshot(served.frame.iloc[10:], 3))
+    changed = client.get(URL, headers={'If-None-Match': plain_etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != plain_etag
+
+
+@pytest.mark.parametrize('accept', ['br;q=1.0, gzip;q=0.5', 'gzip, deflate', 'identity', '*'])
+def test_json_responses_negotiate_the_encoding(client, served, accept):
+    plain = client.get('/api/data').get_data()
+    response = client.get('/api/data', headers={'Accept-Encoding': accept})
+
+    expected = {'br;q=1.0, gzip;q=0.5': 'br' if serialization.brotli else 'gzip',
+                'gzip, deflate': 'gzip', 'identity': None,
+                '*': 'br' if serialization.brotli else 'gzip'}[accept]
+    assert response.headers.get('Content-Encoding') == expected
+    body = response.get_data()
+    if expected == 'gzip':
+        body = gzip.decompress(body)
+    elif expected == 'br':
+        body = serialization.brotli.decompress(body)
+    assert body == plain
+
+
+def test_small_bodies_are_not_compressed(client, served):
+    response = client.get('/api/locations/suggest?q=ik&limit=1', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.get_data()) < serialization.MIN_COMPRESS_BYTES
+    assert 'Content-Encoding' not in response.headers
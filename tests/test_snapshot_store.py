@@ -0,0 +1,38 @@
+import pandas as pd
+import pyarrow as pa
+
+from outage_frame import canonicalize
+from snapshot_store import SnapshotStore
+
+
+def _frame(count):
+    rows = [(f'2024-01-{n % 28 + 1:02d}', f'F{n % 40}', 'Fault', f'Reason {n % 500}', f'Area {n}')
+            for n in range(count)]
+    frame = canonicalize(pd.DataFrame(rows, columns=['Date', 'Feeder', 'Status', 'Reason', 'Area']))
+    # History row ids, with gaps where rows were compacted away
+    frame.index = pd.Index([n * n + 7 for n in range(count)], name='id')
+    return frame
+
+
+def test_loaded_columns_point_into_the_mapped_file(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    frame = _frame(2000)
+    manifest = store.publish(frame)
+
+    sources = []
+    memory_map = pa.memory_map
+    monkeypatch.setattr(pa, 'memory_map', lambda *args: sources.append(memory_map(*args)) or sources[-1])
+    loaded = store.load(manifest).frame
+    pd.testing.assert_frame_equal(loaded, frame)
+
+    [source] = sources
+    mapped = source.read_buffer()
+    start, end = mapped.address, mapped.address + mapped.size
+
+    def in_file(values):
+        return start <= values.__array_interface__['data'][0] < end
+
+    assert in_file(loaded.index.to_numpy())
+    assert in_file(loaded['Date'].to_numpy())
+    for name in ('Feeder', 'Status', 'Reason', 'Area', 'Cause'):
+        assert in_file(loaded[name].array.codes), name
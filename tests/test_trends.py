@@ -0,0 +1,95 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import app
+from cnn_parser import parse_outages
+from history_store import HistoryStore
+from location_index import split_locations
+from synthetic import generate_page
+
+
+@pytest.fixture(scope='module')
+def page():
+    return parse_outages(generate_page(400, seed=11))
+
+
+def _expected(history, granularity, by):
+    """Counts the raw history rows per bucket and value, the slow way."""
+    conn = sqlite3.connect(history.path)
+    rows = pd.read_sql('SELECT date, feeder, status, area FROM outages', conn)
+    conn.close()
+    days = pd.to_datetime(rows['date'])
+    if granularity == 'week':
+        days -= pd.to_timedelta(days.dt.weekday, unit='D')
+    elif granularity == 'month':
+        days = days.dt.to_period('M').dt.start_time
+    rows['bucket'] = days.dt.strftime('%Y-%m-%d')
+    if by == 'total':
+        rows['value'] = ''
+    elif by == 'area':
+        rows['value'] = rows['area'].map(lambda area: sorted(set(split_locations(area))))
+        rows = rows.explode('value').dropna(subset=['value'])
+    else:
+        rows['value'] = rows[by]
+    counts = rows.groupby(['bucket', 'value']).size()
+    return {(bucket, value): int(count) for (bucket, value), count in counts.items()}
+
+
+def _counts(history, granularity='day', by='total'):
+    return {(bucket, value): count for bucket, value, count in history.trend_counts(granularity=granularity, by=by)}
+
+
+@pytest.mark.parametrize('granularity', ['day', 'week', 'month'])
+@pytest.mark.parametrize('by', ['total', 'feeder', 'status', 'area'])
+def test_rollup_matches_the_rows(tmp_path, page, granularity, by):
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    # Merged in pieces, and one piece twice: only new rows are counted
+    for start in range(0, len(page), 150):
+        history.merge(page.iloc[start:start + 150])
+    history.merge(page.iloc[100:200])
+
+    assert _counts(history, granularity, by) == _expected(history, granularity, by)
+
+
+def test_rollup_catches_up_on_uncounted_rows(tmp_path, page):
+    path = str(tmp_path / 'history.db')
+    history = HistoryStore(path)
+    history.merge(page.iloc[:100])
+    # Rows committed without the rollup, as by a process from before it existed
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            'INSERT INTO outages (row_key, date, feeder, status, reason, area, first_seen) '
+            'VALUES (?, ?, ?, ?, ?, ?, 0)',
+            [(f'old-{n}', '2023-05-0' + str(n % 9 + 1), 'OGBA', 'Fault', 'Tree on line', 'Ogba, Ikeja')
+             for n in range(30)])
+    conn.close()
+    assert _counts(history) != _expected(history, 'day', 'total')
+
+    history = HistoryStore(path)
+    assert _counts(history, 'day', 'area') == _expected(history, 'day', 'area')
+    assert sum(_counts(history).values()) == 130
+    history.merge(page.iloc[50:150])
+    assert _counts(history, 'month', 'feeder') == _expected(history, 'month', 'feeder')
+
+
+def test_trends_route(client, tmp_path, page, monkeypatch):
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    history.merge(page)
+    monkeypatch.setattr(app, 'HISTORY_STORE', history)
+    days = sorted(set(page['Date'].dt.strftime('%Y-%m-%d')))
+    date_from, date_to = days[len(days) // 3], days[2 * len(days) // 3]
+
+    body = client.get(f'/api/trends?granularity=week&by=status&from={date_from}&to={date_to}').get_json()
+    assert (body['granularity'], body['by']) == ('week', 'status')
+    in_range = page[(page['Date'] >= date_from) & (page['Date'] <= date_to)]
+    assert sum(sum(statuses.values()) for statuses in body['trends'].values()) == len(in_range)
+    assert all(pd.Timestamp(bucket).weekday() == 0 for bucket in body['trends'])
+
+    monthly = client.get('/api/trends?granularity=month').get_json()['trends']
+    assert sum(monthly.values()) == len(page)
+
+    for query in ('granularity=year', 'by=reason', 'from=2024-02-30'):
+        assert client.get(f'/api/trends?{query}').status_code == 400